@@ -0,0 +1,127 @@
+# backend/benchmarks/bench_alarm_latency.py
+# How late does an alarm start playback, against the local fake MPD?
+#   1. old: crontab launches a fresh interpreter that imports the package, connects
+#      and sends clear / load / play (timed from spawn to MPD seeing `play`)
+#   2. new: AlarmScheduler in-process, pre-warmed pool, one command list
+#      (timed from the target time to MPD seeing `play`)
+#   3. fade-in and the sleep timer's fade-out + pause
+#
+#   python benchmarks/bench_alarm_latency.py [alarms]
+import asyncio
+import math
+import os
+import shlex
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import my_package.scheduler as scheduler_module
+from benchmarks.fake_mpd import FakeMPDServer
+from my_package.database import Base
+from my_package.mpd_controller import MPDClientController
+from my_package.scheduler import AlarmScheduler
+
+PLAYLIST = "定期播放"
+COLD_START = """
+import sys
+sys.path.append({root!r})
+from my_package.mpd_controller import MPDClientController
+c = MPDClientController(port={port})
+c.connect()
+c.queue_clearsongs()
+c.queue_loadfrom_playlist({playlist!r})
+c.play()
+c.disconnect()
+"""
+
+
+def session_factory(tmp):
+    engine = create_engine(f"sqlite:///{os.path.join(tmp, 'alarms.db')}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)
+
+
+def played_at(server, since):
+    return next(t for t, command in server.state.log if command == "play" and t >= since)
+
+
+def cold_start(server):
+    start = time.time()
+    subprocess.run([sys.executable, "-c", COLD_START.format(root=project_root, port=server.port, playlist=PLAYLIST)],
+                   check=True, capture_output=True)
+    return (played_at(server, start) - start) * 1000
+
+
+async def alarm(server, sessions, lead=1.5, **job):
+    """Schedules one alarm `lead` seconds ahead by shifting the scheduler's clock to just before a minute."""
+    now = time.time()
+    offset = math.ceil((now + 60) / 60) * 60 - now - lead
+    clock = lambda: time.time() + offset
+    target = datetime.fromtimestamp(clock() + lead)
+    controller = MPDClientController(port=server.port)
+    controller.connect()
+    scheduler = AlarmScheduler(controller, sessions, clock=clock)
+    await scheduler.start()
+    await scheduler.save("bench", target.hour, target.minute, playlist=PLAYLIST, **job)
+    while not scheduler.history:
+        await asyncio.sleep(0.05)
+    entry = scheduler.history[-1]
+    mpd_late = (played_at(server, 0) + offset - entry["target"]) * 1000
+    return scheduler, controller, entry, mpd_late
+
+
+async def main_async(server, tmp, alarms):
+    sessions = session_factory(tmp)
+    lates = []
+    for _ in range(alarms):
+        server.state.log.clear()
+        scheduler, controller, entry, mpd_late = await alarm(server, sessions)
+        lates.append(mpd_late)
+        await scheduler.stop()
+        controller.disconnect()
+    print(f"  in-process scheduler   : play reached MPD {min(lates):6.2f} .. {max(lates):6.2f} ms after the target "
+          f"(command list sent {entry['late_ms']} ms after)")
+
+    server.state.log.clear()
+    scheduler, controller, entry, _ = await alarm(server, sessions, volume=80, fade_seconds=2)
+    await asyncio.sleep(2.3)
+    volumes = [int(shlex.split(command)[1]) for _, command in server.state.log if command.startswith("setvol")]
+    assert volumes[0] == 0 and volumes[-1] == 80 and volumes == sorted(volumes), volumes
+    print(f"  fade-in                : {len(volumes)} volume steps {volumes[0]} -> {volumes[-1]} over 2 s")
+
+    server.state.log.clear()
+    scheduler.start_sleep(2 / 60, fade_seconds=1)
+    await asyncio.sleep(2.3)
+    volumes = [int(shlex.split(command)[1]) for _, command in server.state.log if command.startswith("setvol")]
+    assert server.state.player == "pause" and server.state.volume == 80 and volumes[-2] == 0, volumes
+    print(f"  sleep timer            : faded {volumes[0]} -> 0, paused, volume restored to {server.state.volume}")
+    await scheduler.stop()
+    controller.disconnect()
+
+
+def main():
+    alarms = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    # Keep the run short: the pool is pre-warmed half a second ahead instead of five
+    scheduler_module.PREWARM_SECONDS = 0.5
+    server = FakeMPDServer().start()
+    server.state.playlists[PLAYLIST] = [f"定期播放/Song {i}.mp3" for i in range(20)]
+    try:
+        cold = [cold_start(server) for _ in range(3)]
+        print(f"{alarms} alarms against the fake MPD")
+        print(f"  fresh interpreter      : play reached MPD {min(cold):6.0f} .. {max(cold):6.0f} ms after spawn")
+        with tempfile.TemporaryDirectory() as tmp:
+            asyncio.run(main_async(server, tmp, alarms))
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
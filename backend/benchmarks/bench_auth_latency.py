@@ -0,0 +1,142 @@
+# backend/benchmarks/bench_auth_latency.py
+# Shows that logins no longer stall other requests: measures the latency of an
+# authenticated endpoint (/users/me/) while clients keep logging in, once with
+# bcrypt on the event loop (the old /token) and once with the bcrypt pool.
+#
+#   python benchmarks/bench_auth_latency.py [seconds] [login_clients]
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+import urllib.parse
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+import uvicorn
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from my_package.auth import (
+    create_access_token, get_current_user, get_password_hash, verify_password, verify_password_async
+)
+from my_package.database import Base, get_db
+from my_package.models import User
+
+PORT = 8765
+
+
+def build_app():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    SessionLocal = sessionmaker(bind=engine)
+    with SessionLocal() as db:
+        db.add(User(username="BENCH", hashed_password=get_password_hash("secret"), settings="{}"))
+        db.commit()
+
+    def bench_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.dependency_overrides[get_db] = bench_db
+
+    def find_user(db, username):
+        return db.query(User).filter(User.username == username.upper()).first()
+
+    @app.post("/token-on-loop")
+    async def token_on_loop(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+        user = find_user(db, form_data.username)
+        if not user or not verify_password(form_data.password, user.hashed_password):
+            raise HTTPException(status_code=401)
+        return {"access_token": create_access_token({"sub": user.username})}
+
+    @app.post("/token")
+    async def token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+        user = find_user(db, form_data.username)
+        if not user or not await verify_password_async(form_data.password, user.hashed_password):
+            raise HTTPException(status_code=401)
+        return {"access_token": create_access_token({"sub": user.username})}
+
+    @app.get("/users/me/")
+    async def me(current_user: User = Depends(get_current_user)):
+        return {"username": current_user.username}
+
+    return app
+
+
+def request(method, path, body=None, headers=None):
+    conn = http.client.HTTPConnection("127.0.0.1", PORT, timeout=30)
+    try:
+        conn.request(method, path, body=body, headers=headers or {})
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
+
+
+def login(path):
+    body = urllib.parse.urlencode({"username": "bench", "password": "secret"})
+    status, data = request("POST", path, body, {"Content-Type": "application/x-www-form-urlencoded"})
+    assert status == 200, data
+    return json.loads(data)["access_token"]
+
+
+def run(login_path, token, seconds, login_clients):
+    stop = threading.Event()
+    logins = [0]
+
+    def login_loop():
+        while not stop.is_set():
+            login(login_path)
+            logins[0] += 1
+
+    workers = [threading.Thread(target=login_loop, daemon=True) for _ in range(login_clients)]
+    for worker in workers:
+        worker.start()
+    samples = []
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        status, _ = request("GET", "/users/me/", headers={"Authorization": f"Bearer {token}"})
+        samples.append((time.perf_counter() - start) * 1000)
+        assert status == 200
+        time.sleep(0.005)
+    stop.set()
+    for worker in workers:
+        worker.join()
+    samples.sort()
+    pct = lambda p: samples[min(len(samples) - 1, int(len(samples) * p))]
+    return pct(0.5), pct(0.99), samples[-1], logins[0] / seconds
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    login_clients = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+
+    server = uvicorn.Server(uvicorn.Config(build_app(), host="127.0.0.1", port=PORT, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    try:
+        token = login("/token")
+        print(f"{'':<22} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'logins/s':>9}")
+        p50, p99, worst, _ = run("/token", token, seconds, 0)
+        print(f"{'idle':<22} {p50:>8.1f} {p99:>8.1f} {worst:>8.1f} {'-':>9}")
+        for label, path in (("bcrypt on event loop", "/token-on-loop"), ("bcrypt pool", "/token")):
+            p50, p99, worst, rate = run(path, token, seconds, login_clients)
+            print(f"{label:<22} {p50:>8.1f} {p99:>8.1f} {worst:>8.1f} {rate:>9.1f}")
+    finally:
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# backend/benchmarks/bench_mpd_update.py
+# Path-scoped MPD updates through MPDUpdateTracker, against the local fake MPD:
+#   1. a watcher-style burst of update requests under one folder while a full
+#      rescan runs: one `update` per request (old) vs merged jobs
+#   2. waiting: every request's job resolves once MPD reports it finished
+#
+#   python benchmarks/bench_mpd_update.py [requests] [scan_ms]
+import asyncio
+import os
+import sys
+import time
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from benchmarks.fake_mpd import FakeMPDServer
+from my_package.mpd_controller import MPDClientController
+from my_package.mpd_updates import MPDUpdateTracker
+
+
+def burst(count):
+    # A full rescan, then a folder, then files/albums below it (as an upload would)
+    paths = ["", "流行"]
+    paths += [f"流行/Artist {i % 5}/Album {i}" for i in range(count - 2)]
+    return paths
+
+
+async def run(controller, tracker, paths):
+    start = time.perf_counter()
+    submitted = [await controller.call(tracker.submit, path) for path in paths]
+    jobs = {job.id: job for job, _ in submitted}
+    await asyncio.gather(*(tracker.wait(job, timeout=30) for job in jobs.values()))
+    return time.perf_counter() - start, submitted, jobs
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    scan = (float(sys.argv[2]) if len(sys.argv) > 2 else 200) / 1000
+    paths = burst(count)
+
+    server = FakeMPDServer().start()
+    server.state.update_seconds = scan
+    controller = MPDClientController(port=server.port)
+    controller.connect()
+    try:
+        for path in paths:
+            controller.update(path)
+        old_updates = len(server.state.updates)
+        old_seconds = old_updates * scan
+
+        # Skip the queued scans instead of sitting through them
+        server.state.updates.clear()
+        server.state._update_ends.clear()
+        tracker = MPDUpdateTracker(controller, poll_interval=0.05)
+        seconds, submitted, jobs = asyncio.run(run(controller, tracker, paths))
+        assert all(job.state == "done" for job, _ in submitted)
+        assert server.state.updating_db() is None
+        merged = sum(1 for _, was_merged in submitted if was_merged)
+    finally:
+        controller.disconnect()
+        server.stop()
+
+    print(f"{len(paths)} update requests, {scan * 1000:.0f} ms per MPD scan")
+    print(f"  one update per request : {old_updates:3d} MPD jobs, ~{old_seconds:6.2f} s of scanning")
+    print(f"  tracked + merged       : {len(jobs):3d} MPD jobs ({merged} requests merged), "
+          f"all done after {seconds:6.2f} s")
+    for job in jobs.values():
+        print(f"    job {job.id}: '{job.path}' +{job.merged} merged")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# backend/benchmarks/bench_playlist_batch.py
+# Compares one-playlistadd-per-song (the old save_selection path) with the
+# batched command lists used by MPDClientController, against a local fake MPD.
+#
+#   python benchmarks/bench_playlist_batch.py [songs] [latency_ms]
+import os
+import sys
+import time
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from benchmarks.fake_mpd import FakeMPDServer
+from my_package.mpd_controller import MPDClientController
+
+
+def main():
+    songs_count = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    latency = (float(sys.argv[2]) if len(sys.argv) > 2 else 2.0) / 1000
+    songs = [f"流行/Artist {i // 10}/Song {i:05d}.flac" for i in range(songs_count)]
+
+    server = FakeMPDServer(latency=latency).start()
+    controller = MPDClientController(port=server.port)
+    controller.connect()
+    try:
+        start = time.perf_counter()
+        for uri in songs:
+            controller._execute_safe(controller.client.playlistadd, "bench_sequential", uri)
+        sequential = time.perf_counter() - start
+
+        start = time.perf_counter()
+        result = controller.pi_save_selection_to_playlist("bench_batched", songs)
+        batched = time.perf_counter() - start
+
+        assert server.state.playlists["bench_batched"] == songs
+        assert result["added"] == songs_count and not result["failed"]
+
+        # Partial failure: every 100th song is unknown to MPD
+        server.state.missing = set(songs[::100])
+        result = controller.pi_save_selection_to_playlist("bench_partial", songs)
+        assert len(result["failed"]) == len(server.state.missing)
+        assert result["added"] == songs_count - len(server.state.missing)
+    finally:
+        controller.disconnect()
+        server.stop()
+
+    print(f"{songs_count} songs, {latency * 1000:.1f} ms simulated MPD latency")
+    print(f"  one playlistadd per song : {sequential:8.3f} s")
+    print(f"  batched command lists    : {batched:8.3f} s")
+    print(f"  speedup                  : {sequential / batched:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
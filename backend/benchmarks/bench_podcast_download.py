@@ -0,0 +1,122 @@
+# backend/benchmarks/bench_podcast_download.py
+# Runs the podcast downloader against the local stand-in host:
+#   1. first run: all episodes, sequential (old behaviour) vs concurrent
+#   2. second run: feeds answer 304, nothing is downloaded
+#   3. dropped connections: downloads resume with Range instead of restarting
+#   4. MPD refresh (fake MPD): one `update 播客/<feed>` per touched feed and the
+#      latest-podcasts playlist edited in place as episodes arrive and expire
+#
+#   python benchmarks/bench_podcast_download.py [episodes_per_feed] [size_kb] [kb_per_s]
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from email.utils import formatdate
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.fake_mpd import FakeMPDServer
+from benchmarks.fake_podcast_server import FakePodcastServer
+from my_package.database import Base
+from my_package.mpd_controller import MPDClientController
+from my_package.podcasts import LATEST_PLAYLIST, PODCAST_FOLDER, PodcastDownloader, refresh_mpd
+
+
+def session_factory(tmp):
+    # A file database, like production: every worker thread gets its own connection
+    engine = create_engine(f"sqlite:///{tempfile.mkstemp(suffix='.db', dir=tmp)[1]}",
+                           connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)
+
+
+def run(server, feeds, base_dir, sessions, **limits):
+    server.state.requests.clear()
+    server.state.max_active = 0
+    downloader = PodcastDownloader(base_dir, sessions, **limits)
+    start = time.perf_counter()
+    results = asyncio.run(downloader.run(feeds))
+    return time.perf_counter() - start, sum(len(files) for files in results.values())
+
+
+def check_files(server, base_dir, feeds):
+    for name in feeds:
+        for i, (_, path) in enumerate(server.state.feeds[name][0]):
+            dest = os.path.join(base_dir, name, sorted(os.listdir(os.path.join(base_dir, name)))[i])
+            with open(dest, "rb") as f:
+                assert f.read() == server.state.files[path], dest
+        assert not [n for n in os.listdir(os.path.join(base_dir, name)) if n.endswith((".part", ".part.json"))]
+
+
+def main():
+    episodes = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    size = (int(sys.argv[2]) if len(sys.argv) > 2 else 512) * 1024
+    rate = (int(sys.argv[3]) if len(sys.argv) > 3 else 2048) * 1024
+
+    server = FakePodcastServer().start()
+    server.state.rate = rate
+    published = formatdate(time.time() - 3600, usegmt=True)
+    # Two "hosts" (127.0.0.1 and localhost) so the per-host limit has something to do
+    feeds = {}
+    for i, host in enumerate(("127.0.0.1", "localhost")):
+        name = f"Feed{i}"
+        server.state.add_feed(name, episodes, size, published)
+        feeds[name] = server.feed_url(name, host)
+    total_mb = len(feeds) * episodes * size / 1024 / 1024
+    print(f"{len(feeds)} feeds x {episodes} episodes x {size // 1024} KB at {rate // 1024} KB/s per stream")
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            seconds, count = run(server, feeds, os.path.join(tmp, "seq"), session_factory(tmp), per_host=1, max_downloads=1)
+            print(f"sequential          {seconds:6.2f}s  {count} episodes  {total_mb / seconds:5.1f} MB/s")
+
+            sessions = session_factory(tmp)
+            base_dir = os.path.join(tmp, "conc")
+            seconds, count = run(server, feeds, base_dir, sessions, per_host=2, max_downloads=4)
+            print(f"concurrent          {seconds:6.2f}s  {count} episodes  {total_mb / seconds:5.1f} MB/s"
+                  f"  (max {server.state.max_active} requests in flight)")
+            check_files(server, base_dir, feeds)
+
+            seconds, count = run(server, feeds, base_dir, sessions)
+            statuses = [status for _, path, status, _ in server.state.requests]
+            print(f"second run          {seconds:6.2f}s  {count} episodes  feed statuses {statuses}")
+
+            server.state.drop_after = size // 2
+            base_dir = os.path.join(tmp, "resume")
+            seconds, count = run(server, feeds, base_dir, session_factory(tmp))
+            ranged = [r for r in server.state.requests if r[3]]
+            print(f"dropped connections {seconds:6.2f}s  {count} episodes  {len(ranged)} resumed with Range "
+                  f"({sorted({r[2] for r in ranged})})")
+            check_files(server, base_dir, feeds)
+
+            mpd = FakeMPDServer().start()
+            controller = MPDClientController(port=mpd.port, music_base_path=tmp)
+            controller.connect()
+            sessions = session_factory(tmp)
+            downloader = PodcastDownloader(os.path.join(tmp, PODCAST_FOLDER), sessions)
+            asyncio.run(downloader.run({"Feed0": feeds["Feed0"]}))
+            refresh_mpd(controller, downloader)
+            print(f"mpd refresh         updates {mpd.state.updates}, "
+                  f"{len(mpd.state.playlists[LATEST_PLAYLIST])} entries in '{LATEST_PLAYLIST}'")
+            downloader.expire(0, now=time.time() + 1)
+            server.state.add_feed("Feed2", 2, 1024, published)
+            asyncio.run(downloader.run({"Feed2": server.feed_url("Feed2")}))
+            mpd.state.updates.clear()
+            refresh_mpd(controller, downloader)
+            print(f"after expiry + new  updates {mpd.state.updates}, "
+                  f"{len(mpd.state.playlists[LATEST_PLAYLIST])} entries in '{LATEST_PLAYLIST}'")
+            mpd.state.updates.clear()
+            refresh_mpd(controller, downloader)
+            controller.disconnect()
+            mpd.stop()
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# backend/benchmarks/bench_queue_window.py
+# Shows that a windowed queue read (playlistinfo START:END) costs the same for
+# any queue length, while the full playlistinfo grows with the queue, and that
+# queue sync (/pi_queue_changes) sends the queue once for a snapshot and only the
+# changed entries for a delta.
+#
+#   python benchmarks/bench_queue_window.py [window] [latency_ms]
+import os
+import sys
+import time
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from benchmarks.fake_mpd import FakeMPDServer
+from my_package.mpd_controller import MPDClientController
+
+
+def timed(func, *args, repeat=5):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func(*args)
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+
+def main():
+    window = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    latency = (float(sys.argv[2]) if len(sys.argv) > 2 else 2.0) / 1000
+
+    server = FakeMPDServer(latency=latency).start()
+    controller = MPDClientController(port=server.port)
+    controller.connect()
+    try:
+        print(f"{'queue':>7} {'full ms':>9} {'window ms':>10}")
+        for size in (1000, 5000, 10000, 20000):
+            server.state.queue = [f"流行/Artist {i // 10}/Song {i:05d}.flac" for i in range(size)]
+            full_ms, songs = timed(controller.queue_get_songs)
+            offset = size // 2
+            window_ms, page = timed(controller.queue_get_window, offset, window)
+            assert len(songs) == size and page["total"] == size
+            assert [int(s["pos"]) for s in page["songs"]] == list(range(offset, offset + window))
+            print(f"{size:>7} {full_ms:>9.1f} {window_ms:>10.1f}")
+
+        # Sync: snapshot, one added song, then the same version after an MPD restart
+        server.state.changed_at = []
+        snapshot_ms, snapshot = timed(controller.queue_get_changes, None, repeat=1)
+        controller.queue_add_song("新歌.flac")
+        delta_ms, delta = timed(controller.queue_get_changes, snapshot["version"], snapshot["started"], repeat=1)
+        assert snapshot["full"] and len(snapshot["changes"]) == size
+        assert not delta["full"] and [s["file"] for s in delta["changes"]] == ["新歌.flac"]
+        restarted = controller.queue_get_changes(snapshot["version"], snapshot["started"] - 3600)
+        assert restarted["full"] and len(restarted["changes"]) == size + 1
+        print(f"\nsync of a {size}-song queue: snapshot {snapshot_ms:.1f} ms ({len(snapshot['changes'])} entries), "
+              f"after one add {delta_ms:.1f} ms ({len(delta['changes'])} entry); "
+              f"a version from another MPD run gets the full queue")
+    finally:
+        controller.disconnect()
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# backend/benchmarks/bench_radio_probe.py
+# Probes a station list served by the local radio stand-in (fake_radio_server.py):
+#   1. one station at a time vs the concurrent prober
+#   2. what each station looks like: health, latency, ICY title, stream URL
+#   3. the ranked list: dead stations last, and left out of the queue
+#
+# Every response is delayed 100 ms, like a distant host.
+#
+#   python benchmarks/bench_radio_probe.py [icy_stations]
+import asyncio
+import json
+import os
+import socket
+import sys
+import tempfile
+import time
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+import my_package.radio as radio
+from benchmarks.fake_radio_server import FakeRadioServer
+from my_package.radio import RadioProber
+
+
+def closed_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def stations(server, icy_count):
+    entries = [(f"ICY {i}", server.url("icy", f"icy{i}")) for i in range(icy_count)]
+    entries += [
+        ("PLS", server.url("pls", "viapls")),
+        ("M3U", server.url("m3u", "viam3u")),
+        ("HLS", server.url("hls", "hls.m3u8")),
+        ("Redirect", server.url("redirect", "moved")),
+        ("Plain HTTP", server.url("http", "plain")),
+        ("Slow", server.url("slow", "slow")),
+        ("Hangs", server.url("hang", "hang")),
+        ("Gone", server.url("gone", "gone")),
+        ("Empty", server.url("empty", "empty")),
+        ("Refused", f"http://127.0.0.1:{closed_port()}/stream"),
+    ]
+    return [{"name": name, "url": url, "image": ""} for name, url in entries]
+
+
+async def run(path, concurrency):
+    prober = RadioProber(path, concurrency=concurrency)
+    prober.reload()
+    start = time.perf_counter()
+    await prober.probe_all()
+    return time.perf_counter() - start, prober
+
+
+def main():
+    icy_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    # Short timeouts so the hanging station costs one second, not five
+    radio.FIRST_BYTE_TIMEOUT = 1
+    radio.SLOW_FIRST_BYTE_MS = 500
+    server = FakeRadioServer().start()
+    server.state.slow = 0.6
+    server.state.latency = 0.1
+    server.state.titles["viapls"] = "Artist – 歌名"
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "radio_stations.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(stations(server, icy_count), f, ensure_ascii=False)
+
+            sequential, _ = asyncio.run(run(path, 1))
+            concurrent, prober = asyncio.run(run(path, 8))
+    finally:
+        server.stop()
+
+    total = len(prober.stations)
+    print(f"{total} stations")
+    print(f"  one at a time : {sequential:6.2f} s")
+    print(f"  concurrent    : {concurrent:6.2f} s  (8 at a time)")
+    print()
+    for state in prober.ranked():
+        if state["name"].startswith("ICY ") and state["name"] != "ICY 0":
+            continue
+        probe = state["probe"]
+        latency = (f"{probe['connect_ms']:5.1f} / {probe['first_byte_ms']:6.1f} ms"
+                   if probe["connect_ms"] is not None else " " * 17)
+        detail = probe["error"] or f"{probe['kind']:<4} {probe['title'] or ''}"
+        print(f"  {state['name']:<10} {state['health']:<5} {latency}  {detail}")
+        if probe["via_playlist"]:
+            print(f"  {'':<10} plays {prober.playable_url(state['url'])}")
+
+    ranked = prober.ranked()
+    health = [state["health"] for state in ranked]
+    assert health == sorted(health, key=["ok", "unknown", "slow", "dead"].index)
+    dead = {state["name"] for state in ranked if state["health"] == "dead"}
+    assert dead == {"Hangs", "Gone", "Empty", "Refused"}, dead
+    assert prober.health[prober.stations[icy_count]["url"]]["title"] == "Artist – 歌名"
+    print(f"\n  queue gets {total - len(dead)} stations; {len(dead)} dead ones left out")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# backend/benchmarks/bench_youtube_resolve.py
+# Resolving a YouTube playlist with YouTubeResolver, using a stand-in for yt-dlp
+# that takes `extract_ms` per video (no network needed):
+#   1. old: one `yt-dlp` process per video, one after another (interpreter start is
+#      measured for real, extraction simulated)
+#   2. resolver: bounded worker pool, then a restart served from the SQLite cache
+#   3. expiry: a stable reference whose stream URL is about to expire is
+#      re-resolved by prefetch before MPD reaches it
+#
+#   python benchmarks/bench_youtube_resolve.py [videos] [extract_ms]
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from my_package.database import Base
+from my_package.youtube import REFRESH_MARGIN, YouTubeResolver
+
+
+class FakeExtractor:
+    def __init__(self, seconds, ids):
+        self.seconds = seconds
+        self.ids = ids
+        self.calls = 0
+        self.clock = time.time
+
+    def __call__(self, url, flat=False):
+        self.calls += 1
+        time.sleep(self.seconds)
+        if flat:
+            return {"entries": [{"id": vid, "title": f"Video {vid}"} for vid in self.ids]}
+        vid = url.rsplit("=", 1)[1]
+        expire = int(self.clock() + 6 * 3600)
+        return {"id": vid, "title": f"Video {vid}", "duration": 200.0,
+                "url": f"https://rr1.googlevideo.com/videoplayback?expire={expire}&id={vid}&n={self.calls}"}
+
+
+def session_factory(tmp):
+    engine = create_engine(f"sqlite:///{os.path.join(tmp, 'yt.db')}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)
+
+
+async def resolve_playlist(resolver):
+    start = time.perf_counter()
+    ids = await resolver.expand("https://www.youtube.com/playlist?list=PLbench")
+    entries, failed = await resolver.resolve_many(ids)
+    assert not failed and len(entries) == len(ids)
+    return time.perf_counter() - start, entries
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    seconds = (float(sys.argv[2]) if len(sys.argv) > 2 else 300) / 1000
+    ids = [f"vid{i:08d}" for i in range(count)]
+    base = "http://127.0.0.1:8001"
+
+    start = time.perf_counter()
+    for _ in range(3):
+        subprocess.run([sys.executable, "-c", "pass"], check=True)
+    spawn = (time.perf_counter() - start) / 3
+    print(f"{count} videos, {seconds * 1000:.0f} ms per extraction")
+    print(f"  one process per video  : ~{count * (spawn + seconds):6.2f} s "
+          f"({spawn * 1000:.0f} ms interpreter start each, before yt-dlp's own imports)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sessions = session_factory(tmp)
+
+        async def run():
+            extractor = FakeExtractor(seconds, ids)
+            resolver = YouTubeResolver(sessions, base, extract=extractor)
+            cold, entries = await resolve_playlist(resolver)
+            print(f"  resolver, cold         : {cold:6.2f} s  ({extractor.calls} extractions, 3 workers)")
+            resolver.shutdown()
+
+            extractor = FakeExtractor(seconds, ids)
+            resolver = YouTubeResolver(sessions, base, extract=extractor)
+            warm, _ = await resolve_playlist(resolver)
+            print(f"  after restart (cache)  : {warm:6.2f} s  ({extractor.calls} extraction: the playlist listing)")
+
+            ref = resolver.stable_url(ids[0])
+            assert resolver.id_from_reference(ref) == ids[0]
+            old_url = (await resolver.resolve(ids[0]))["stream_url"]
+            # Jump to just inside the refresh margin of the cached URL
+            expires = entries[0]["expires_at"]
+            resolver.clock = extractor.clock = lambda: expires - REFRESH_MARGIN + 1
+            task = resolver.prefetch(ref)
+            assert task is not None and resolver.prefetch(ref) is None
+            new_url = (await task)["stream_url"]
+            assert new_url != old_url and (await resolver.resolve(ids[0]))["stream_url"] == new_url
+            print(f"  near expiry            : {ref} re-resolved by prefetch")
+            resolver.shutdown()
+
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
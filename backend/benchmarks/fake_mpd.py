@@ -0,0 +1,213 @@
+# backend/benchmarks/fake_mpd.py
+# A tiny in-process stand-in for MPD, good enough for benchmarking the controller.
+# It speaks the line protocol (including command lists) and answers a handful of
+# commands from in-memory state. `latency` is added to every response flush to
+# mimic the round trip to MPD on a busy Raspberry Pi.
+import shlex
+import socketserver
+import threading
+import time
+
+
+class FakeMPDState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.queue = []
+        self.playlists = {}
+        self.playlist_version = 1
+        # Playlist version at which each queue position last changed (missing: version 1)
+        self.changed_at = []
+        self.started = time.time()
+        # URIs that playlistadd/add reject, to exercise partial failures
+        self.missing = set()
+        # Song URIs in the fake database, for listall / count / searchaddpl
+        self.library = []
+        # Paths passed to `update`, in order; the job id is their count
+        self.updates = []
+        # Seconds each update job "scans"; jobs run one after another like in MPD
+        self.update_seconds = 0
+        self._update_ends = []
+        self.volume = 50
+        self.player = "stop"
+        # (time.time(), command) for player/mixer commands, to time alarms
+        self.log = []
+
+    def under(self, folder):
+        if not folder:
+            return list(self.library)
+        songs = [uri for uri in self.library if uri.startswith(folder + "/")]
+        if not songs:
+            raise KeyError("No such directory")
+        return songs
+
+    def touch(self, start):
+        """Marks queue positions from `start` to the end as changed in the current version."""
+        self.changed_at = (self.changed_at + [1] * start)[:start]
+        self.changed_at += [self.playlist_version] * (len(self.queue) - start)
+
+    def updating_db(self):
+        """The job id MPD would report as running, or None."""
+        now = time.monotonic()
+        for job, end in enumerate(self._update_ends, 1):
+            if end > now:
+                return job
+        return None
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        server = self.server
+        self.wfile.write(b"OK MPD 0.23.5\n")
+        batch = None
+        list_ok = False
+        for raw in self.rfile:
+            line = raw.decode("utf-8").rstrip("\n")
+            if not line:
+                continue
+            if line in ("command_list_begin", "command_list_ok_begin"):
+                batch = []
+                list_ok = line == "command_list_ok_begin"
+                continue
+            if batch is not None and line != "command_list_end":
+                batch.append(line)
+                continue
+
+            commands = batch if batch is not None else [line]
+            in_list_ok = batch is not None and list_ok
+            batch = None
+            out = []
+            for index, command in enumerate(commands):
+                try:
+                    out.append(self._dispatch(server.state, command))
+                except KeyError as e:
+                    name = command.split(" ", 1)[0]
+                    out.append(f"ACK [50@{index}] {{{name}}} {e.args[0]}\n")
+                    break
+                if in_list_ok:
+                    out.append("list_OK\n")
+            else:
+                out.append("OK\n")
+            time.sleep(server.latency)
+            self.wfile.write("".join(out).encode("utf-8"))
+            if line == "close":
+                return
+
+    def _dispatch(self, state, command):
+        name, *args = shlex.split(command)
+        with state.lock:
+            if name in ("ping", "close"):
+                return ""
+            if name == "status":
+                running = state.updating_db()
+                return (f"volume: {state.volume}\nstate: {state.player}\nplaylist: {state.playlist_version}\n"
+                        f"playlistlength: {len(state.queue)}\n"
+                        + (f"updating_db: {running}\n" if running else ""))
+            if name in ("play", "pause", "setvol"):
+                state.log.append((time.time(), command))
+                if name == "setvol":
+                    state.volume = int(args[0])
+                else:
+                    state.player = "play" if name == "play" or args == ["0"] else "pause"
+                return ""
+            if name == "load":
+                if args[0] not in state.playlists:
+                    raise KeyError("No such playlist")
+                state.playlist_version += 1
+                state.queue.extend(state.playlists[args[0]])
+                state.touch(len(state.queue) - len(state.playlists[args[0]]))
+                return ""
+            if name == "clear":
+                state.queue.clear()
+                state.playlist_version += 1
+                state.touch(0)
+                return ""
+            if name == "stats":
+                return f"uptime: {int(time.time() - state.started)}\n"
+            if name == "add":
+                if args[0] in state.missing:
+                    raise KeyError("No such directory")
+                state.queue.append(args[0])
+                state.playlist_version += 1
+                state.touch(len(state.queue) - 1)
+                return ""
+            if name == "playlistadd":
+                if args[1] in state.missing:
+                    raise KeyError("No such directory")
+                state.playlists.setdefault(args[0], []).append(args[1])
+                return ""
+            if name == "playlistdelete":
+                songs = state.playlists.get(args[0])
+                if songs is None or int(args[1]) >= len(songs):
+                    raise KeyError("Bad song index")
+                del songs[int(args[1])]
+                return ""
+            if name == "update":
+                state.updates.append(args[0] if args else "")
+                start = max([time.monotonic()] + state._update_ends[-1:])
+                state._update_ends.append(start + state.update_seconds)
+                return f"updating_db: {len(state.updates)}\n"
+            if name == "rm":
+                if args[0] not in state.playlists:
+                    raise KeyError("No such playlist")
+                del state.playlists[args[0]]
+                return ""
+            if name == "plchanges":
+                since = int(args[0])
+                return "".join(
+                    f"file: {uri}\nTitle: {uri}\nPos: {pos}\nId: {pos + 1}\n"
+                    for pos, uri in enumerate(state.queue)
+                    if (state.changed_at[pos] if pos < len(state.changed_at) else 1) > since
+                )
+            if name == "playlistinfo":
+                # Whole queue, or the "START:END" window
+                start, end = 0, len(state.queue)
+                if args:
+                    start, _, end_text = args[0].partition(":")
+                    start, end = int(start), min(int(end_text or start + 1), len(state.queue))
+                    if start > len(state.queue):
+                        raise KeyError("Bad song index")
+                return "".join(
+                    f"file: {uri}\nTitle: {uri}\nPos: {pos}\nId: {pos + 1}\n"
+                    for pos, uri in enumerate(state.queue[start:end], start)
+                )
+            if name == "listall":
+                return "".join(f"file: {uri}\n" for uri in state.under(args[0] if args else ""))
+            if name in ("count", "searchaddpl"):
+                # Only the (base "folder") filter is understood
+                expression = args[-1]
+                if not expression.startswith("(base "):
+                    raise KeyError("Unknown filter type")
+                songs = state.under(shlex.split(expression[6:-1])[0])
+                if name == "count":
+                    return f"songs: {len(songs)}\nplaytime: 0\n"
+                state.playlists.setdefault(args[0], []).extend(songs)
+                return ""
+            if name == "listplaylists":
+                return "".join(f"playlist: {p}\nLast-Modified: 2025-01-01T00:00:00Z\n" for p in state.playlists)
+            if name == "listplaylist":
+                if args[0] not in state.playlists:
+                    raise KeyError("No such playlist")
+                return "".join(f"file: {uri}\n" for uri in state.playlists[args[0]])
+        raise KeyError(f"unknown command \"{name}\"")
+
+
+class FakeMPDServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.002):
+        super().__init__((host, port), _Handler)
+        self.state = FakeMPDState()
+        self.latency = latency
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,156 @@
+# backend/benchmarks/fake_podcast_server.py
+# A local stand-in for podcast hosts: serves RSS feeds and episode files from memory,
+# with ETag / Last-Modified revalidation, Range requests and optional faults.
+#   - `rate` throttles each response (bytes per second) to make transfers take time.
+#   - `drop_after` closes the first response for each episode after that many bytes.
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from xml.sax.saxutils import escape
+
+LAST_MODIFIED = formatdate(time.time() - 3600, usegmt=True)
+
+
+class FakePodcastState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        # feed name -> [(title, episode path)]
+        self.feeds = {}
+        # episode path -> bytes
+        self.files = {}
+        self.requests = []  # (method, path, status, Range header)
+        self.active = 0
+        self.max_active = 0
+        self.dropped = set()
+        self.drop_after = None
+        self.rate = None
+
+    def add_feed(self, name, episodes, size, published):
+        """Adds a feed with `episodes` episodes of `size` bytes each."""
+        items = []
+        for i in range(episodes):
+            path = f"/audio/{name}/ep{i}.mp3"
+            self.files[path] = bytes((i + j) % 251 for j in range(size))
+            items.append((f"{name} episode {i}", path))
+        self.feeds[name] = (items, published)
+
+    def rss(self, name, base_url):
+        items, published = self.feeds[name]
+        body = "".join(
+            f"<item><title>{escape(title)}</title><guid>{base_url}{path}</guid>"
+            f"<pubDate>{published}</pubDate>"
+            f'<enclosure url="{base_url}{path}" type="audio/mpeg" length="{len(self.files[path])}"/></item>'
+            for title, path in items
+        )
+        return f'<?xml version="1.0"?><rss version="2.0"><channel><title>{name}</title>{body}</channel></rss>'.encode()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        state = self.server.state
+        with state.lock:
+            state.active += 1
+            state.max_active = max(state.max_active, state.active)
+        try:
+            if self.path.startswith("/feeds/"):
+                self._feed(state, self.path[len("/feeds/"):])
+            elif self.path in state.files:
+                self._file(state, self.path)
+            else:
+                self._send(404, b"not found")
+        finally:
+            with state.lock:
+                state.active -= 1
+
+    def _log(self, status):
+        with self.server.state.lock:
+            self.server.state.requests.append(("GET", self.path, status, self.headers.get("Range")))
+
+    def _send(self, status, body, headers=()):
+        self._log(status)
+        self.send_response(status)
+        for key, value in headers:
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _feed(self, state, name):
+        if name not in state.feeds:
+            return self._send(404, b"no such feed")
+        etag = f'"feed-{name}-{len(state.feeds[name][0])}"'
+        if self.headers.get("If-None-Match") == etag:
+            return self._send(304, b"", [("ETag", etag)])
+        body = state.rss(name, f"http://{self.headers['Host']}")
+        self._send(200, body, [("Content-Type", "application/rss+xml"), ("ETag", etag),
+                               ("Last-Modified", LAST_MODIFIED)])
+
+    def _file(self, state, path):
+        data = state.files[path]
+        etag = f'"{path}-{len(data)}"'
+        start = 0
+        status = 200
+        range_header = self.headers.get("Range")
+        if range_header and self.headers.get("If-Range", etag) == etag:
+            start = int(range_header.split("=")[1].split("-")[0])
+            if start >= len(data):
+                self._log(416)
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(data)}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            status = 206
+        body = data[start:]
+        self._log(status)
+        self.send_response(status)
+        self.send_header("Content-Type", "audio/mpeg")
+        self.send_header("ETag", etag)
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(len(body)))
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{len(data) - 1}/{len(data)}")
+        self.end_headers()
+        drop = None
+        with state.lock:
+            if state.drop_after is not None and path not in state.dropped:
+                state.dropped.add(path)
+                drop = state.drop_after
+        chunk = 16 * 1024
+        sent = 0
+        while sent < len(body):
+            if drop is not None and sent >= drop:
+                # Simulate a dropped connection halfway through
+                self.close_connection = True
+                return
+            piece = body[sent:sent + chunk]
+            self.wfile.write(piece)
+            sent += len(piece)
+            if state.rate:
+                time.sleep(len(piece) / state.rate)
+
+
+class FakePodcastServer:
+    def __init__(self, host="127.0.0.1", port=0):
+        self.state = FakePodcastState()
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.state = self.state
+        self.port = self._server.server_address[1]
+
+    def feed_url(self, name, host="127.0.0.1"):
+        return f"http://{host}:{self.port}/feeds/{name}"
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
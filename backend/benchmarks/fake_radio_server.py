@@ -0,0 +1,129 @@
+# backend/benchmarks/fake_radio_server.py
+# A local stand-in for internet radio hosts. Paths pick the behaviour, the last
+# segment is the station name:
+#   /icy/<name>       SHOUTcast-style "ICY 200 OK" with icy-metaint and StreamTitle blocks
+#   /http/<name>      plain HTTP audio, no metadata
+#   /pls/<name>       .pls file pointing at /icy/<name>
+#   /m3u/<name>       .m3u file pointing at /icy/<name>
+#   /hls/<name>.m3u8  HLS master playlist
+#   /redirect/<name>  302 to /icy/<name>
+#   /slow/<name>      ICY after `slow` seconds
+#   /hang/<name>      accepts the request and never answers
+#   /gone/<name>      404
+#   /empty/<name>     200, then closes without audio
+import socketserver
+import threading
+import time
+
+METAINT = 8192
+# Seconds an audio response is kept open at most
+STREAM_SECONDS = 10
+
+
+class FakeRadioState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        # station name -> current StreamTitle
+        self.titles = {}
+        self.slow = 1.0
+        # Seconds before every response, like a host far away
+        self.latency = 0
+        self.requests = []  # (path, Icy-MetaData header)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        state = self.server.state
+        request_line = self.rfile.readline().decode("latin-1").split()
+        headers = {}
+        while (line := self.rfile.readline().strip()):
+            key, _, value = line.decode("latin-1").partition(":")
+            headers[key.strip().lower()] = value.strip()
+        if len(request_line) < 2:
+            return
+        path = request_line[1]
+        with state.lock:
+            state.requests.append((path, headers.get("icy-metadata")))
+        try:
+            time.sleep(state.latency)
+            self._route(state, path, headers)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _send(self, status_line, headers, body=b""):
+        head = status_line + "\r\n" + "".join(f"{k}: {v}\r\n" for k, v in headers) + "\r\n"
+        self.wfile.write(head.encode("latin-1") + body)
+
+    def _route(self, state, path, headers):
+        kind, _, name = path.strip("/").partition("/")
+        base = f"http://{headers.get('host')}"
+        if kind == "icy":
+            return self._icy(state, name, headers)
+        if kind == "slow":
+            time.sleep(state.slow)
+            return self._icy(state, name, headers)
+        if kind == "http":
+            self._send("HTTP/1.0 200 OK", [("Content-Type", "audio/mpeg")])
+            return self._audio(None, None)
+        if kind == "pls":
+            body = f"[playlist]\nFile1={base}/icy/{name}\nTitle1={name}\nNumberOfEntries=1\nVersion=2\n".encode()
+            return self._send("HTTP/1.0 200 OK", [("Content-Type", "audio/x-scpls")], body)
+        if kind == "m3u":
+            body = f"#EXTM3U\n#EXTINF:-1,{name}\n{base}/icy/{name}\n".encode()
+            return self._send("HTTP/1.0 200 OK", [("Content-Type", "audio/x-mpegurl")], body)
+        if kind == "hls":
+            body = b"#EXTM3U\n#EXT-X-STREAM-INF:BANDWIDTH=128000,CODECS=\"mp4a.40.2\"\nmedia.m3u8\n"
+            return self._send("HTTP/1.0 200 OK", [("Content-Type", "application/vnd.apple.mpegurl")], body)
+        if kind == "redirect":
+            return self._send("HTTP/1.0 302 Found", [("Location", f"/icy/{name}")])
+        if kind == "hang":
+            time.sleep(STREAM_SECONDS)
+            return
+        if kind == "empty":
+            return self._send("HTTP/1.0 200 OK", [("Content-Type", "audio/mpeg")])
+        self._send("HTTP/1.0 404 Not Found", [("Content-Type", "text/plain")], b"not found")
+
+    def _icy(self, state, name, headers):
+        wants_meta = headers.get("icy-metadata") == "1"
+        response = [("icy-name", name), ("icy-br", "128"), ("Content-Type", "audio/mpeg")]
+        if wants_meta:
+            response.append(("icy-metaint", str(METAINT)))
+        self._send("ICY 200 OK", response)
+        self._audio(state, name if wants_meta else None)
+
+    def _audio(self, state, meta_for):
+        deadline = time.monotonic() + STREAM_SECONDS
+        while time.monotonic() < deadline:
+            chunk = bytes(METAINT)
+            if meta_for is not None:
+                with state.lock:
+                    title = state.titles.get(meta_for, f"{meta_for} - Live")
+                meta = f"StreamTitle='{title}';".encode("utf-8")
+                meta += bytes(-len(meta) % 16)
+                chunk += bytes([len(meta) // 16]) + meta
+            self.wfile.write(chunk)
+            time.sleep(0.05)
+
+
+class FakeRadioServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host="127.0.0.1", port=0):
+        super().__init__((host, port), _Handler)
+        self.state = FakeRadioState()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def url(self, kind, name):
+        return f"http://127.0.0.1:{self.port}/{kind}/{name}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
@@ -1,33 +1,56 @@
 # main.py
 # This script creates a FastAPI application to expose API endpoints
 # for controlling the Music Player Daemon (MPD).
-import os, io, json, uvicorn, subprocess, asyncio
+import os, json, uvicorn, subprocess, asyncio
 
-from fastapi import FastAPI, HTTPException, Request, UploadFile, File, Depends, HTTPException, status
+from fastapi import FastAPI, HTTPException, Request, UploadFile, File, Depends, HTTPException, status, Query, BackgroundTasks
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, HTMLResponse, JSONResponse
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, StreamingResponse, Response, RedirectResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from typing import Optional, List
 from sqlalchemy.orm import Session
 from datetime import timedelta
 from pathlib import Path
 from contextlib import asynccontextmanager
-from PIL import Image
 from pydantic import BaseModel
 
 from my_package.mpd_controller import MPDClientController
-from my_package.database import get_db, SessionLocal, Base, engine
+from my_package.library import LibraryIndex, iter_music_files, collapse_dirs
+from my_package.user_playlists import (
+    MAX_PAGE, migrate_playlist_blobs, find_playlist, get_or_create_playlist, count_items, read_items,
+    insert_items, delete_at, remove_paths, move_item, replace_items, delete_playlist
+)
+from my_package.catalog import (
+    CATALOG_EXTENSIONS, init_catalog_fts, search_tracks, suggest, upsert_track, remove_tracks
+)
+from my_package.tag_scanner import LibraryScanner, read_tags
+from my_package.library_watcher import LibraryWatcher
+from my_package.hls import HLSPackager, HLSError
+from my_package.lyrics import LyricsService
+from my_package.artwork import ArtworkCache
+from my_package.images import (
+    ImagePipeline, WallpaperLibrary, save_avatar, AVATAR_WIDTHS, MANIFEST_NAME
+)
+from my_package.mpd_events import MPDEventBroadcaster
+from my_package.mpd_updates import MPDUpdateTracker
+from my_package.now_playing import NowPlayingCache, interpolated_status
+from my_package.database import get_db, run_db, SessionLocal, Base, engine
 from my_package.models import User, UserPlaylist
 from my_package.schemas import (
     UserCreate, UserResponse, Token, UserPlaylistCreate, UserPlaylistResponse,
-    PlaylistPayload, PlaylistsListResponse, UserPasswordChange, Settings, SongRequest
+    PlaylistPayload, PlaylistsListResponse, UserPasswordChange, Settings, SongRequest,
+    PlaylistItemsPayload, PlaylistMovePayload, PlaylistItemsPage,
+    SearchResponse, SuggestResponse
 )
 from my_package.auth import (
-get_password_hash, verify_password, create_access_token,
-    ACCESS_TOKEN_EXPIRE_MINUTES, get_current_user
+get_password_hash_async, verify_password_async, create_access_token,
+    ACCESS_TOKEN_EXPIRE_MINUTES, get_current_user, principal_cache
 )
+from my_package.scheduler import AlarmScheduler, SLEEP_FADE_SECONDS
+from my_package.youtube import YouTubeResolver, YouTubeError
+from my_package.radio import RadioProber
 import my_package.cron_service as cron_service
 
 # ----------------------------------------------
@@ -46,17 +69,49 @@ pi_Volume = 1
 pi_Mute = False
 pi_Playrate = 1
 pi_Duration = 0
-cron_Status =  False
-cron_Hour = '00'
-cron_Min = '00'
-cron_pi_Index = 1
 pc_ALLFILES = []
 pc_Playlist_List = [] 
 pc_Playlist_files = []
 pc_Indexmax = 1
 
+# Sorted index of the PC player's music files, built in the background at startup
+library_index = LibraryIndex(music_Basefolder)
+# Fills the search catalog (tags, durations) with one worker process per core
+library_scanner = LibraryScanner(music_Basefolder, SessionLocal)
+# Keeps the index, catalog and MPD database current as files change on disk
+library_watcher = LibraryWatcher(music_Basefolder, lambda changes: apply_library_changes(changes))
+# Index of tracks with .lrc lyrics plus an LRU of parsed lyrics
+lyrics_service = LyricsService(music_Basefolder)
+# How many upcoming tracks get their lyrics parsed ahead of time
+LYRICS_PREFETCH = 3
+# On-demand HLS renditions of library tracks for the PC player, cached on disk
+hls_packager = HLSPackager(music_Basefolder)
+
 # Initialize the MPD client controller globally
 mpd_player = MPDClientController(music_base_path=music_Basefolder)
+# Single MPD idle connection shared by every /pi_events subscriber
+mpd_events = MPDEventBroadcaster()
+# status/currentsong snapshot, invalidated by idle events instead of re-queried per request
+now_playing = NowPlayingCache(mpd_player, events=mpd_events)
+mpd_events.add_listener(now_playing.invalidate)
+mpd_player.stored_playlists.bind(mpd_events)
+# Path-scoped `update` jobs whose completion is tracked through the idle listener
+mpd_updates = MPDUpdateTracker(mpd_player)
+mpd_updates.bind(mpd_events)
+# Alarms and the sleep timer, run in-process on the shared MPD pool
+scheduler = AlarmScheduler(mpd_player, SessionLocal)
+# Playlist the default alarm plays (created from the folder of the same name)
+ALARM_PLAYLIST = "定期播放"
+# yt-dlp resolutions cached per video; playlists store this server's /yt/<id> references,
+# so the base URL must be reachable from MPD (which runs on the same Pi)
+youtube = YouTubeResolver(SessionLocal, "http://127.0.0.1:8001")
+# Health of the stations in radio_stations.json, probed in the background
+radio_prober = RadioProber("radio_stations.json")
+# Cover thumbnails (folder image, embedded tags or MPD readpicture), decoded once per cover
+artwork = ArtworkCache(music_Basefolder, mpd_player)
+# Resized WebP/JPEG variants of wallpapers and user pictures, rendered on a worker pool
+image_pipeline = ImagePipeline()
+USER_PICTURE_DIR = Path("../frontend/public/images/user_picture")
 
 MPD_PLAYMODE = ["repeat", "random", "single", "consume"]
 
@@ -64,6 +119,15 @@ class CronJobPayload(BaseModel):
     hour: int
     minute: int
     day_of_week: Optional[List[int]] = None
+    name: str = ALARM_PLAYLIST
+    playlist: Optional[str] = None  # defaults to the job name
+    volume: Optional[int] = None
+    fade_seconds: int = 0
+    enabled: bool = True
+
+class SleepTimerPayload(BaseModel):
+    minutes: float
+    fade_seconds: int = SLEEP_FADE_SECONDS
 
 class StreamRequest(BaseModel):
     stream_url: str
@@ -76,30 +140,163 @@ class PlaylistDeleteSongPayload(BaseModel):
 
 class YouTubeAddPayload(BaseModel):
     playlist_name: str
-    youtube_url: str
+    youtube_url: Optional[str] = None  # a video or a playlist
+    youtube_urls: List[str] = []
 
 class SaveSelectionPayload(BaseModel):
     playlist_name: str
     songs: List[str]
 
 
+def stream_batch_progress(func, *args):
+    """
+    Runs a batched controller method (one taking a `progress` callback) on the MPD pool
+    and streams NDJSON: {"done", "total"} after each command list, then {"result": ...}.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+
+    def progress(done, total):
+        # Called from the pool's worker thread
+        loop.call_soon_threadsafe(queue.put_nowait, {"done": done, "total": total})
+
+    async def lines():
+        task = asyncio.ensure_future(mpd_player.call(func, *args, progress=progress))
+        task.add_done_callback(lambda _: queue.put_nowait(None))
+        while (item := await queue.get()) is not None:
+            yield json.dumps(item) + "\n"
+        try:
+            result = task.result()
+        except Exception as e:
+            result = {"error": str(e)}
+        yield json.dumps({"result": result}, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 # Generate filespath base from music_Basefolder
 def genFilelist(subfolder):
-    global pc_Indexmax
-    global music_Basefolder 
-    songs = []; 
-    for path, subdirs, files in os.walk(music_Basefolder + subfolder, followlinks=True):
-        path = path[len(music_Basefolder):]
-        if path.startswith('/'):
-            path = path[1:]
-        path = path+"/"
-        if path == '/':
-            path = ''
-        files = [path + file for file in files]
-        songs = songs + files; 
-    songs = [ f for f in songs if f.lower().endswith(('.mp3', '.flac'))]
-    songs.sort()
-    return songs
+    """Sorted music files under `subfolder`, from the library index once it is built."""
+    if library_index.ready:
+        return library_index.files(subfolder)
+    return sorted(iter_music_files(music_Basefolder, subfolder))
+
+def stream_filelist(subfolder, ndjson=False):
+    """
+    Streams the file list instead of building it in memory: sorted from the index when
+    it is ready, otherwise straight from the scandir walker (sorted per directory).
+    The default output is a JSON array so existing clients keep working.
+    """
+    paths = (library_index.iter_files(subfolder) if library_index.ready
+             else iter_music_files(music_Basefolder, subfolder))
+
+    def json_array():
+        yield "["
+        first = True
+        for path in paths:
+            yield ("" if first else ",") + json.dumps(path, ensure_ascii=False)
+            first = False
+        yield "]"
+
+    def ndjson_lines():
+        for path in paths:
+            yield json.dumps(path, ensure_ascii=False) + "\n"
+
+    if ndjson:
+        return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+    return StreamingResponse(json_array(), media_type="application/json")
+
+def update_mpd_dirs(dirs):
+    """Asks MPD to rescan only the given directories (nested ones are merged)."""
+    for directory in collapse_dirs(dirs):
+        mpd_updates.submit(directory)
+
+def build_library():
+    """
+    Builds the sorted file index, then brings the search catalog up to date and
+    lets MPD rescan only the directories that changed while we were not running.
+    """
+    library_index.rebuild()
+    lyrics_service.rebuild()
+    try:
+        library_scanner.scan()
+        if library_scanner.changed_dirs:
+            update_mpd_dirs(library_scanner.changed_dirs)
+    except Exception as e:
+        print(f"Error syncing library catalog: {e}")
+
+def apply_library_changes(changes):
+    """Called by the library watcher (in a worker thread) after each debounced burst."""
+    if changes.overflow:
+        # inotify dropped events; fall back to a (stat-only, warm) full sync
+        build_library()
+        return
+    for path in changes.files:
+        lyrics_service.note_file(path)
+    for directory in changes.removed_dirs:
+        lyrics_service.remove_dir(directory)
+    for directory in changes.added_dirs:
+        lyrics_service.add_dir(directory)
+    files = set(changes.files)
+    for directory in changes.added_dirs:
+        files.update(iter_music_files(music_Basefolder, directory, extensions=CATALOG_EXTENSIONS))
+    db = SessionLocal()
+    try:
+        for directory in changes.removed_dirs:
+            library_index.remove_prefix(directory)
+        remove_tracks(db, prefixes=changes.removed_dirs)
+        gone = []
+        for path in files:
+            abs_path = os.path.join(music_Basefolder, path)
+            if os.path.isfile(abs_path) and path.lower().endswith(CATALOG_EXTENSIONS):
+                library_index.add(path)
+                upsert_track(db, music_Basefolder, path, read_tags(abs_path))
+            else:
+                library_index.remove(path)
+                gone.append(path)
+        remove_tracks(db, paths=gone)
+        db.commit()
+    finally:
+        db.close()
+    update_mpd_dirs(changes.dirs())
+    print(f"Library updated: {len(files)} files, {len(changes.removed_dirs)} removed folders.")
+
+async def warm_queue_lyrics():
+    """Parses lyrics for the current MPD song and the next few queue entries."""
+    try:
+        snapshot = await now_playing.get()
+        if snapshot is None or "song" not in snapshot["status"]:
+            return
+        window = await mpd_player.call(mpd_player.queue_get_window, int(snapshot["status"]["song"]), LYRICS_PREFETCH + 1)
+        if window:
+            await asyncio.to_thread(lyrics_service.prefetch, [song.get("file") for song in window["songs"]])
+    except Exception as e:
+        print(f"Error prefetching lyrics: {e}")
+
+lyrics_prefetch_task = None
+
+def prefetch_queue_lyrics(changed):
+    """mpd_events listener: re-warms lyrics when the song or the queue changes."""
+    global lyrics_prefetch_task
+    if changed & {"player", "playlist"} and (lyrics_prefetch_task is None or lyrics_prefetch_task.done()):
+        lyrics_prefetch_task = asyncio.get_running_loop().create_task(warm_queue_lyrics())
+
+mpd_events.add_listener(prefetch_queue_lyrics)
+
+async def warm_next_stream():
+    """Re-resolves the next queue entry's YouTube stream if its URL is about to expire."""
+    try:
+        snapshot = await now_playing.get()
+        if snapshot is not None:
+            youtube.prefetch(snapshot["nextsong"].get("file"))
+    except Exception as e:
+        print(f"Error prefetching YouTube stream: {e}")
+
+def prefetch_next_stream(changed):
+    """mpd_events listener: MPD opens /yt/ references only when it reaches them."""
+    if changed & {"player", "playlist"}:
+        asyncio.get_running_loop().create_task(warm_next_stream())
+
+mpd_events.add_listener(prefetch_next_stream)
 
 # --- Application Lifespan Event Handler ---
 @asynccontextmanager
@@ -122,15 +319,26 @@ async def lifespan(app: FastAPI):
     
     # Create database tables
     Base.metadata.create_all(bind=engine)
+    init_catalog_fts(engine)
+    migrate_playlist_blobs(engine)
+
+    await asyncio.to_thread(hls_packager.load)
+    await asyncio.to_thread(artwork.load)
+    # Lists the wallpapers once, which queues any missing variants on the image pool
+    await asyncio.to_thread(wallpapers.listing)
+
+    # Requests fall back to the streaming walker until the index is ready
+    library_task = asyncio.create_task(asyncio.to_thread(build_library))
     
     # Connect to MPD
     # Note: mpd_controller now handles connection errors gracefully, 
     # so even if this initial connect fails, the app will continue.
-    mpd_player.connect()
+    await asyncio.to_thread(mpd_player.connect)
 
     if mpd_player.is_connected:
-        print("MPD is connected Updating MPD database...")
-        mpd_player.update()
+        # No full MPD update here any more: build_library and the library watcher
+        # send `update <dir>` for just the folders that changed.
+        print("MPD is connected.")
         
         # Create playlists based on folder names
         #for folder_name in music_Type:
@@ -144,10 +352,30 @@ async def lifespan(app: FastAPI):
     else:
         print("⚠️  MPD not connected at startup. Features will activate when MPD becomes available.")
 
+    # The idle listener reconnects on its own, so start it even if MPD is down
+    await mpd_events.start()
+    await library_watcher.start()
+    await scheduler.start()
+    await radio_prober.start()
+    try:
+        # Alarms from the crontab days move into the scheduler once
+        for hour, minute, days in await asyncio.to_thread(cron_service.take_legacy_cron_jobs):
+            if ALARM_PLAYLIST not in scheduler.jobs:
+                await scheduler.save(ALARM_PLAYLIST, hour, minute, days)
+    except Exception as e:
+        print(f"Could not migrate crontab alarms: {e}")
+
     try:
         yield
     finally:
         print("Application shutdown...")
+        await scheduler.stop()
+        await radio_prober.stop()
+        await library_watcher.stop()
+        await hls_packager.close()
+        youtube.shutdown()
+        image_pipeline.shutdown()
+        await mpd_events.stop()
         mpd_player.disconnect()
   
 # --- FastAPI App Setup ---
@@ -169,6 +397,12 @@ if not NUXT_DIST_PATH.exists():
     # You might want to make this a warning instead of a crash for dev purposes
     print(f"WARNING: Nuxt build not found at {NUXT_DIST_PATH}.")
 
+WALLPAPER_DIR = NUXT_DIST_PATH / "images" / "home_picture"
+if not WALLPAPER_DIR.is_dir():
+    # Fallback to local dev path if dist doesn't exist
+    WALLPAPER_DIR = Path("../frontend/public/images/home_picture/")
+wallpapers = WallpaperLibrary(str(WALLPAPER_DIR), image_pipeline)
+
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="backend_static")
 if NUXT_DIST_PATH.exists():
@@ -186,6 +420,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Writes through the API must not be answered from a snapshot taken before them;
+# the idle event that follows would arrive too late for the caller's immediate re-read.
+MPD_WRITE_GET_PREFIXES = ("/pi_queue_loadfrom_playlist/", "/pi_queue_add_folder/", "/pi_queue_saveto_playlist/")
+
+@app.middleware("http")
+async def invalidate_now_playing(request: Request, call_next):
+    response = await call_next(request)
+    path = request.url.path
+    if path.startswith("/pi_") and (request.method != "GET" or path.startswith(MPD_WRITE_GET_PREFIXES)):
+        now_playing.invalidate()
+    return response
+
 # --- API Endpoints ---
 
 @app.get("/favicon.ico")
@@ -223,7 +469,7 @@ async def serve_dynamic_payload(path: str):
 async def pi_mpd_connect():
     """Forces a reconnection attempt."""
     try:
-        mpd_player.connect()
+        await asyncio.to_thread(mpd_player.connect)
         if mpd_player.is_connected:
             return {"message": "Successfully connected to MPD."}
         else:
@@ -232,28 +478,72 @@ async def pi_mpd_connect():
         raise HTTPException(status_code=503, detail=f"Could not connect to MPD: {e}")
 
 @app.post("/pi_mpd_update")
-async def pi_mpd_update():
-    """Triggers an update of the MPD database."""
+async def pi_mpd_update(path: Optional[str] = None, wait: Optional[float] = None):
+    """
+    Triggers an update of the MPD database, or of `path` only (relative to the music
+    folder). Returns the job; a request covered by a job MPD has not started yet is
+    merged into it. With `wait` (seconds), responds once the job is done or the
+    time is up. Follow a job with /pi_mpd_update/{job} or /pi_mpd_update/{job}/stream.
+    """
     try:
-        mpd_player.update()
-        return {"message": "MPD database update initiated."}
+        job, merged = await mpd_player.call(mpd_updates.submit, path)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to update MPD database: {e}")
+    if job is None:
+        raise HTTPException(status_code=500, detail="Failed to update MPD database.")
+    if wait:
+        await mpd_updates.wait(job, min(wait, 300))
+    return {"message": "MPD database update initiated.", "merged": merged, **job.to_dict()}
+
+def update_job_or_404(job_id):
+    job = mpd_updates.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown update job {job_id}")
+    return job
+
+@app.get("/pi_mpd_update/{job_id}")
+async def pi_mpd_update_status(job_id: int, wait: Optional[float] = None):
+    """State of an update job (queued, running, done); with `wait`, waits for it first."""
+    job = update_job_or_404(job_id)
+    if wait:
+        await mpd_updates.wait(job, min(wait, 300))
+    return job.to_dict()
+
+@app.get("/pi_mpd_update/{job_id}/stream")
+async def pi_mpd_update_stream(job_id: int):
+    """NDJSON: one line per state change of the job, ending with "done"."""
+    job = update_job_or_404(job_id)
+
+    async def lines():
+        async for state in mpd_updates.events(job, timeout=600):
+            yield json.dumps(state, ensure_ascii=False) + "\n"
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.get("/pi_now_playing")
+async def get_pi_now_playing():
+    """
+    Returns status, current song and next song from one cached MPD snapshot.
+    `time` is the server epoch of the sample; clients interpolate elapsed from it.
+    """
+    snapshot = await now_playing.get()
+    if snapshot is None:
+        raise HTTPException(status_code=503, detail="MPD is not connected or unavailable")
+    return snapshot
 
 @app.get("/pi_mpd_status")
 async def get_pi_status():
     """Returns the current status of the MPD player."""
-    # get_status() handles reconnection internally now
-    status = mpd_player.get_status()
-    if status is None:
+    snapshot = await now_playing.get()
+    if snapshot is None:
         # If still None after auto-reconnect, then MPD is truly down
         raise HTTPException(status_code=503, detail="MPD is not connected or unavailable")
-    return status
+    return interpolated_status(snapshot)
 
 @app.get("/pi_get_current_song_duration")
 async def get_pi_current_song_duration():
     """Returns the total duration of the currently playing song."""
-    duration = mpd_player.get_current_song_duration()
+    snapshot = await now_playing.get()
+    duration = snapshot["status"].get("duration") if snapshot else None
     if duration is None:
         raise HTTPException(status_code=404, detail="Could not retrieve song duration.")
     return {"duration": duration}
@@ -261,126 +551,215 @@ async def get_pi_current_song_duration():
 @app.get("/pi_get_current_song_elapsed_time")
 async def get_pi_current_song_elapsed_time():
     """Returns the elapsed time of the currently playing song."""
-    elapsed = mpd_player.get_current_song_elapsed_time()
+    snapshot = await now_playing.get()
+    elapsed = interpolated_status(snapshot).get("elapsed") if snapshot else None
     if elapsed is None:
         raise HTTPException(status_code=404, detail="Could not retrieve elapsed time.")
     return {"elapsed": elapsed}
 
+@app.get("/pi_events")
+async def pi_events(request: Request):
+    """
+    Server-Sent Events stream of MPD changes (driven by MPD `idle`).
+    Each message carries the changed subsystems plus the current status and song,
+    so clients no longer need to poll /pi_mpd_status.
+    """
+    async def event_stream():
+        queue = mpd_events.subscribe()
+        try:
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle stream
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+        finally:
+            mpd_events.unsubscribe(queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 ### Pi MPD Control APIs
 @app.post("/pi_play")
 async def pi_play():
-    mpd_player.play()
+    await mpd_player.call(mpd_player.play)
     return {"message": "Playback started."}
     
 @app.post("/pi_playid/{song_id}")
 async def pi_playid(song_id: str):
     try:
-        mpd_player.client.playid(song_id)
+        await mpd_player.pool.execute_async("playid", song_id)
         return {"message": f"Playing song with id {song_id}."}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {e}")
 
 @app.post("/pi_pause")
 async def pi_pause():
-    mpd_player.pause()
+    await mpd_player.call(mpd_player.pause)
     return {"message": "Playback paused/unpaused."}
 
 @app.post("/pi_stop")
 async def pi_stop():
-    mpd_player.stop()
+    await mpd_player.call(mpd_player.stop)
     return {"message": "Playback stopped."}
 
 @app.post("/pi_next")
 async def pi_next():
-    mpd_player.next()
+    await mpd_player.call(mpd_player.next)
     return {"message": "Skipped to the next song."}
 
 @app.post("/pi_prev")
 async def pi_prev():
-    mpd_player.prev()
+    await mpd_player.call(mpd_player.prev)
     return {"message": "Skipped to the previous song."}
 
 @app.put("/pi_setvol/{volume}")
 async def pi_setvol(volume: int):
-    mpd_player.setvol(volume)
+    await mpd_player.call(mpd_player.setvol, volume)
     return {"message": f"Volume set to {volume}."}
 
 @app.put("/pi_seekcur/{time}")
 async def pi_seekcur(time: float):
-    mpd_player.seekcur(time)
+    await mpd_player.call(mpd_player.seekcur, time)
     return {"message": f"Seeking to {time}s in current song."}
 
 @app.put("/pi_playmode")
 async def pi_playmode(repeat: Optional[bool] = None, random: Optional[bool] = None, single: Optional[bool] = None, costume: Optional[bool] = None):
     # We can rely on the controller or direct client access (which is wrapped in controller now ideally)
-    if repeat is not None: mpd_player.repeat(1 if repeat else 0)
-    if random is not None: mpd_player.random(1 if random else 0)
-    if single is not None: mpd_player.single(1 if single else 0)
-    if costume is not None: mpd_player.costume(1 if costume else 0)
+    if repeat is not None: await mpd_player.call(mpd_player.repeat, 1 if repeat else 0)
+    if random is not None: await mpd_player.call(mpd_player.random, 1 if random else 0)
+    if single is not None: await mpd_player.call(mpd_player.single, 1 if single else 0)
+    if costume is not None: await mpd_player.call(mpd_player.costume, 1 if costume else 0)
     return {"message": "Play mode updated."}
 
 @app.post("/pi_add_and_play_stream")
 async def pi_add_and_play_stream(payload: StreamRequest, current_user: User = Depends(get_current_user)):
+    health = radio_prober.health.get(payload.stream_url)
+    if health is not None and not health["alive"]:
+        # Dead at the last probe: look again now rather than let MPD sit in a connect timeout
+        health = await radio_prober.check(payload.stream_url)
+        if not health["alive"]:
+            raise HTTPException(status_code=503, detail=f"Station is not responding ({health['error']}).")
     try:
-        mpd_player.queue_clearsongs()
-        song_id = mpd_player.queue_add_songid(payload.stream_url)
+        await mpd_player.call(mpd_player.queue_clearsongs)
+        song_id = await mpd_player.call(mpd_player.queue_add_songid, radio_prober.playable_url(payload.stream_url))
         if song_id:
-            mpd_player.add_tagid(song_id, "title", payload.title)
-            mpd_player.add_tagid(song_id, "artist", payload.artist)
-        mpd_player.play()
+            await mpd_player.call(mpd_player.add_tagid, song_id, "title", payload.title)
+            await mpd_player.call(mpd_player.add_tagid, song_id, "artist", payload.artist)
+        await mpd_player.call(mpd_player.play)
         return {"status": "success", "message": "Stream added and is now playing."}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to play stream: {e}")
 
+### Radio stations
+@app.get("/api/radio/stations")
+async def get_radio_stations(ranked: bool = False):
+    """
+    Configured stations with their last probe: "health" (ok, slow, dead, unknown) and
+    "probe" (latencies, stream URL, ICY title). `ranked` puts healthy stations first.
+    """
+    if ranked:
+        return radio_prober.ranked()
+    return [radio_prober.state(station) for station in radio_prober.stations]
+
+@app.post("/api/radio/probe")
+async def probe_radio_stations():
+    """Reloads radio_stations.json and probes every station now."""
+    radio_prober.reload()
+    await radio_prober.probe_all()
+    return radio_prober.ranked()
+
+@app.post("/pi_load_radiostreams")
+async def pi_load_radiostreams(include_dead: bool = False):
+    """Replaces the queue with the stations, healthiest first; dead ones are left out unless asked for."""
+    stations = [state for state in radio_prober.ranked() if include_dead or state["health"] != "dead"]
+    streams = {state["name"]: radio_prober.playable_url(state["url"]) for state in stations}
+    result = await mpd_player.call(mpd_player.queue_load_radiostreams, streams)
+    if result is None:
+        raise HTTPException(status_code=500, detail="Failed to load radio streams.")
+    return {"loaded": len(streams) - len(result["failed"]), "skipped": len(radio_prober.stations) - len(stations),
+            "failed": result["failed"]}
+
 @app.get("/pi_mpd_browse/")
 @app.get("/pi_mpd_browse/{path:path}")
 async def pi_mpd_browse(path: Optional[str] = None):
     """Browses the MPD music directory."""
     browse_path = path if path else ""
     try:
-        return mpd_player.browse_directory(browse_path)
+        return await mpd_player.call(mpd_player.browse_directory, browse_path)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to browse directory: {e}")
 
 ### Pi MPD Queue APIs
 # Define the queue OUTSIDE the functions
 #pi_queue_songs = []
+async def queue_window_or_503(offset, limit):
+    window = await mpd_player.call(mpd_player.queue_get_window, offset or 0, limit or 100)
+    if window is None:
+        raise HTTPException(status_code=503, detail="MPD is not connected or unavailable")
+    return window
+
 @app.get("/pi_queue_songs")
-async def pi_queue_files():
-    return mpd_player.queue_get_songs()
+async def pi_queue_files(offset: Optional[int] = None, limit: Optional[int] = None):
+    """
+    Whole queue by default. With `offset`/`limit` returns one page:
+    {"total", "version", "offset", "songs"} (for virtual-scrolling lists).
+    """
+    if offset is not None or limit is not None:
+        return await queue_window_or_503(offset, limit)
+    return await mpd_player.call(mpd_player.queue_get_songs)
+
+@app.get("/pi_queue_changes")
+async def pi_queue_changes(since: Optional[int] = None, started: Optional[int] = None):
+    """
+    Incremental queue sync. Pass `version` and `started` from the previous response
+    as `since` and `started` to receive only the changed entries.
+    """
+    changes = await mpd_player.call(mpd_player.queue_get_changes, since, started)
+    if changes is None:
+        raise HTTPException(status_code=503, detail="MPD is not connected or unavailable")
+    return changes
 
 @app.get("/pi_queue_songsid")
-async def pi_queue_filesid():
-    return mpd_player.queue_get_songsid()
+async def pi_queue_filesid(offset: Optional[int] = None, limit: Optional[int] = None):
+    # playlistinfo pages carry Id as well, so the windowed form is shared with /pi_queue_songs
+    if offset is not None or limit is not None:
+        return await queue_window_or_503(offset, limit)
+    return await mpd_player.call(mpd_player.queue_get_songsid)
 @app.delete("/pi_queue_clearsongs")
 async def pi_queue_clearsongs():
-    return mpd_player.queue_clearsongs()
+    return await mpd_player.call(mpd_player.queue_clearsongs)
 
 @app.post("/pi_queue_add_song")
 async def pi_queue_add_song(song: SongRequest):
-    mpd_player.queue_add_song(song.path)
+    await mpd_player.call(mpd_player.queue_add_song, song.path)
     return {"message": f"Song '{song.path}' added to the queue."}
 
 @app.get("/pi_queue_add_folder/{foldername:path}")  # <--- Note the :path here
 async def pi_gen_playlist(foldername:str):
-    mpd_player.queue_add_folder(foldername)
+    await mpd_player.call(mpd_player.queue_add_folder, foldername)
     return {"message": f"Folder {foldername} added."}
 
 @app.get("/pi_queue_current_song")
 async def pi_queue_current_song():
-    current_song = mpd_player.queue_current_song()
-    if current_song is None:
+    snapshot = await now_playing.get()
+    if snapshot is None:
         return {"message": "No song is currently playing."}
-    return current_song
+    return snapshot["currentsong"]
     
 @app.get("/pi_queue_loadfrom_playlist/{pi_plname}")
 async def pi_load_playlist_to_queue(pi_plname:str):
-    mpd_player.queue_loadfrom_playlist(pi_plname)
+    await mpd_player.call(mpd_player.queue_loadfrom_playlist, pi_plname)
     return {"message": f"Loading '{pi_plname}'."}
     
 @app.get("/pi_queue_saveto_playlist/{pi_plname}")
 async def pi_queue_save_to_playlist(pi_plname:str):
-    mpd_player.queue_saveto_playlist(pi_plname)
+    await mpd_player.call(mpd_player.queue_saveto_playlist, pi_plname)
     return {"message": "Playlist saved."}
 
 
@@ -388,12 +767,12 @@ async def pi_queue_save_to_playlist(pi_plname:str):
 ### Pi MPD Playlist APIs    
 @app.get("/pi_get_playlists_List")
 async def pi_get_playlist_List():
-    return mpd_player.get_playlist_List()
+    return await mpd_player.call(mpd_player.get_playlist_List)
 
 @app.put("/pi_playlist_renamepl/{old_name}/{new_name}")
 async def pi_playlist_renamepl(old_name: str, new_name: str):
     try:
-        mpd_player.playlist_renamepl(old_name, new_name)
+        await mpd_player.call(mpd_player.playlist_renamepl, old_name, new_name)
         return {"message": f"Playlist '{old_name}' renamed to '{new_name}' successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error renaming playlist: {e}")
@@ -401,25 +780,42 @@ async def pi_playlist_renamepl(old_name: str, new_name: str):
 @app.delete("/pi_playlist_rmpl/{pi_plname}")
 async def pi_playlist_rmpl(pi_plname: str):
     try:
-        mpd_player.playlist_rmpl(pi_plname)
+        await mpd_player.call(mpd_player.playlist_rmpl, pi_plname)
         return {"message": f"Playlist '{pi_plname}' deleted successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error deleting playlist: {e}")
     
 @app.get("/pi_playlist_songs/{pi_plname}")
-async def pi_playlist_songs(pi_plname: str):
-    return mpd_player.playlist_songs(pi_plname)
+async def pi_playlist_songs(pi_plname: str, offset: Optional[int] = None, limit: Optional[int] = None):
+    """All URIs by default; with `offset`/`limit` returns {"total", "offset", "songs"}."""
+    if offset is not None or limit is not None:
+        window = await mpd_player.call(mpd_player.playlist_songs_window, pi_plname, offset or 0, limit or 100)
+        if window is None:
+            raise HTTPException(status_code=503, detail="MPD is not connected or unavailable")
+        return window
+    return await mpd_player.call(mpd_player.playlist_songs, pi_plname)
+
+@app.get("/pi_playlists_containing/{uri:path}")
+async def pi_playlists_containing(uri: str):
+    """Lists the stored playlists that already contain the given song URI."""
+    return await mpd_player.call(mpd_player.playlists_containing, uri)
 
 @app.get("/pi_playlist_songsinfo/{pi_plname}")
-async def pi_playlist_songsinfo(pi_plname: str):
-    return mpd_player.playlist_songsinfo(pi_plname)
+async def pi_playlist_songsinfo(pi_plname: str, offset: Optional[int] = None, limit: Optional[int] = None):
+    """All entries by default; with `offset`/`limit` returns {"total", "offset", "songs"}."""
+    if offset is not None or limit is not None:
+        window = await mpd_player.call(mpd_player.playlist_songsinfo_window, pi_plname, offset or 0, limit or 100)
+        if window is None:
+            raise HTTPException(status_code=503, detail="MPD is not connected or unavailable")
+        return window
+    return await mpd_player.call(mpd_player.playlist_songsinfo, pi_plname)
 
 @app.delete("/pi_playlist_deletesong/{pi_plname}/{songpos}")
 async def pi_playlist_deletesong(pi_plname: str, songpos: int):
     try:
         # MPD is 0-indexed, so we might need to adjust if the user provides a 1-based index.
         # Assuming the user provides a 0-based index for now.
-        mpd_player.playlist_deletesong(pi_plname, songpos)
+        await mpd_player.call(mpd_player.playlist_deletesong, pi_plname, songpos)
         return {"message": f"Song at position {songpos} deleted from playlist '{pi_plname}'."}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error deleting song from playlist: {e}")
@@ -427,7 +823,7 @@ async def pi_playlist_deletesong(pi_plname: str, songpos: int):
 @app.post("/pi_playlistdeletesong")
 async def pi_playlistdeletesong_post(payload: PlaylistDeleteSongPayload):
     try:
-        mpd_player.playlist_deletesong(payload.pi_plname, payload.songpos)
+        await mpd_player.call(mpd_player.playlist_deletesong, payload.pi_plname, payload.songpos)
         return {"message": f"Song at position {payload.songpos} deleted from playlist '{payload.pi_plname}'."}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error deleting song from playlist: {e}")
@@ -435,7 +831,7 @@ async def pi_playlistdeletesong_post(payload: PlaylistDeleteSongPayload):
 @app.delete("/pi_playlist_clearsongs/{pi_plname}")
 async def pi_playlist_clearsongs(pi_plname: str):
     try:
-        mpd_player.playlist_clearsongs(pi_plname)
+        await mpd_player.call(mpd_player.playlist_clearsongs, pi_plname)
         return {"message": f"Playlist '{pi_plname}' cleared."}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error clearing playlist: {e}")
@@ -443,18 +839,20 @@ async def pi_playlist_clearsongs(pi_plname: str):
 @app.post("/pi_playlist_adduri/{pi_plname}/{uri:path}")
 async def pi_playlist_adduri(pi_plname: str, uri: str):
     try:
-        mpd_player.playlist_add_song(pi_plname, uri)
+        await mpd_player.call(mpd_player.playlist_add_song, pi_plname, uri)
         return {"message": f"URI '{uri}' added to playlist '{pi_plname}'."}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error adding URI to playlist: {e}")
 
 @app.post("/pi_playlist_add_folder/{pi_plname}/{foldername:path}")
-async def pi_playlist_add_folder(pi_plname: str, foldername: str):
+async def pi_playlist_add_folder(pi_plname: str, foldername: str, stream: bool = False):
     try:
         folder_for_mpd = foldername
         if foldername == 'ALL_FILES':
             folder_for_mpd = '.'
-        result = mpd_player.playlist_add_folder(pi_plname, folder_for_mpd)
+        if stream:
+            return stream_batch_progress(mpd_player.playlist_add_folder, pi_plname, folder_for_mpd)
+        result = await mpd_player.call(mpd_player.playlist_add_folder, pi_plname, folder_for_mpd)
         if "error" in result:
              raise HTTPException(status_code=404, detail=result["error"])
         return result
@@ -462,89 +860,235 @@ async def pi_playlist_add_folder(pi_plname: str, foldername: str):
         raise HTTPException(status_code=500, detail=f"Error adding folder to playlist: {e}")
 @app.post("/playlist/add_youtube_song")
 async def add_youtube_song(payload: YouTubeAddPayload):
+    """
+    Adds YouTube videos (single URLs, or every video of a playlist URL) to a stored
+    playlist. Videos are resolved concurrently to check them and warm the cache, but
+    the playlist stores /yt/<id> references that stay valid after stream URLs expire.
+    """
+    urls = ([payload.youtube_url] if payload.youtube_url else []) + payload.youtube_urls
+    if not urls:
+        raise HTTPException(status_code=400, detail="No YouTube URL given.")
     try:
-        # Use yt-dlp to get the direct audio URL
-        process = await asyncio.create_subprocess_exec(
-            'yt-dlp',
-            '-f', 'bestaudio/best',
-            '--get-url',
-            '--no-playlist',  # <--- ADD THIS LINE HERE
-            payload.youtube_url,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        stdout, stderr = await process.communicate()
-
-        if process.returncode != 0:
-            raise HTTPException(status_code=500, detail=f"yt-dlp error: {stderr.decode()}")
-
-        stream_url = stdout.decode().strip()
-
-        # Add the stream URL to the playlist
-        mpd_player.playlist_add_song(payload.playlist_name, stream_url)
-
-        return {"message": f"Successfully added video from {payload.youtube_url} to playlist {payload.playlist_name}."}
-
-    except FileNotFoundError:
-        raise HTTPException(status_code=500, detail="yt-dlp is not installed or not in PATH.")
+        ids = []
+        for url in urls:
+            ids.extend(await youtube.expand(url))
+        ids = list(dict.fromkeys(ids))
+        entries, failed = await youtube.resolve_many(ids)
+    except YouTubeError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+    def add_references():
+        refs = [youtube.stable_url(entry["id"]) for entry in entries]
+        refs = [ref for ref in refs if not mpd_player.stored_playlists.contains(payload.playlist_name, ref)]
+        return mpd_player.playlist_update_entries(payload.playlist_name, add=refs)
+    try:
+        result = await mpd_player.call(add_references)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing YouTube URL: {e}")
+        raise HTTPException(status_code=500, detail=f"Error adding YouTube videos to playlist: {e}")
+    return {
+        "message": f"Added {result['done']} of {len(ids)} video(s) to playlist {payload.playlist_name}.",
+        "added": result["done"],
+        "videos": [{"id": entry["id"], "title": entry["title"]} for entry in entries],
+        "failed": failed + result["failed"],
+    }
+
+@app.get("/yt/{video_id}")
+async def youtube_stream(video_id: str, refresh: bool = False):
+    """Stable stream reference: redirects to the cached (or freshly resolved) stream URL."""
+    try:
+        entry = await youtube.resolve(video_id, force=refresh)
+    except YouTubeError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    return RedirectResponse(entry["stream_url"], status_code=302)
 
 @app.post("/pi_playlist/save_selection")
-async def pi_playlist_save_selection(payload: SaveSelectionPayload):
+async def pi_playlist_save_selection(payload: SaveSelectionPayload, stream: bool = False):
     try:
-        result = mpd_player.pi_save_selection_to_playlist(payload.playlist_name, payload.songs)
+        if stream:
+            return stream_batch_progress(mpd_player.pi_save_selection_to_playlist, payload.playlist_name, payload.songs)
+        result = await mpd_player.call(mpd_player.pi_save_selection_to_playlist, payload.playlist_name, payload.songs)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error saving selection to playlist: {e}")
 
-### Cron Job APIs
+### Scheduled playback (alarms) and sleep timer
 @app.get("/api/cron")
 async def get_cron_jobs():
-    return cron_service.get_cron_jobs()
+    """All alarms, soonest first, each with its crontab-style `schedule` and `next_run`."""
+    return scheduler.list()
 
 @app.post("/api/cron")
 async def add_cron_job(payload: CronJobPayload):
+    """Creates or replaces the alarm `name`; its playlist is created from the folder of the same name if missing."""
+    playlist = payload.playlist or payload.name
     try:
-        return cron_service.add_cron_job(payload.hour, payload.minute, payload.day_of_week)
+        if not await mpd_player.call(mpd_player.pool.ping):
+            raise Exception("MPD is not connected.")
+        await mpd_player.call(mpd_player.create_playlist_if_not_exists, playlist, playlist)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    try:
+        job = await scheduler.save(payload.name, payload.hour, payload.minute, payload.day_of_week,
+                                   playlist, payload.volume, payload.fade_seconds, payload.enabled)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    days = job["days"] or "*"
+    return {"message": f"Job '{job['name']}' scheduled at {job['hour']:02d}:{job['minute']:02d} on days {days}.", **job}
 
 @app.delete("/api/cron")
 async def remove_cron_job():
-    return cron_service.remove_cron_job()
+    removed = await scheduler.remove()
+    return {"message": f"{removed} scheduled job(s) removed." if removed else "No scheduled job found to remove."}
+
+@app.delete("/api/cron/{name}")
+async def remove_named_cron_job(name: str):
+    if not await scheduler.remove([name]):
+        raise HTTPException(status_code=404, detail=f"No scheduled job named '{name}'")
+    return {"message": f"Job '{name}' removed."}
+
+@app.get("/api/cron/history")
+async def get_cron_history():
+    """Recent alarm firings with how late (ms) the command list went out and was acknowledged."""
+    return list(scheduler.history)
+
+@app.get("/api/sleep")
+async def get_sleep_timer():
+    return {"timer": scheduler.sleep_state()}
+
+@app.post("/api/sleep")
+async def start_sleep_timer(payload: SleepTimerPayload):
+    """Fades out and pauses MPD after `minutes`, whether or not a browser is still open."""
+    if payload.minutes <= 0:
+        raise HTTPException(status_code=400, detail="minutes must be positive")
+    return {"timer": scheduler.start_sleep(payload.minutes, payload.fade_seconds)}
+
+@app.delete("/api/sleep")
+async def cancel_sleep_timer():
+    return {"cancelled": scheduler.cancel_sleep()}
+
+### Lyrics
+@app.get("/api/lyrics/{path:path}")
+def get_lyrics(path: str, background_tasks: BackgroundTasks, prefetch: List[str] = Query(default=[])):
+    """
+    Parsed lyrics for a library track: {"path", "has_lyrics", "lines": [{"time", "text"}]}.
+    Tracks without lyrics answer from the index (no 404). `prefetch` names the tracks
+    that play next; their lyrics are parsed after the response is sent.
+    """
+    lines = lyrics_service.get(path)
+    if prefetch:
+        background_tasks.add_task(lyrics_service.prefetch, prefetch[:LYRICS_PREFETCH])
+    return {"path": path, "has_lyrics": lines is not None, "lines": lines or []}
+
+### Album art
+# Browsers revalidate with If-None-Match after a day; a cover change yields a new ETag
+ART_CACHE_CONTROL = "public, max-age=86400, stale-while-revalidate=604800"
+
+@app.get("/api/art/{path:path}")
+async def get_album_art(path: str, request: Request, size: int = 256):
+    """JPEG cover thumbnail for a library track; `size` is rounded up to 96, 256 or 512."""
+    try:
+        result = await asyncio.to_thread(artwork.thumbnail, path, size)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Track '{path}' not found")
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"No cover art for '{path}'")
+    etag, thumb = result
+    headers = {"ETag": etag, "Cache-Control": ART_CACHE_CONTROL}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return FileResponse(thumb, media_type="image/jpeg", headers=headers)
 
 ### PC Player API
 @app.get("/pc_get_allfiles")
 async def pc_get_allfiles(
+    ndjson: bool = False,
+    current_user: User = Depends(get_current_user)
+):
+    return stream_filelist('', ndjson)
+
+@app.get("/api/search", response_model=SearchResponse)
+async def api_search(
+    q: str,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    fileslist = genFilelist('')
-    return fileslist
+    """Ranked full-text search over library paths and tags."""
+    limit = max(1, min(limit, 200))
+    offset = int(cursor) if cursor and cursor.isdigit() else 0
+    results, has_more = await run_db(search_tracks, db, q, limit, offset)
+    return {"results": results, "next_cursor": str(offset + limit) if has_more else None}
+
+@app.get("/api/search/suggest", response_model=SuggestResponse)
+async def api_search_suggest(
+    q: str,
+    limit: int = 10,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Prefix autocomplete over titles, artists and albums."""
+    return {"suggestions": await run_db(suggest, db, q, max(1, min(limit, 50)))}
+
+@app.get("/api/library/scan")
+async def get_library_scan(current_user: User = Depends(get_current_user)):
+    """Throughput and counts of the last catalog scan."""
+    return {"running": library_scanner.running, "stats": library_scanner.stats}
+
+@app.post("/api/library/scan")
+async def start_library_scan(current_user: User = Depends(get_current_user)):
+    """Starts a catalog rescan in the background; unchanged files are skipped."""
+    if library_scanner.running:
+        return {"message": "A library scan is already running."}
+    asyncio.create_task(asyncio.to_thread(library_scanner.scan))
+    return {"message": "Library scan started."}
 
 @app.get("/pc_get_playlist_List", response_model=PlaylistsListResponse)
 async def pc_get_playlists_list(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    playlist_names_tuples = db.query(UserPlaylist.playlist_name).filter(UserPlaylist.user_id == current_user.id).all()
+    user_id = current_user.id
+    playlist_names_tuples = await run_db(
+        lambda: db.query(UserPlaylist.playlist_name).filter(UserPlaylist.user_id == user_id).all())
     playlist_names = [name for (name,) in playlist_names_tuples]
     return {"names": playlist_names}
 
+def pc_playlist_or_404(db, user_id, pc_plname):
+    playlist = find_playlist(db, user_id, pc_plname)
+    if not playlist:
+        raise HTTPException(status_code=404, detail=f"Playlist '{pc_plname}' not found")
+    return playlist
+
+# The PC playlist handlers do their Session work in one function on the DB pool
+# (run_db), so SQLite I/O never runs on the event loop.
+
 @app.get("/pc_playlist_files/{pc_plname}")
 async def pc_playlist_files(
     pc_plname :str,
+    offset: Optional[int] = None,
+    limit: Optional[int] = None,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    user_playlist = db.query(UserPlaylist).filter(
-        UserPlaylist.user_id == current_user.id,
-        UserPlaylist.playlist_name == pc_plname
-    ).first()
-
-    if user_playlist:
-        return json.loads(user_playlist.playlist_data)
-    return []
+    """
+    The playlist's file paths. With `offset`/`limit`, returns one page as
+    {"total", "offset", "songs"} instead of the whole list.
+    """
+    user_id = current_user.id
+    paged = offset is not None or limit is not None
+    offset = max(0, offset or 0)
+    limit = max(1, min(limit or 100, MAX_PAGE))
+
+    def read():
+        user_playlist = find_playlist(db, user_id, pc_plname)
+        if not user_playlist:
+            return PlaylistItemsPage(total=0, offset=offset, songs=[]) if paged else []
+        if not paged:
+            return read_items(db, user_playlist.id)
+        return PlaylistItemsPage(total=count_items(db, user_playlist.id), offset=offset,
+                                 songs=read_items(db, user_playlist.id, offset, limit))
+    return await run_db(read)
 
 @app.post("/pc_playlist_saveto_list/{pc_plname}")
 async def pc_playlist_saveto_list(
@@ -553,28 +1097,106 @@ async def pc_playlist_saveto_list(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    user_playlist = db.query(UserPlaylist).filter(
-        UserPlaylist.user_id == current_user.id,
-        UserPlaylist.playlist_name == pc_plname
-    ).first()
+    """Replaces the whole playlist (creating it if needed); use /pc_playlist_items for small edits."""
+    user_id = current_user.id
 
-    playlist_data_json = json.dumps(payload.songs)
-
-    if user_playlist:
-        user_playlist.playlist_data = playlist_data_json
+    def save():
+        existed = find_playlist(db, user_id, pc_plname) is not None
+        user_playlist = get_or_create_playlist(db, user_id, pc_plname)
+        replace_items(db, user_playlist.id, payload.songs)
         db.commit()
-        db.refresh(user_playlist)
+        return existed
+    if await run_db(save):
         return {"message": f"Playlist '{pc_plname}' updated successfully"}
-    else:
-        new_playlist = UserPlaylist(
-            user_id=current_user.id,
-            playlist_name=pc_plname,
-            playlist_data=playlist_data_json
-        )
-        db.add(new_playlist)
+    return {"message": f"Playlist '{pc_plname}' created successfully"}
+
+@app.post("/pc_playlist_items/{pc_plname}")
+async def pc_playlist_insert_items(
+    pc_plname: str,
+    payload: PlaylistItemsPayload,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Inserts songs at `position` or appends them, creating the playlist if needed."""
+    user_id = current_user.id
+
+    def insert():
+        user_playlist = get_or_create_playlist(db, user_id, pc_plname)
+        position = insert_items(db, user_playlist.id, payload.songs, payload.position)
+        total = count_items(db, user_playlist.id)
+        db.commit()
+        return {"position": position, "total": total}
+    return await run_db(insert)
+
+@app.delete("/pc_playlist_items/{pc_plname}/{position}")
+async def pc_playlist_delete_item(
+    pc_plname: str,
+    position: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    user_id = current_user.id
+
+    def delete():
+        user_playlist = pc_playlist_or_404(db, user_id, pc_plname)
+        if not delete_at(db, user_playlist.id, position):
+            raise HTTPException(status_code=404, detail=f"No song at position {position} in '{pc_plname}'")
+        db.commit()
+    await run_db(delete)
+    return {"message": f"Song at position {position} deleted from playlist '{pc_plname}'."}
+
+@app.post("/pc_playlist_items/{pc_plname}/remove")
+async def pc_playlist_remove_items(
+    pc_plname: str,
+    payload: PlaylistPayload,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Removes every entry of the given paths (e.g. un-favoriting a song)."""
+    user_id = current_user.id
+
+    def remove():
+        user_playlist = pc_playlist_or_404(db, user_id, pc_plname)
+        removed = remove_paths(db, user_playlist.id, payload.songs)
+        total = count_items(db, user_playlist.id)
+        db.commit()
+        return {"removed": removed, "total": total}
+    return await run_db(remove)
+
+@app.put("/pc_playlist_items/{pc_plname}/move")
+async def pc_playlist_move_item(
+    pc_plname: str,
+    payload: PlaylistMovePayload,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    user_id = current_user.id
+
+    def move():
+        user_playlist = pc_playlist_or_404(db, user_id, pc_plname)
+        if not move_item(db, user_playlist.id, payload.from_pos, payload.to_pos):
+            raise HTTPException(status_code=404, detail=f"No song at position {payload.from_pos} in '{pc_plname}'")
+        db.commit()
+    await run_db(move)
+    return {"message": f"Song moved from {payload.from_pos} to {payload.to_pos} in playlist '{pc_plname}'."}
+
+@app.put("/pc_playlist_renamepl/{old_name}/{new_name}")
+async def pc_playlist_renamepl(
+    old_name: str,
+    new_name: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    user_id = current_user.id
+
+    def rename():
+        user_playlist = pc_playlist_or_404(db, user_id, old_name)
+        if find_playlist(db, user_id, new_name):
+            raise HTTPException(status_code=409, detail=f"Playlist '{new_name}' already exists")
+        user_playlist.playlist_name = new_name
         db.commit()
-        db.refresh(new_playlist)
-        return {"message": f"Playlist '{pc_plname}' created successfully"}
+    await run_db(rename)
+    return {"message": f"Playlist '{old_name}' renamed to '{new_name}'."}
 
 @app.delete("/pc_playlist_rmpl/{pc_plname}")
 async def pc_playlist_rmpl(
@@ -582,16 +1204,12 @@ async def pc_playlist_rmpl(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    playlist_to_delete = db.query(UserPlaylist).filter(
-        UserPlaylist.user_id == current_user.id,
-        UserPlaylist.playlist_name == pc_plname
-    ).first()
-
-    if not playlist_to_delete:
-        raise HTTPException(status_code=404, detail=f"Playlist '{pc_plname}' not found")
+    user_id = current_user.id
 
-    db.delete(playlist_to_delete)
-    db.commit()
+    def remove_playlist():
+        delete_playlist(db, pc_playlist_or_404(db, user_id, pc_plname))
+        db.commit()
+    await run_db(remove_playlist)
     return {"message": f"Playlist '{pc_plname}' deleted successfully"}
 
 @app.get("/pc_browse/")
@@ -637,6 +1255,7 @@ async def pc_browse(
 @app.get("/pc_gen_fileslist/{foldername}")
 async def pc_gen_fileslist(
     foldername :str,
+    ndjson: bool = False,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):  
@@ -645,22 +1264,51 @@ async def pc_gen_fileslist(
         path_to_scan = '.'
             
     folderpath = path_to_scan.replace(" ", "/")
-    fileslist = genFilelist(folderpath)
-    return fileslist
+    return stream_filelist(folderpath, ndjson)
+
+### HLS (PC player)
+# Segments are immutable for a given file version (the cache key includes its mtime)
+HLS_SEGMENT_HEADERS = {"Cache-Control": "public, max-age=86400"}
+
+@app.get("/api/hls/{path:path}/master.m3u8")
+async def hls_master(path: str):
+    """Multi-bitrate HLS entry point for a library track (relative to the music folder)."""
+    try:
+        playlist = hls_packager.master_playlist(path)
+    except HLSError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    return Response(playlist, media_type="application/vnd.apple.mpegurl")
+
+@app.get("/api/hls/{path:path}/{profile}/index.m3u8")
+async def hls_media_playlist(path: str, profile: str):
+    try:
+        playlist = await asyncio.to_thread(hls_packager.media_playlist, path, profile)
+    except HLSError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    return Response(playlist, media_type="application/vnd.apple.mpegurl")
+
+@app.get("/api/hls/{path:path}/{profile}/{segment}")
+async def hls_segment(path: str, profile: str, segment: str):
+    """Waits for the encoder only on the first play; cached renditions are plain file reads."""
+    try:
+        segment_path = await hls_packager.segment(path, profile, segment)
+    except HLSError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    return FileResponse(segment_path, media_type="video/iso.segment" if segment.endswith(".m4s") else "video/mp4",
+                        headers=HLS_SEGMENT_HEADERS)
 
 # --- User Management ---
 @app.post("/register", response_model=UserResponse)
-def register_user(user: UserCreate, db: Session = Depends(get_db)):
+async def register_user(user: UserCreate, db: Session = Depends(get_db)):
     DESIGNATED_CODE = "Happy"
     if user.code != DESIGNATED_CODE:
         raise HTTPException(status_code=400, detail="Invalid registration code")
     
     username_capitalized = user.username.upper()
-    db_user = db.query(User).filter(User.username == username_capitalized).first()
-    if db_user:
+    if await run_db(lambda: db.query(User.id).filter(User.username == username_capitalized).first()):
         raise HTTPException(status_code=400, detail="Username already registered")
     
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash_async(user.password)
     default_settings = {
         "show_lyrics": True,
         "show_radio_card": True,
@@ -674,26 +1322,23 @@ def register_user(user: UserCreate, db: Session = Depends(get_db)):
         hashed_password=hashed_password,
         settings=json.dumps(default_settings)
     )
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-
-    new_playlist = UserPlaylist(
-        user_id=db_user.id,
-        playlist_name="我的最愛",
-        playlist_data=json.dumps([])
-    )
-    db.add(new_playlist)
-    db.commit()
 
-    settings_dict = json.loads(db_user.settings) if db_user.settings else None
-    return UserResponse(id=db_user.id, username=db_user.username, settings=settings_dict)
+    def create():
+        # The user and their favorites playlist are written in one transaction
+        db.add(db_user)
+        db.flush()
+        db.add(UserPlaylist(user_id=db_user.id, playlist_name="我的最愛"))
+        user_id = db_user.id
+        db.commit()
+        return user_id
+    user_id = await run_db(create)
+    return UserResponse(id=user_id, username=username_capitalized, settings=default_settings)
 
 @app.post("/token", response_model=Token)
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     username_capitalized = form_data.username.upper()
-    user = db.query(User).filter(User.username == username_capitalized).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    user = await run_db(lambda: db.query(User).filter(User.username == username_capitalized).first())
+    if not user or not await verify_password_async(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -716,9 +1361,10 @@ async def update_user_settings(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
+    username = current_user.username
     current_user.settings = json.dumps(settings.dict())
-    db.commit()
-    db.refresh(current_user)
+    await run_db(db.commit)
+    principal_cache.invalidate(username)
     return {"message": "Settings updated successfully"}
 
 @app.put("/users/password")
@@ -727,14 +1373,15 @@ async def change_password(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    if not verify_password(password_data.current_password, current_user.hashed_password):
+    if not await verify_password_async(password_data.current_password, current_user.hashed_password):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Current password is incorrect")
     if len(password_data.new_password) < 6:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="New password must be at least 6 characters long")
     
-    current_user.hashed_password = get_password_hash(password_data.new_password)
-    db.commit()
-    db.refresh(current_user)
+    username = current_user.username
+    current_user.hashed_password = await get_password_hash_async(password_data.new_password)
+    await run_db(db.commit)
+    principal_cache.invalidate(username)
     return {"message": "Password changed successfully"}
 
 
@@ -744,29 +1391,74 @@ async def upload_user_picture(
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_user)
 ):
-    save_path = Path(f"../frontend/public/images/user_picture/{current_user.username}.jpg")
-    save_path.parent.mkdir(parents=True, exist_ok=True)
+    save_path = USER_PICTURE_DIR / f"{current_user.username}.jpg"
     try:
         image_data = await file.read()
-        with Image.open(io.BytesIO(image_data)) as img:
-            if img.mode in ('RGBA', 'P'):
-                img = img.convert('RGB')
-            img.save(save_path, 'jpeg')
+        # Decoding and encoding run on the image pool, not on the event loop
+        await asyncio.wrap_future(image_pipeline.submit(save_avatar, image_data, save_path))
+        image_pipeline.ensure("avatars", str(save_path), AVATAR_WIDTHS)
         return {"message": "Picture uploaded successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error uploading picture: {e}")
 
+def image_variant_url(kind, key, name):
+    return f"/api/images/{kind}/{key}/{name}"
+
 @app.get("/api/wallpaper-images")
 async def get_wallpaper_images():
-    image_dir = NUXT_DIST_PATH / "images" / "home_picture"   
-    if not image_dir.is_dir():
-        # Fallback to local dev path if dist doesn't exist
-        image_dir = Path("../frontend/public/images/home_picture/")
-        if not image_dir.is_dir():
-            return []
-    
-    images = [f"/images/home_picture/{p.name}" for p in image_dir.iterdir() if p.is_file()]
-    return images
+    # Listing is cached and only re-read when the folder's mtime changes
+    return [f"/images/home_picture/{name}" for name, _, _ in await asyncio.to_thread(wallpapers.listing)]
+
+@app.get("/api/wallpapers")
+async def get_wallpapers():
+    """
+    Wallpapers with responsive variants: `webp_srcset`/`jpeg_srcset` for <picture>,
+    the intrinsic size and an inline blurred placeholder. Pictures whose variants
+    are still being rendered only have `src`.
+    """
+    result = []
+    for name, key, manifest in await asyncio.to_thread(wallpapers.listing):
+        entry = {"src": f"/images/home_picture/{name}"}
+        if manifest:
+            for fmt in ("webp", "jpeg"):
+                entry[f"{fmt}_srcset"] = ", ".join(
+                    f"{image_variant_url('wallpapers', key, v[fmt])} {v['width']}w" for v in manifest["variants"]
+                )
+            entry.update(width=manifest["width"], height=manifest["height"], placeholder=manifest["placeholder"])
+        result.append(entry)
+    return result
+
+@app.get("/api/images/{kind}/{key}/{name}")
+async def get_image_variant(kind: str, key: str, name: str):
+    """Serves a rendered variant; keys change whenever the source changes, so URLs are immutable."""
+    if kind not in ("wallpapers", "avatars") or "/" in key or ".." in key or name == MANIFEST_NAME or "/" in name:
+        raise HTTPException(status_code=404, detail="Image not found")
+    path = image_pipeline.variant_path(kind, key, name)
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Image not found")
+    return FileResponse(path, headers={"Cache-Control": "public, max-age=31536000, immutable"})
+
+@app.get("/api/avatar/{username}")
+async def get_avatar(username: str, request: Request, size: int = 128):
+    """User picture resized to the smallest variant of at least `size` px, as WebP when accepted."""
+    if "/" in username or username.startswith("."):
+        raise HTTPException(status_code=404, detail="User picture not found")
+    source = USER_PICTURE_DIR / f"{username}.jpg"
+    if not source.is_file():
+        source = USER_PICTURE_DIR / "default.jpg"
+    try:
+        key, manifest = image_pipeline.manifest("avatars", str(source), AVATAR_WIDTHS)
+        if manifest is None:
+            key, manifest = await asyncio.wrap_future(image_pipeline.ensure("avatars", str(source), AVATAR_WIDTHS))
+    except Exception:
+        raise HTTPException(status_code=404, detail="User picture not found")
+    variant = next((v for v in manifest["variants"] if v["width"] >= size), manifest["variants"][-1])
+    fmt = "webp" if "image/webp" in request.headers.get("accept", "") else "jpeg"
+    etag = f'"{key}-{variant[fmt]}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=300", "Vary": "Accept"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return FileResponse(image_pipeline.variant_path("avatars", key, variant[fmt]), headers=headers)
 
 @app.post("/download_podcast")
 async def download_podcast(current_user: User = Depends(get_current_user)):
@@ -0,0 +1,311 @@
+# my_package/artwork.py
+import base64
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+import mutagen
+import mutagen.flac
+from mpd import CommandError as MPDCommandError
+from PIL import Image
+
+# Thumbnail edge lengths; requests are rounded up to the nearest one
+ART_SIZES = (96, 256, 512)
+COVER_NAMES = ('cover', 'folder', 'front', 'album', 'albumart')
+COVER_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+# ID3 / FLAC picture type for the front cover
+FRONT_COVER = 3
+# Ask MPD for larger binary chunks than its 8 KiB default (MPD 0.22.4+)
+MPD_BINARY_LIMIT = 1024 * 1024
+# Source -> hash entries kept in memory; older ones are re-read from their ref file
+MAX_REFS = 20000
+
+
+def embedded_picture(abs_path):
+    """Returns the embedded cover (front cover preferred) of an audio file, or None."""
+    try:
+        audio = mutagen.File(abs_path)
+    except Exception as e:
+        print(f"Error reading tags from '{abs_path}': {e}")
+        return None
+    if audio is None:
+        return None
+    pictures = list(getattr(audio, 'pictures', None) or [])  # FLAC
+    tags = audio.tags
+    if tags is not None:
+        if hasattr(tags, 'getall'):  # ID3 (MP3, AIFF, WAV)
+            pictures += tags.getall('APIC')
+        else:
+            covers = tags.get('covr') or []  # MP4
+            if covers:
+                return bytes(covers[0])
+            for encoded in tags.get('metadata_block_picture') or []:  # Ogg Vorbis / Opus
+                try:
+                    pictures.append(mutagen.flac.Picture(base64.b64decode(encoded)))
+                except Exception:
+                    continue
+    if not pictures:
+        return None
+    pictures.sort(key=lambda p: getattr(p, 'type', 0) != FRONT_COVER)
+    return pictures[0].data
+
+
+def _read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class ArtworkCache:
+    """
+    Cover art thumbnails for library tracks.
+
+    Art is looked up in order: a cover image in the track's folder, art
+    embedded in the file, then MPD `readpicture`. The image is decoded once
+    and every size in ART_SIZES is written under its content hash, so albums
+    sharing a cover share thumbnails. A small "ref" file maps each source
+    (cover file or track, with its mtime) to that hash, so later requests are a
+    stat and a file read: no tag parsing and no image decoding. Thumbnails are
+    bounded by `max_bytes` and evicted least recently served first; a ref to an
+    evicted hash is rebuilt on the next request.
+    """
+
+    def __init__(self, base_path, controller=None, cache_dir="art_cache", max_bytes=256 * 1024 ** 2):
+        self.base_path = base_path
+        self.controller = controller
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        # source key -> content hash ('' when the source has no art), least recently used first
+        self._refs = OrderedDict()
+        # content hash -> bytes of its thumbnails, least recently served first
+        self._lru = OrderedDict()
+        self._total = 0
+        # folder -> (folder mtime, cover file name or None)
+        self._folder_covers = {}
+        self._lock = threading.Lock()
+        # Cold extractions run one at a time, which also bounds CPU use on the Pi
+        self._extract_lock = threading.Lock()
+
+    @staticmethod
+    def snap_size(size):
+        return next((s for s in ART_SIZES if s >= size), ART_SIZES[-1])
+
+    def thumbnail_path(self, digest, size):
+        return os.path.join(self.cache_dir, "thumbs", digest[:2], f"{digest}-{size}.jpg")
+
+    # --- Cache bookkeeping ---
+
+    def load(self):
+        """Indexes the thumbnails on disk (oldest served first) and trims them to `max_bytes`."""
+        found = {}
+        thumbs = os.path.join(self.cache_dir, "thumbs")
+        os.makedirs(thumbs, exist_ok=True)
+        with os.scandir(thumbs) as shards:
+            for shard in shards:
+                if not shard.is_dir():
+                    continue
+                with os.scandir(shard.path) as it:
+                    for entry in it:
+                        digest, _, rest = entry.name.partition('-')
+                        if not rest.endswith('.jpg'):
+                            continue
+                        st = entry.stat()
+                        stamp, size = found.get(digest, (0, 0))
+                        found[digest] = (max(stamp, st.st_mtime), size + st.st_size)
+        with self._lock:
+            for digest, (_, size) in sorted(found.items(), key=lambda item: item[1][0]):
+                self._lru[digest] = size
+                self._total += size
+            self._evict()
+        print(f"Art cache: {len(self._lru)} covers, {self._total // (1024 * 1024)} MB.")
+
+    def _touch(self, digest, size):
+        with self._lock:
+            if digest not in self._lru:
+                return
+            self._lru.move_to_end(digest)
+        try:
+            # The mtime orders the LRU again after a restart
+            os.utime(self.thumbnail_path(digest, size))
+        except OSError:
+            pass
+
+    def _added(self, digest):
+        size = 0
+        for s in ART_SIZES:
+            try:
+                size += os.stat(self.thumbnail_path(digest, s)).st_size
+            except OSError:
+                pass
+        with self._lock:
+            self._total += size - self._lru.pop(digest, 0)
+            self._lru[digest] = size
+            self._evict()
+
+    def _evict(self):
+        # Called with self._lock held
+        while self._total > self.max_bytes and len(self._lru) > 1:
+            digest, size = self._lru.popitem(last=False)
+            self._total -= size
+            for s in ART_SIZES:
+                try:
+                    os.remove(self.thumbnail_path(digest, s))
+                except OSError:
+                    pass
+
+    # --- Sources ---
+
+    def _folder_cover(self, folder):
+        abs_folder = os.path.join(self.base_path, folder)
+        try:
+            mtime = os.stat(abs_folder).st_mtime_ns
+        except OSError:
+            return None
+        with self._lock:
+            cached = self._folder_covers.get(folder)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        cover = None
+        try:
+            with os.scandir(abs_folder) as it:
+                names = sorted(entry.name for entry in it if entry.is_file())
+        except OSError:
+            names = []
+        for name in names:
+            stem, ext = os.path.splitext(name.lower())
+            if stem in COVER_NAMES and ext in COVER_EXTENSIONS:
+                cover = name
+                break
+        with self._lock:
+            self._folder_covers[folder] = (mtime, cover)
+        return cover
+
+    def _source(self, path):
+        """Returns (source key, loader) for a track; the key changes when the art may have."""
+        folder = os.path.dirname(path)
+        cover = self._folder_cover(folder)
+        if cover:
+            cover_path = os.path.join(self.base_path, folder, cover)
+            st = os.stat(cover_path)
+            return f"file:{os.path.join(folder, cover)}:{st.st_mtime_ns}:{st.st_size}", lambda: _read_file(cover_path)
+        abs_path = os.path.join(self.base_path, path)
+        st = os.stat(abs_path)
+        return f"track:{path}:{st.st_mtime_ns}:{st.st_size}", lambda: embedded_picture(abs_path) or self._mpd_picture(path)
+
+    def _mpd_picture(self, path):
+        if self.controller is None:
+            return None
+        try:
+            with self.controller.pool.connection() as client:
+                try:
+                    client.binarylimit(MPD_BINARY_LIMIT)
+                except MPDCommandError:
+                    pass
+                # python-mpd2 reassembles the chunks into one 'binary' value
+                return client.readpicture(path).get('binary')
+        except Exception as e:
+            print(f"Error reading picture from MPD for '{path}': {e}")
+            return None
+
+    # --- Refs ---
+
+    def _ref_path(self, key):
+        name = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, "refs", name[:2], name)
+
+    def _remember(self, key, digest):
+        with self._lock:
+            self._refs[key] = digest
+            self._refs.move_to_end(key)
+            while len(self._refs) > MAX_REFS:
+                self._refs.popitem(last=False)
+
+    def _lookup(self, key):
+        with self._lock:
+            if key in self._refs:
+                self._refs.move_to_end(key)
+                return self._refs[key]
+        try:
+            with open(self._ref_path(key)) as f:
+                digest = f.read().strip()
+        except OSError:
+            return None
+        self._remember(key, digest)
+        return digest
+
+    def _forget(self, key):
+        with self._lock:
+            self._refs.pop(key, None)
+        try:
+            os.remove(self._ref_path(key))
+        except OSError:
+            pass
+
+    def _extract(self, key, loader):
+        with self._extract_lock:
+            digest = self._lookup(key)
+            if digest is not None:
+                return digest
+            data = loader()
+            digest = ''
+            if data:
+                digest = hashlib.sha1(data).hexdigest()
+                if not all(os.path.exists(self.thumbnail_path(digest, s)) for s in ART_SIZES):
+                    try:
+                        self._write_thumbnails(digest, data)
+                    except (Image.UnidentifiedImageError, Image.DecompressionBombError) as e:
+                        # Remembered as "no art", so the picture is not decoded again
+                        print(f"Error decoding art for '{key}': {e}")
+                        digest = ''
+                    else:
+                        self._added(digest)
+            _write_atomic(self._ref_path(key), digest.encode('ascii'))
+            self._remember(key, digest)
+            return digest
+
+    def _write_thumbnails(self, digest, data):
+        image = Image.open(io.BytesIO(data))
+        # JPEG can decode at reduced scale, which is much cheaper for large scans
+        image.draft('RGB', (ART_SIZES[-1], ART_SIZES[-1]))
+        image = image.convert('RGB')
+        for size in sorted(ART_SIZES, reverse=True):
+            image.thumbnail((size, size), Image.LANCZOS)
+            out = io.BytesIO()
+            image.save(out, 'JPEG', quality=85, optimize=True, progressive=True)
+            _write_atomic(self.thumbnail_path(digest, size), out.getvalue())
+
+    # --- Public ---
+
+    def thumbnail(self, path, size=256):
+        """
+        Returns (etag, thumbnail file) for a library track, or None if it has no art.
+        Raises FileNotFoundError for unknown tracks.
+        """
+        if os.path.isabs(path) or '..' in path.split('/'):
+            raise FileNotFoundError(path)
+        size = self.snap_size(size)
+        key, loader = self._source(path)
+        digest = self._lookup(key)
+        if digest and not os.path.exists(self.thumbnail_path(digest, size)):
+            # Thumbnails were deleted from the cache; forget the ref and rebuild them
+            self._forget(key)
+            digest = None
+        if digest is None:
+            try:
+                digest = self._extract(key, loader)
+            except (OSError, Image.UnidentifiedImageError, Image.DecompressionBombError) as e:
+                print(f"Error extracting art for '{path}': {e}")
+                return None
+        if not digest:
+            return None
+        self._touch(digest, size)
+        return f'"{digest}-{size}"', self.thumbnail_path(digest, size)
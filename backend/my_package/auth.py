@@ -1,3 +1,8 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 
@@ -7,7 +12,7 @@ from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
-from my_package.database import get_db
+from my_package.database import get_db, run_db
 from my_package.models import User
 
 # Configuration for JWT
@@ -18,12 +23,63 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 300
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# bcrypt takes hundreds of ms on a Pi; it runs here, never on the event loop.
+# Two workers keep a burst of logins from taking every core.
+_bcrypt_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="bcrypt")
+
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+async def verify_password_async(plain_password, hashed_password):
+    return await asyncio.get_running_loop().run_in_executor(_bcrypt_pool, verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password):
+    return await asyncio.get_running_loop().run_in_executor(_bcrypt_pool, get_password_hash, password)
+
+
+class PrincipalCache:
+    """
+    Bounded TTL cache of validated tokens -> detached User rows, so authenticated
+    requests skip the JWT decode and the user query. Entries never outlive the
+    token's own expiry. Call `invalidate(username)` whenever a user's password or
+    settings change.
+    """
+
+    def __init__(self, max_size=256, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # token -> (expires_at, user)
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return entry[1]
+
+    def put(self, token, user, token_expires_at):
+        with self._lock:
+            self._entries[token] = (min(time.time() + self.ttl, token_expires_at), user)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, username):
+        with self._lock:
+            for token in [t for t, (_, user) in self._entries.items() if user.username == username]:
+                del self._entries[token]
+
+
+principal_cache = PrincipalCache()
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -40,6 +96,10 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    cached = principal_cache.get(token)
+    if cached is not None:
+        # Attach a copy to this request's session without a query, so handlers can still modify and commit it
+        return db.merge(cached, load=False)
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
@@ -47,7 +107,9 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    user = db.query(User).filter(User.username == username).first()
+    user = await run_db(lambda: db.query(User).filter(User.username == username).first())
     if user is None:
         raise credentials_exception
-    return user
+    db.expunge(user)
+    principal_cache.put(token, user, payload.get("exp", 0))
+    return db.merge(user, load=False)
@@ -0,0 +1,244 @@
+# my_package/catalog.py
+import os
+import time
+from itertools import islice
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from .library import iter_music_files
+from .models import Track
+
+# Everything MPD can play from the library, not just what the PC player lists
+CATALOG_EXTENSIONS = ('.mp3', '.flac', '.ogg', '.oga', '.opus', '.m4a', '.aac', '.wav')
+# Trigram FTS needs at least this many characters per term; shorter terms use LIKE
+MIN_FTS_TERM = 3
+COMMIT_EVERY = 1000
+# Track columns filled from the tag reader; all of them are rewritten on every change
+TAG_COLUMNS = ("duration", "title", "artist", "album", "genre", "track_no")
+
+# External-content FTS5 table kept in sync with `tracks` by triggers.
+# The trigram tokenizer matches substrings, which is what CJK titles need
+# (unicode61 would treat a whole run of Han characters as one token).
+FTS_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS tracks_fts USING fts5(
+        path, title, artist, album,
+        content='tracks', content_rowid='id', tokenize='trigram'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS tracks_fts_ai AFTER INSERT ON tracks BEGIN
+        INSERT INTO tracks_fts(rowid, path, title, artist, album)
+        VALUES (new.id, new.path, new.title, new.artist, new.album);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS tracks_fts_ad AFTER DELETE ON tracks BEGIN
+        INSERT INTO tracks_fts(tracks_fts, rowid, path, title, artist, album)
+        VALUES ('delete', old.id, old.path, old.title, old.artist, old.album);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS tracks_fts_au AFTER UPDATE ON tracks BEGIN
+        INSERT INTO tracks_fts(tracks_fts, rowid, path, title, artist, album)
+        VALUES ('delete', old.id, old.path, old.title, old.artist, old.album);
+        INSERT INTO tracks_fts(rowid, path, title, artist, album)
+        VALUES (new.id, new.path, new.title, new.artist, new.album);
+    END""",
+]
+
+
+def init_catalog_fts(engine):
+    """Creates the FTS5 table and its triggers (call after Base.metadata.create_all)."""
+    with engine.begin() as conn:
+        for ddl in FTS_DDL:
+            conn.execute(text(ddl))
+
+
+def title_from_path(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def track_values(path, size, mtime, tags):
+    """
+    Full column set for one file. Tags missing from `tags` are written as NULL,
+    so a tag removed from the file also leaves the row and the FTS index.
+    """
+    values = {column: tags.get(column) or None for column in TAG_COLUMNS}
+    values["title"] = values["title"] or title_from_path(path)
+    return {"size": size, "mtime": mtime, **values}
+
+
+def sync_catalog(db: Session, base_path, tag_reader=None):
+    """
+    Brings `tracks` in line with the files under `base_path`.
+    Files whose (size, mtime) did not change are skipped. `tag_reader(abs_paths)`
+    (optional, e.g. a process pool's map) yields a dict of Track columns per path,
+    in order, for the new or changed files.
+    Returns scan stats: counts, bytes read, files/s, bytes/s throughput and the
+    directories whose contents changed (for targeted MPD updates).
+    """
+    started = time.perf_counter()
+    known = {path: (track_id, size, mtime)
+             for track_id, path, size, mtime in db.query(Track.id, Track.path, Track.size, Track.mtime)}
+    seen = set()
+    jobs = []
+    for path in iter_music_files(base_path, extensions=CATALOG_EXTENSIONS):
+        seen.add(path)
+        try:
+            st = os.stat(os.path.join(base_path, path))
+        except OSError:
+            continue
+        existing = known.get(path)
+        if existing and existing[1] == st.st_size and existing[2] == st.st_mtime:
+            continue
+        jobs.append((path, st.st_size, st.st_mtime, existing[0] if existing else None))
+
+    abs_paths = [os.path.join(base_path, path) for path, _, _, _ in jobs]
+    tags = iter(tag_reader(abs_paths) if tag_reader else ({} for _ in abs_paths))
+    changed = 0
+    bytes_read = 0
+    for start in range(0, len(jobs), COMMIT_EVERY):
+        chunk = jobs[start:start + COMMIT_EVERY]
+        # Tags are read before the first UPDATE opens SQLite's write transaction, so
+        # other writers only wait for the short apply-and-commit, never for tag parsing
+        chunk_tags = list(islice(tags, len(chunk)))
+        for (path, size, mtime, track_id), file_tags in zip(chunk, chunk_tags):
+            values = track_values(path, size, mtime, file_tags)
+            if track_id:
+                db.query(Track).filter(Track.id == track_id).update(values)
+            else:
+                db.add(Track(path=path, **values))
+            changed += 1
+            bytes_read += size
+        db.commit()
+
+    removed_ids = [track_id for path, (track_id, _, _) in known.items() if path not in seen]
+    for start in range(0, len(removed_ids), COMMIT_EVERY):
+        db.query(Track).filter(Track.id.in_(removed_ids[start:start + COMMIT_EVERY])).delete(synchronize_session=False)
+    db.commit()
+
+    seconds = time.perf_counter() - started
+    changed_dirs = {os.path.dirname(path) for path, _, _, _ in jobs}
+    changed_dirs |= {os.path.dirname(path) for path in known if path not in seen}
+    stats = {
+        "files": len(seen),
+        "changed": changed,
+        "removed": len(removed_ids),
+        "bytes": bytes_read,
+        "seconds": round(seconds, 3),
+        "files_per_s": round(changed / seconds, 1) if seconds else 0.0,
+        "bytes_per_s": round(bytes_read / seconds) if seconds else 0,
+        "changed_dirs": sorted(changed_dirs),
+    }
+    print(f"Catalog synced: {changed} added/updated, {len(removed_ids)} removed "
+          f"in {stats['seconds']}s ({stats['files_per_s']} files/s).")
+    return stats
+
+
+def upsert_track(db: Session, base_path, path, tags=None):
+    """Adds or refreshes one file (used by the library watcher). Returns False if it is gone."""
+    try:
+        st = os.stat(os.path.join(base_path, path))
+    except OSError:
+        return False
+    values = track_values(path, st.st_size, st.st_mtime, tags or {})
+    track = db.query(Track).filter(Track.path == path).first()
+    if track:
+        for key, value in values.items():
+            setattr(track, key, value)
+    else:
+        db.add(Track(path=path, **values))
+    return True
+
+
+def remove_tracks(db: Session, paths=(), prefixes=()):
+    """Deletes the given files and everything under the given directories."""
+    for start in range(0, len(paths), COMMIT_EVERY):
+        db.query(Track).filter(Track.path.in_(list(paths)[start:start + COMMIT_EVERY])).delete(synchronize_session=False)
+    for prefix in prefixes:
+        # Range on the unique path index instead of LIKE, which SQLite cannot index here
+        low = prefix.rstrip('/') + '/'
+        db.query(Track).filter(Track.path >= low, Track.path < low + chr(0x10FFFF)).delete(synchronize_session=False)
+
+
+def _escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def search_tracks(db: Session, q, limit=50, offset=0):
+    """
+    Ranked catalog search. Terms of 3+ characters use the trigram FTS index
+    (ranked by bm25, title weighted highest); shorter terms, common for two-
+    character CJK names, are applied as LIKE filters.
+    Returns up to `limit` rows plus a flag telling whether more exist.
+    """
+    terms = q.split()
+    if not terms:
+        return [], False
+    fts_terms = [t for t in terms if len(t) >= MIN_FTS_TERM]
+    like_terms = [t for t in terms if len(t) < MIN_FTS_TERM]
+
+    params = {"limit": limit + 1, "offset": offset}
+    where = []
+    for i, term in enumerate(like_terms):
+        params[f"like{i}"] = f"%{_escape_like(term)}%"
+        where.append(
+            f"(t.path LIKE :like{i} ESCAPE '\\' OR t.title LIKE :like{i} ESCAPE '\\'"
+            f" OR t.artist LIKE :like{i} ESCAPE '\\' OR t.album LIKE :like{i} ESCAPE '\\')"
+        )
+
+    if fts_terms:
+        params["match"] = " AND ".join('"' + t.replace('"', '""') + '"' for t in fts_terms)
+        sql = ("SELECT t.path, t.title, t.artist, t.album, t.duration FROM tracks_fts"
+               " JOIN tracks t ON t.id = tracks_fts.rowid WHERE tracks_fts MATCH :match")
+        if where:
+            sql += " AND " + " AND ".join(where)
+        sql += " ORDER BY bm25(tracks_fts, 1.0, 5.0, 3.0, 2.0), t.path"
+    else:
+        sql = ("SELECT t.path, t.title, t.artist, t.album, t.duration FROM tracks t WHERE "
+               + " AND ".join(where) + " ORDER BY t.title, t.path")
+    sql += " LIMIT :limit OFFSET :offset"
+
+    rows = [dict(row._mapping) for row in db.execute(text(sql), params)]
+    return rows[:limit], len(rows) > limit
+
+
+def suggest(db: Session, prefix, limit=10):
+    """
+    Search-as-you-type: distinct titles, artists, albums and library paths
+    (folder by folder) starting with `prefix`, so untagged files found by path
+    in search_tracks are suggested too. Uses a B-tree range scan on each
+    indexed column, so it works for any script.
+    """
+    if not prefix:
+        return []
+    upper = prefix + chr(0x10FFFF)
+    suggestions = []
+    for column in (Track.title, Track.artist, Track.album):
+        rows = (db.query(column).filter(column >= prefix, column < upper)
+                .distinct().order_by(column).limit(limit).all())
+        for (value,) in rows:
+            if value not in suggestions:
+                suggestions.append(value)
+    for value in _path_suggestions(db, prefix, upper, limit):
+        if value not in suggestions:
+            suggestions.append(value)
+    return suggestions[:limit]
+
+
+def _path_suggestions(db: Session, prefix, upper, limit):
+    """
+    Paths starting with `prefix`, cut at the next "/" after it: a folder is
+    suggested once, then the scan seeks past everything inside it.
+    """
+    values = []
+    low = prefix
+    while len(values) < limit:
+        row = (db.query(Track.path).filter(Track.path >= low, Track.path < upper)
+               .order_by(Track.path).first())
+        if row is None:
+            break
+        path = row[0]
+        cut = path.find('/', len(prefix))
+        if cut < 0:
+            values.append(path)
+            low = path + chr(1)
+        else:
+            values.append(path[:cut])
+            low = path[:cut] + chr(0x10FFFF)
+    return values
@@ -0,0 +1,310 @@
+# my_package/hls.py
+import asyncio
+import hashlib
+import math
+import os
+import shutil
+import subprocess
+import time
+from collections import OrderedDict
+
+import mutagen
+
+# name -> (ffmpeg encoder, bitrate, CODECS attribute, BANDWIDTH in bit/s)
+HLS_PROFILES = {
+    "aac-160": ("aac", "160k", "mp4a.40.2", 176000),
+    "aac-64": ("aac", "64k", "mp4a.40.2", 72000),
+    "opus-96": ("libopus", "96k", "opus", 104000),
+}
+SEGMENT_SECONDS = 6
+INIT_NAME = "init.mp4"
+SEGMENT_PATTERN = "seg_%05d.m4s"
+# Marker written once a rendition is fully encoded; its mtime is the LRU timestamp
+DONE_MARKER = ".done"
+# Playlist ffmpeg writes next to the segments; served once the rendition is finished
+FFMPEG_PLAYLIST = "ffmpeg.m3u8"
+# Renditions with a segment read this recently are never evicted (a client is playing them)
+PIN_SECONDS = 120
+# Probed durations kept in memory
+MAX_DURATIONS = 1024
+# The encoder cuts at whole audio frames (~21 ms); a remainder shorter than this
+# after the last full segment may not get a segment of its own
+FRAME_SLACK = 0.05
+
+
+class HLSError(Exception):
+    """Raised for anything the HLS endpoints should report as an HTTP error."""
+
+    def __init__(self, status_code, detail):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class HLSPackager:
+    """
+    Packages library tracks as VOD HLS (fragmented MP4 segments) on demand.
+
+    The first request for a (track, profile) starts one ffmpeg process that writes
+    every segment of the track into its own cache directory; playback can start as
+    soon as the first segment exists, and later segments are served as ffmpeg
+    produces them (encoding runs many times faster than real time). Finished
+    renditions stay on disk, so repeat plays are plain file reads. The cache is
+    bounded by `max_bytes` and evicts the least recently played renditions.
+    """
+
+    def __init__(self, base_path, cache_dir="hls_cache", max_bytes=2 * 1024 ** 3,
+                 max_encoders=2, segment_seconds=SEGMENT_SECONDS):
+        self.base_path = os.path.realpath(base_path)
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.segment_seconds = segment_seconds
+        self.ffmpeg = shutil.which("ffmpeg")
+        self.ffprobe = shutil.which("ffprobe")
+        self._encoders = asyncio.Semaphore(max_encoders)
+        # rendition key -> running encode task
+        self._jobs = {}
+        # finished rendition key -> size in bytes, least recently used first
+        self._lru = OrderedDict()
+        self._total = 0
+        # rendition key -> time.monotonic() of its last segment read
+        self._reads = {}
+        # rendition key -> duration listed in the playlist and passed to ffmpeg as -t
+        self._durations = OrderedDict()
+
+    @property
+    def available(self):
+        return self.ffmpeg is not None
+
+    # --- Cache bookkeeping ---
+
+    def load(self):
+        """Indexes finished renditions left on disk and removes half-written ones."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        found = []
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if not entry.is_dir():
+                    continue
+                try:
+                    stamp = os.stat(os.path.join(entry.path, DONE_MARKER)).st_mtime
+                except OSError:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                    continue
+                found.append((stamp, entry.name, _dir_size(entry.path)))
+        for _, key, size in sorted(found):
+            self._lru[key] = size
+            self._total += size
+        self._evict()
+        print(f"HLS cache: {len(self._lru)} renditions, {self._total // (1024 * 1024)} MB.")
+
+    def _touch(self, key):
+        if key in self._lru:
+            self._lru.move_to_end(key)
+            try:
+                os.utime(os.path.join(self.cache_dir, key, DONE_MARKER))
+            except OSError:
+                pass
+
+    def _evict(self):
+        now = time.monotonic()
+        for key, read_at in list(self._reads.items()):
+            if now - read_at >= PIN_SECONDS:
+                del self._reads[key]
+        for key in list(self._lru):
+            if self._total <= self.max_bytes:
+                break
+            if key in self._reads:
+                # Still being played: deleting it would 404 the client's next segment
+                continue
+            self._total -= self._lru.pop(key)
+            shutil.rmtree(os.path.join(self.cache_dir, key), ignore_errors=True)
+
+    # --- Tracks ---
+
+    def resolve(self, path, profile):
+        """Returns (absolute file path, rendition key) or raises HLSError."""
+        if profile not in HLS_PROFILES:
+            raise HLSError(404, f"Unknown HLS profile '{profile}'")
+        abs_path = os.path.realpath(os.path.join(self.base_path, path))
+        if not abs_path.startswith(self.base_path + os.sep) or not os.path.isfile(abs_path):
+            raise HLSError(404, f"Track '{path}' not found")
+        st = os.stat(abs_path)
+        # The file's size and mtime are part of the key, so an edited file gets a new rendition
+        digest = hashlib.sha1(f"{path}\0{st.st_size}\0{st.st_mtime_ns}".encode("utf-8")).hexdigest()[:24]
+        return abs_path, f"{digest}-{profile}"
+
+    def duration(self, abs_path, key):
+        """
+        The track duration used for both the playlist and ffmpeg's -t, probed once
+        per rendition so the listed segments are exactly the ones ffmpeg writes.
+        """
+        total = self._durations.get(key)
+        if total is None:
+            total = self._probe_duration(abs_path)
+            self._durations[key] = total
+            while len(self._durations) > MAX_DURATIONS:
+                self._durations.popitem(last=False)
+        return total
+
+    def _probe_duration(self, abs_path):
+        if self.ffprobe is not None:
+            try:
+                result = subprocess.run(
+                    [self.ffprobe, "-v", "error", "-show_entries", "format=duration",
+                     "-of", "default=noprint_wrappers=1:nokey=1", abs_path],
+                    capture_output=True, text=True, timeout=30)
+                return float(result.stdout.strip())
+            except (OSError, subprocess.TimeoutExpired, ValueError):
+                pass
+        try:
+            audio = mutagen.File(abs_path)
+        except Exception as e:
+            raise HLSError(415, f"Cannot read '{os.path.basename(abs_path)}': {e}")
+        if audio is None or not getattr(audio.info, "length", None):
+            raise HLSError(415, f"Unknown duration for '{os.path.basename(abs_path)}'")
+        return audio.info.length
+
+    # --- Playlists ---
+
+    def master_playlist(self, path):
+        if not self.available:
+            # Fail at the manifest so players fall back to the plain file right away
+            raise HLSError(503, "ffmpeg is not installed")
+        self.resolve(path, next(iter(HLS_PROFILES)))
+        lines = ["#EXTM3U", "#EXT-X-VERSION:7", "#EXT-X-INDEPENDENT-SEGMENTS"]
+        for name, (_, _, codecs, bandwidth) in HLS_PROFILES.items():
+            lines.append(f'#EXT-X-STREAM-INF:BANDWIDTH={bandwidth},CODECS="{codecs}"')
+            lines.append(f"{name}/index.m3u8")
+        return "\n".join(lines) + "\n"
+
+    def media_playlist(self, path, profile):
+        """
+        The complete VOD playlist. A finished rendition serves the playlist ffmpeg
+        wrote; otherwise it is computed up front from the duration ffmpeg is told
+        to encode, so players can seek anywhere before the encoder gets there.
+        """
+        abs_path, key = self.resolve(path, profile)
+        if key in self._lru:
+            written = self._ffmpeg_playlist(key)
+            if written is not None:
+                return written
+        total = self.duration(abs_path, key)
+        count = max(1, math.ceil((total - FRAME_SLACK) / self.segment_seconds))
+        lines = [
+            "#EXTM3U", "#EXT-X-VERSION:7", "#EXT-X-PLAYLIST-TYPE:VOD",
+            f"#EXT-X-TARGETDURATION:{self.segment_seconds}",
+            "#EXT-X-INDEPENDENT-SEGMENTS", f'#EXT-X-MAP:URI="{INIT_NAME}"',
+        ]
+        for index in range(count):
+            length = total - index * self.segment_seconds if index == count - 1 else self.segment_seconds
+            lines.append(f"#EXTINF:{length:.3f},")
+            lines.append(SEGMENT_PATTERN % index)
+        lines.append("#EXT-X-ENDLIST")
+        return "\n".join(lines) + "\n"
+
+    def _ffmpeg_playlist(self, key):
+        """ffmpeg's own playlist of a finished rendition, with URIs relative to it."""
+        try:
+            with open(os.path.join(self.cache_dir, key, FFMPEG_PLAYLIST), encoding="utf-8") as f:
+                text = f.read()
+        except OSError:
+            return None
+        lines = []
+        for line in text.splitlines():
+            if line.startswith("#EXT-X-MAP:"):
+                line = f'#EXT-X-MAP:URI="{INIT_NAME}"'
+            elif line and not line.startswith("#"):
+                line = os.path.basename(line)
+            lines.append(line)
+        return "\n".join(lines) + "\n"
+
+    # --- Segments ---
+
+    async def segment(self, path, profile, name, timeout=30):
+        """
+        Returns the absolute path of a finished segment (or the init section),
+        starting the encoder if needed and waiting until it has written the file.
+        """
+        if name != INIT_NAME and not (name.startswith("seg_") and name.endswith(".m4s")):
+            raise HLSError(404, f"Unknown HLS segment '{name}'")
+        abs_path, key = self.resolve(path, profile)
+        out_dir = os.path.join(self.cache_dir, key)
+        target = os.path.join(out_dir, name)
+        self._reads[key] = time.monotonic()
+        if key in self._lru:
+            self._touch(key)
+            if os.path.exists(target):
+                return target
+            raise HLSError(404, f"Segment '{name}' not found")
+        if not self.available:
+            raise HLSError(503, "ffmpeg is not installed")
+
+        job = self._jobs.get(key)
+        if job is None:
+            job = self._jobs[key] = asyncio.create_task(self._encode(abs_path, key, profile))
+        # The init section is complete once the first media segment has been renamed into place
+        ready = os.path.join(out_dir, SEGMENT_PATTERN % 0) if name == INIT_NAME else target
+        deadline = time.monotonic() + timeout
+        while not os.path.exists(ready):
+            if job.done():
+                if os.path.exists(ready):
+                    break
+                error = job.exception()
+                raise HLSError(500 if error else 404, f"Segment '{name}' not available: {error or 'past the end'}")
+            if time.monotonic() > deadline:
+                raise HLSError(504, f"Timed out waiting for segment '{name}'")
+            await asyncio.sleep(0.1)
+        return target
+
+    async def _encode(self, abs_path, key, profile):
+        encoder, bitrate, _, _ = HLS_PROFILES[profile]
+        out_dir = os.path.join(self.cache_dir, key)
+        os.makedirs(out_dir, exist_ok=True)
+        try:
+            total = await asyncio.to_thread(self.duration, abs_path, key)
+            async with self._encoders:
+                started = time.perf_counter()
+                process = await asyncio.create_subprocess_exec(
+                    self.ffmpeg, "-nostdin", "-v", "error", "-i", abs_path, "-t", f"{total:.6f}",
+                    "-map", "0:a:0", "-vn", "-c:a", encoder, "-b:a", bitrate, "-ar", "48000", "-ac", "2",
+                    "-f", "hls", "-hls_time", str(self.segment_seconds), "-hls_playlist_type", "vod",
+                    "-hls_segment_type", "fmp4", "-hls_fmp4_init_filename", INIT_NAME,
+                    "-hls_segment_filename", os.path.join(out_dir, SEGMENT_PATTERN),
+                    "-hls_flags", "temp_file+independent_segments",
+                    os.path.join(out_dir, FFMPEG_PLAYLIST),
+                    stderr=asyncio.subprocess.PIPE,
+                )
+                try:
+                    _, stderr = await process.communicate()
+                except asyncio.CancelledError:
+                    process.kill()
+                    raise
+            if process.returncode != 0:
+                raise RuntimeError(stderr.decode("utf-8", "replace").strip() or f"ffmpeg exited with {process.returncode}")
+            open(os.path.join(out_dir, DONE_MARKER), "w").close()
+            size = _dir_size(out_dir)
+            self._lru[key] = size
+            self._total += size
+            self._evict()
+            print(f"HLS: encoded {os.path.basename(abs_path)} [{profile}] in {time.perf_counter() - started:.1f}s.")
+        except BaseException:
+            shutil.rmtree(out_dir, ignore_errors=True)
+            raise
+        finally:
+            # Keep finished jobs reachable briefly so waiting requests can see the outcome
+            asyncio.get_running_loop().call_later(5, self._jobs.pop, key, None)
+
+    async def close(self):
+        for job in list(self._jobs.values()):
+            job.cancel()
+        self._jobs.clear()
+
+
+def _dir_size(path):
+    total = 0
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.is_file():
+                total += entry.stat().st_size
+    return total
@@ -0,0 +1,204 @@
+# my_package/images.py
+import base64
+import hashlib
+import io
+import json
+import os
+import shutil
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from PIL import Image, ImageFilter, ImageOps
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+WALLPAPER_WIDTHS = (640, 1280, 1920)
+AVATAR_WIDTHS = (64, 128, 256)
+# Largest avatar kept as the plain {username}.jpg the pages already link to
+AVATAR_MAX_SIZE = 512
+PLACEHOLDER_WIDTH = 24
+MANIFEST_NAME = "manifest.json"
+
+
+def _to_rgb(image):
+    image = ImageOps.exif_transpose(image)
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    return image
+
+
+def render_variants(source_path, out_dir, widths):
+    """
+    Decodes `source_path` once and writes a WebP and a JPEG per width (never
+    upscaled) plus a tiny blurred JPEG placeholder, inlined in the manifest.
+    Runs in a worker thread; Pillow releases the GIL while decoding and encoding.
+    """
+    with Image.open(source_path) as original:
+        # JPEG can decode at reduced scale straight away
+        original.draft('RGB', (max(widths), max(widths) * 4))
+        image = _to_rgb(original)
+    tmp_dir = out_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    variants = []
+    for width in sorted({min(w, image.width) for w in widths}, reverse=True):
+        height = max(1, round(image.height * width / image.width))
+        image = image.resize((width, height), Image.LANCZOS) if width != image.width else image
+        image.save(os.path.join(tmp_dir, f"w{width}.webp"), 'WEBP', quality=80, method=4)
+        image.save(os.path.join(tmp_dir, f"w{width}.jpg"), 'JPEG', quality=82, optimize=True, progressive=True)
+        variants.append({"width": width, "height": height, "webp": f"w{width}.webp", "jpeg": f"w{width}.jpg"})
+    tiny = image.resize((PLACEHOLDER_WIDTH, max(1, round(image.height * PLACEHOLDER_WIDTH / image.width))))
+    out = io.BytesIO()
+    tiny.filter(ImageFilter.GaussianBlur(1.5)).save(out, 'JPEG', quality=50)
+    manifest = {
+        "width": variants[0]["width"],
+        "height": variants[0]["height"],
+        "variants": sorted(variants, key=lambda v: v["width"]),
+        "placeholder": "data:image/jpeg;base64," + base64.b64encode(out.getvalue()).decode('ascii'),
+    }
+    with open(os.path.join(tmp_dir, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+    return manifest
+
+
+def save_avatar(data, save_path, max_size=AVATAR_MAX_SIZE):
+    """
+    Decodes an uploaded picture and saves it as JPEG, scaled down to fit
+    `max_size` with its aspect ratio kept (worker thread). Pages crop it with CSS.
+    """
+    with Image.open(io.BytesIO(data)) as original:
+        image = _to_rgb(original)
+    image.thumbnail((max_size, max_size), Image.LANCZOS)
+    save_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = save_path.with_suffix(".tmp")
+    image.save(tmp, 'JPEG', quality=88)
+    os.replace(tmp, save_path)
+
+
+class ImagePipeline:
+    """
+    Produces resized WebP/JPEG variants and blur placeholders on a small worker
+    pool, so the event loop never decodes or encodes images.
+
+    Variants live in `cache_dir/<kind>/<key>/`, where the key is derived from the
+    source path plus its size and mtime: URLs are immutable and an edited image
+    simply gets a new key (the previous version is removed).
+    """
+
+    def __init__(self, cache_dir="image_cache", workers=2):
+        self.cache_dir = cache_dir
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="images")
+        # key -> manifest
+        self._manifests = {}
+        # key -> Future of a running render
+        self._pending = {}
+        # keys whose source could not be decoded; not retried until the file changes
+        self._failed = set()
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args):
+        return self._executor.submit(func, *args)
+
+    @staticmethod
+    def source_key(source_path):
+        st = os.stat(source_path)
+        path_id = hashlib.sha1(os.path.abspath(source_path).encode('utf-8')).hexdigest()[:12]
+        version = hashlib.sha1(f"{st.st_size}:{st.st_mtime_ns}".encode('ascii')).hexdigest()[:8]
+        return f"{path_id}-{version}"
+
+    def variant_path(self, kind, key, name):
+        return os.path.join(self.cache_dir, kind, key, name)
+
+    def manifest(self, kind, source_path, widths):
+        """Returns (key, manifest) if the variants exist; otherwise schedules them and returns (key, None)."""
+        key = self.source_key(source_path)
+        with self._lock:
+            if key in self._manifests:
+                return key, self._manifests[key]
+        try:
+            with open(self.variant_path(kind, key, MANIFEST_NAME)) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            self.ensure(kind, source_path, widths)
+            return key, None
+        with self._lock:
+            self._manifests[key] = manifest
+        return key, manifest
+
+    def ensure(self, kind, source_path, widths):
+        """Schedules rendering unless it is done or running; returns a Future of (key, manifest)."""
+        key = self.source_key(source_path)
+        with self._lock:
+            future = self._pending.get(key)
+            if future is None and key in self._failed:
+                future = Future()
+                future.set_exception(ValueError(f"Cannot decode '{source_path}'"))
+            elif future is None:
+                future = self._pending[key] = self._executor.submit(self._render, kind, key, source_path, widths)
+        return future
+
+    def _render(self, kind, key, source_path, widths):
+        try:
+            manifest = render_variants(source_path, os.path.join(self.cache_dir, kind, key), widths)
+            with self._lock:
+                self._manifests[key] = manifest
+            # Drop variants of earlier versions of the same file
+            path_id = key.split('-', 1)[0]
+            with os.scandir(os.path.join(self.cache_dir, kind)) as it:
+                stale = [e.path for e in it if e.name.startswith(path_id + '-') and e.name != key]
+            for path in stale:
+                shutil.rmtree(path, ignore_errors=True)
+            return key, manifest
+        except Exception as e:
+            print(f"Error rendering image variants for '{source_path}': {e}")
+            with self._lock:
+                self._failed.add(key)
+            raise
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class WallpaperLibrary:
+    """
+    Cached listing of the wallpaper folder. The folder is re-listed only when
+    its mtime changes; new pictures are handed to the pipeline in the background
+    and are listed without variants until those are ready.
+    """
+
+    def __init__(self, image_dir, pipeline, widths=WALLPAPER_WIDTHS):
+        self.image_dir = image_dir
+        self.pipeline = pipeline
+        self.widths = widths
+        self._mtime = None
+        self._names = []
+        self._lock = threading.Lock()
+
+    def _names_now(self):
+        try:
+            mtime = os.stat(self.image_dir).st_mtime_ns
+        except OSError:
+            return []
+        with self._lock:
+            if mtime != self._mtime:
+                with os.scandir(self.image_dir) as it:
+                    self._names = sorted(e.name for e in it
+                                         if e.is_file() and e.name.lower().endswith(IMAGE_EXTENSIONS))
+                self._mtime = mtime
+            return self._names
+
+    def listing(self):
+        """[(file name, key, manifest or None)] for every wallpaper."""
+        result = []
+        for name in self._names_now():
+            path = os.path.join(self.image_dir, name)
+            try:
+                key, manifest = self.pipeline.manifest("wallpapers", path, self.widths)
+            except OSError:
+                continue
+            result.append((name, key, manifest))
+        return result
@@ -0,0 +1,143 @@
+# my_package/library.py
+import os
+import threading
+from bisect import bisect_left, insort
+
+# Extensions served to the PC player (matches the old genFilelist filter)
+PC_AUDIO_EXTENSIONS = ('.mp3', '.flac')
+# Sorts after any character that can appear in a path
+_PREFIX_END = chr(0x10FFFF)
+
+
+def normalize_subfolder(subfolder):
+    """'', '.', './x/', '/x' -> '' or 'x' (relative, no leading/trailing slash)."""
+    subfolder = (subfolder or '').strip('/')
+    if subfolder in ('', '.'):
+        return ''
+    if subfolder.startswith('./'):
+        subfolder = subfolder[2:]
+    return subfolder
+
+
+def collapse_dirs(dirs):
+    """Drops every directory that lies inside another one in the set ('' is the root)."""
+    result = []
+    for d in sorted(normalize_subfolder(d) for d in dirs):
+        if '' in result:
+            break
+        if not any(d == r or d.startswith(r + '/') for r in result):
+            result.append(d)
+    return result
+
+
+def iter_music_files(base_path, subfolder='', extensions=PC_AUDIO_EXTENSIONS, followlinks=True):
+    """
+    Yields music file paths relative to `base_path`, using os.scandir so no
+    per-file stat is needed and nothing is accumulated in memory.
+    Entries are visited in name order within each directory. Symlinked
+    directories are followed once; loops are skipped.
+    """
+    subfolder = normalize_subfolder(subfolder)
+    root = os.path.join(base_path, subfolder) if subfolder else base_path
+    prefix = subfolder + '/' if subfolder else ''
+    seen = set()
+    # Stack of (absolute dir, relative prefix); reversed pushes keep name order
+    stack = [(root, prefix)]
+    while stack:
+        directory, rel = stack.pop()
+        try:
+            st = os.stat(directory)
+        except OSError:
+            continue
+        if (st.st_dev, st.st_ino) in seen:
+            continue
+        seen.add((st.st_dev, st.st_ino))
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError as e:
+            print(f"Error scanning '{directory}': {e}")
+            continue
+        subdirs = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=followlinks):
+                    subdirs.append((entry.path, rel + entry.name + '/'))
+                elif entry.name.lower().endswith(extensions):
+                    yield rel + entry.name
+            except OSError:
+                continue
+        stack.extend(reversed(subdirs))
+
+
+class LibraryIndex:
+    """
+    Sorted in-memory list of every music file under `base_path`.
+
+    Built once in the background and kept up to date with add/remove, so
+    requests get sorted results by slicing (a subfolder is one contiguous
+    range found with bisect) instead of walking and sorting the tree.
+    """
+
+    def __init__(self, base_path, extensions=PC_AUDIO_EXTENSIONS):
+        self.base_path = base_path
+        self.extensions = extensions
+        self.ready = False
+        self._paths = []
+        self._lock = threading.Lock()
+
+    def rebuild(self):
+        paths = sorted(iter_music_files(self.base_path, extensions=self.extensions))
+        with self._lock:
+            self._paths = paths
+            self.ready = True
+        print(f"Library index built: {len(paths)} files.")
+        return len(paths)
+
+    def _range(self, subfolder):
+        subfolder = normalize_subfolder(subfolder)
+        if not subfolder:
+            return 0, len(self._paths)
+        prefix = subfolder + '/'
+        return bisect_left(self._paths, prefix), bisect_left(self._paths, prefix + _PREFIX_END)
+
+    def files(self, subfolder=''):
+        with self._lock:
+            start, end = self._range(subfolder)
+            return self._paths[start:end]
+
+    def iter_files(self, subfolder='', chunk_size=1000):
+        """Yields the sorted paths under `subfolder` without holding the lock between chunks."""
+        start = 0
+        while True:
+            with self._lock:
+                begin, end = self._range(subfolder)
+                chunk = self._paths[begin + start:min(begin + start + chunk_size, end)]
+            if not chunk:
+                return
+            yield from chunk
+            start += len(chunk)
+
+    def __len__(self):
+        return len(self._paths)
+
+    def add(self, path):
+        if not path.lower().endswith(self.extensions):
+            return
+        with self._lock:
+            i = bisect_left(self._paths, path)
+            if i == len(self._paths) or self._paths[i] != path:
+                insort(self._paths, path)
+
+    def remove(self, path):
+        with self._lock:
+            i = bisect_left(self._paths, path)
+            if i < len(self._paths) and self._paths[i] == path:
+                del self._paths[i]
+
+    def remove_prefix(self, subfolder):
+        """Drops every path under a deleted or moved directory."""
+        with self._lock:
+            start, end = self._range(subfolder)
+            if normalize_subfolder(subfolder):
+                del self._paths[start:end]
@@ -0,0 +1,202 @@
+# my_package/library_watcher.py
+import asyncio
+import ctypes
+import ctypes.util
+import errno
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+
+# inotify(7) constants
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+_EVENT = struct.Struct("iIII")
+
+
+class LibraryChanges:
+    """What changed under the music folder during one debounce window (relative paths)."""
+
+    def __init__(self):
+        self.files = set()
+        self.added_dirs = set()
+        self.removed_dirs = set()
+        self.overflow = False
+
+    def __bool__(self):
+        return bool(self.files or self.added_dirs or self.removed_dirs or self.overflow)
+
+    def dirs(self):
+        """Every directory whose contents changed."""
+        touched = {os.path.dirname(path) for path in self.files}
+        touched |= {os.path.dirname(d) for d in self.added_dirs | self.removed_dirs}
+        return touched | self.added_dirs
+
+
+class LibraryWatcher:
+    """
+    Watches `base_path` recursively with Linux inotify (through libc, no extra
+    dependency) and calls `on_change(LibraryChanges)` once the tree has been
+    quiet for `debounce` seconds, so copying an album produces one update
+    instead of one per file. `on_change` runs on a single worker thread, so
+    two bursts never apply their changes at the same time.
+    """
+
+    def __init__(self, base_path, on_change, debounce=2.0):
+        self.base_path = base_path.rstrip('/')
+        self.on_change = on_change
+        self.debounce = debounce
+        self._fd = None
+        self._wds = {}
+        self._pending = LibraryChanges()
+        self._timer = None
+        self._libc = None
+        # inotify cookie -> [(wd, path below the moved directory)] of a directory moved away
+        self._moves = {}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="library-watcher")
+
+    # --- Lifecycle ---
+
+    async def start(self):
+        libc_name = ctypes.util.find_library("c")
+        if libc_name is None or not os.path.isdir(self.base_path):
+            print("Library watcher disabled: inotify or music folder not available.")
+            return
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            print(f"Library watcher disabled: inotify_init1 failed ({os.strerror(ctypes.get_errno())}).")
+            return
+        self._fd = fd
+        count = await asyncio.to_thread(self._watch_tree, '')
+        asyncio.get_running_loop().add_reader(fd, self._on_readable)
+        print(f"Library watcher started on {count} directories.")
+
+    async def stop(self):
+        if self._timer is not None:
+            self._timer.cancel()
+        if self._fd is not None:
+            asyncio.get_running_loop().remove_reader(self._fd)
+            os.close(self._fd)
+            self._fd = None
+            self._wds.clear()
+        self._executor.shutdown(wait=False)
+
+    # --- Watches ---
+
+    def _add_watch(self, rel_dir):
+        path = os.path.join(self.base_path, rel_dir) if rel_dir else self.base_path
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err == errno.ENOSPC:
+                print("Library watcher: inotify watch limit reached; raise fs.inotify.max_user_watches.")
+            return False
+        self._wds[wd] = rel_dir
+        return True
+
+    def _watch_tree(self, rel_root):
+        """Adds a watch on `rel_root` and every directory below it; returns the count."""
+        count = 0
+        stack = [rel_root]
+        while stack:
+            rel_dir = stack.pop()
+            if not self._add_watch(rel_dir):
+                continue
+            count += 1
+            try:
+                with os.scandir(os.path.join(self.base_path, rel_dir)) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=True):
+                            stack.append(os.path.join(rel_dir, entry.name) if rel_dir else entry.name)
+            except OSError:
+                continue
+        return count
+
+    # --- Events ---
+
+    def _on_readable(self):
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            wd, mask, cookie, length = _EVENT.unpack_from(data, offset)
+            raw_name = data[offset + _EVENT.size:offset + _EVENT.size + length]
+            offset += _EVENT.size + length
+            self._record(wd, mask, cookie, os.fsdecode(raw_name.rstrip(b'\0')))
+        # A directory moved out of the music folder has no IN_MOVED_TO partner
+        for moved in self._moves.values():
+            for moved_wd, _ in moved:
+                self._libc.inotify_rm_watch(self._fd, moved_wd)
+        self._moves.clear()
+        if self._pending:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = asyncio.get_running_loop().call_later(self.debounce, self._flush)
+
+    def _record(self, wd, mask, cookie, name):
+        if mask & IN_Q_OVERFLOW:
+            self._pending.overflow = True
+            return
+        if mask & IN_IGNORED:
+            self._wds.pop(wd, None)
+            return
+        rel_dir = self._wds.get(wd)
+        if rel_dir is None or not name:
+            return
+        rel_path = os.path.join(rel_dir, name) if rel_dir else name
+        if mask & IN_ISDIR:
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                self._pending.removed_dirs.discard(rel_path)
+                self._pending.added_dirs.add(rel_path)
+                moved = self._moves.pop(cookie, None) if mask & IN_MOVED_TO else None
+                if moved is not None:
+                    # Moved within the tree: the watches stay, only their paths change
+                    for moved_wd, suffix in moved:
+                        self._wds[moved_wd] = rel_path + suffix
+                else:
+                    self._watch_tree_async(rel_path)
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                self._pending.added_dirs.discard(rel_path)
+                self._pending.removed_dirs.add(rel_path)
+                if mask & IN_MOVED_FROM:
+                    self._moves[cookie] = self._forget_subtree(rel_path)
+        elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO | IN_DELETE | IN_MOVED_FROM):
+            self._pending.files.add(rel_path)
+
+    def _forget_subtree(self, rel_root):
+        """Drops the stored paths of `rel_root` and its subdirectories; returns [(wd, suffix)]."""
+        moved = []
+        for wd, rel_dir in list(self._wds.items()):
+            if rel_dir == rel_root or rel_dir.startswith(rel_root + '/'):
+                moved.append((wd, rel_dir[len(rel_root):]))
+                del self._wds[wd]
+        return moved
+
+    def _watch_tree_async(self, rel_root):
+        # The recursive scandir stays off the event loop
+        task = asyncio.get_running_loop().run_in_executor(None, self._watch_tree, rel_root)
+        task.add_done_callback(lambda future: self._report_error(future, "watching new directories"))
+
+    def _flush(self):
+        self._timer = None
+        changes, self._pending = self._pending, LibraryChanges()
+        task = asyncio.get_running_loop().run_in_executor(self._executor, self.on_change, changes)
+        task.add_done_callback(lambda future: self._report_error(future, "applying library changes"))
+
+    @staticmethod
+    def _report_error(future, action):
+        if not future.cancelled() and future.exception() is not None:
+            print(f"Error {action}: {future.exception()}")
@@ -0,0 +1,161 @@
+# my_package/lyrics.py
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from .library import iter_music_files, normalize_subfolder
+
+LYRICS_EXTENSIONS = ('.lrc',)
+# [mm:ss], [mm:ss.xx] or [mm:ss.xxx]
+_TIMESTAMP = re.compile(r'\[(\d{1,3}):(\d{2})(?:[.:](\d{1,3}))?\]')
+_OFFSET = re.compile(r'\[offset:\s*([+-]?\d+)\s*\]', re.IGNORECASE)
+# Lyrics in this library are mostly Chinese; older files are often not UTF-8
+_ENCODINGS = ('utf-8-sig', 'gb18030', 'big5')
+
+
+def parse_lrc(content):
+    """
+    Parses LRC text into [{"time": seconds, "text": line}] sorted by time.
+    Lines with several timestamps are repeated; the [offset:ms] tag is applied.
+    """
+    offset = 0.0
+    match = _OFFSET.search(content)
+    if match:
+        # A positive offset makes lyrics appear sooner
+        offset = -int(match.group(1)) / 1000
+    lines = []
+    for raw in content.splitlines():
+        stamps = _TIMESTAMP.findall(raw)
+        if not stamps:
+            continue
+        text = _TIMESTAMP.sub('', raw).strip()
+        if not text:
+            continue
+        for minutes, seconds, fraction in stamps:
+            fraction = int(fraction) / (10 ** len(fraction)) if fraction else 0.0
+            lines.append({"time": round(max(0.0, int(minutes) * 60 + int(seconds) + fraction + offset), 3),
+                          "text": text})
+    lines.sort(key=lambda line: line["time"])
+    return lines
+
+
+def read_lrc(abs_path):
+    with open(abs_path, 'rb') as f:
+        data = f.read()
+    for encoding in _ENCODINGS:
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return data.decode('utf-8', errors='replace')
+
+
+def lrc_key(track_path):
+    """'a/b/song.flac' -> 'a/b/song': the .lrc next to a track shares its stem."""
+    return os.path.splitext(track_path)[0]
+
+
+class LyricsService:
+    """
+    Serves parsed lyrics for library tracks.
+
+    `rebuild()` indexes every .lrc file once, so tracks without lyrics are
+    answered from memory instead of probing the disk. Parsed lyrics are kept in
+    an LRU of `max_entries` files and re-read only when the file's mtime changes.
+    `prefetch()` warms the cache for tracks that are about to play.
+    """
+
+    def __init__(self, base_path, max_entries=256):
+        self.base_path = base_path
+        self.max_entries = max_entries
+        self.ready = False
+        # track stem -> .lrc path relative to base_path
+        self._index = {}
+        # .lrc path -> (mtime, parsed lines), least recently used first
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    # --- Index ---
+
+    def rebuild(self):
+        index = {lrc_key(path): path for path in iter_music_files(self.base_path, extensions=LYRICS_EXTENSIONS)}
+        with self._lock:
+            self._index = index
+            self.ready = True
+        print(f"Lyrics index built: {len(index)} files.")
+        return len(index)
+
+    def note_file(self, path):
+        """Updates the index for one added, changed or removed .lrc file."""
+        if not path.lower().endswith(LYRICS_EXTENSIONS):
+            return
+        exists = os.path.isfile(os.path.join(self.base_path, path))
+        with self._lock:
+            self._cache.pop(path, None)
+            if exists:
+                self._index[lrc_key(path)] = path
+            elif self._index.get(lrc_key(path)) == path:
+                del self._index[lrc_key(path)]
+
+    def add_dir(self, subfolder):
+        for path in iter_music_files(self.base_path, subfolder, extensions=LYRICS_EXTENSIONS):
+            self.note_file(path)
+
+    def remove_dir(self, subfolder):
+        prefix = normalize_subfolder(subfolder) + '/'
+        with self._lock:
+            for key in [k for k in self._index if k.startswith(prefix)]:
+                self._cache.pop(self._index.pop(key), None)
+
+    def has_lyrics(self, track_path):
+        return self._find(track_path) is not None
+
+    def _find(self, track_path):
+        if os.path.isabs(track_path) or '..' in track_path.split('/'):
+            return None
+        key = lrc_key(track_path)
+        if self.ready:
+            with self._lock:
+                return self._index.get(key)
+        # Index still building: probe the usual location directly
+        path = key + '.lrc'
+        return path if os.path.isfile(os.path.join(self.base_path, path)) else None
+
+    # --- Lyrics ---
+
+    def get(self, track_path):
+        """Parsed lines for a track, or None if it has no lyrics."""
+        path = self._find(track_path)
+        if path is None:
+            return None
+        abs_path = os.path.join(self.base_path, path)
+        try:
+            mtime = os.stat(abs_path).st_mtime
+        except OSError:
+            self.note_file(path)
+            return None
+        with self._lock:
+            cached = self._cache.get(path)
+            if cached and cached[0] == mtime:
+                self._cache.move_to_end(path)
+                return cached[1]
+        try:
+            lines = parse_lrc(read_lrc(abs_path))
+        except OSError as e:
+            print(f"Error reading lyrics '{path}': {e}")
+            return None
+        with self._lock:
+            self._cache[path] = (mtime, lines)
+            self._cache.move_to_end(path)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return lines
+
+    def prefetch(self, track_paths):
+        """Parses lyrics for upcoming tracks ahead of time; returns how many have lyrics."""
+        warmed = 0
+        for track_path in track_paths:
+            if track_path and '://' not in track_path and self.get(track_path) is not None:
+                warmed += 1
+        return warmed
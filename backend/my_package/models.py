@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, Integer, String, ForeignKey
+from sqlalchemy import Boolean, Column, Integer, Float, String, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from .database import Base
 
@@ -15,10 +15,106 @@ class User(Base):
 
 class UserPlaylist(Base):
     __tablename__ = "user_playlists"
+    __table_args__ = (
+        Index("ix_user_playlists_user_name", "user_id", "playlist_name", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     playlist_name = Column(String, index=True) # e.g., "pc_playlist"
-    playlist_data = Column(String) # Storing as a JSON string for simplicity
+    # Legacy JSON list of file paths; moved into playlist_items at startup (see user_playlists.py)
+    playlist_data = Column(String, nullable=True)
 
-    owner = relationship("User", back_populates="playlists")
\ No newline at end of file
+    owner = relationship("User", back_populates="playlists")
+
+class PlaylistItem(Base):
+    """One entry of a PC playlist; positions are 0-based and contiguous per playlist."""
+    __tablename__ = "playlist_items"
+    __table_args__ = (
+        # Unique, so a position can never be handed out twice; user_playlists.py shifts
+        # ranges through negative positions because SQLite checks it row by row
+        Index("ux_playlist_items_playlist_position", "playlist_id", "position", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True)
+    playlist_id = Column(Integer, ForeignKey("user_playlists.id", ondelete="CASCADE"), nullable=False)
+    position = Column(Integer, nullable=False)
+    path = Column(String, nullable=False) # relative to music_Basefolder
+
+class Track(Base):
+    """One audio file in the music library (see catalog.py for the FTS5 index)."""
+    __tablename__ = "tracks"
+
+    id = Column(Integer, primary_key=True, index=True)
+    path = Column(String, unique=True, index=True) # relative to music_Basefolder
+    size = Column(Integer)
+    mtime = Column(Float)
+    duration = Column(Float, nullable=True)
+    title = Column(String, index=True)
+    artist = Column(String, index=True)
+    album = Column(String, index=True)
+    genre = Column(String)
+    track_no = Column(String)
+
+class PodcastFeed(Base):
+    """Conditional-fetch validators for one podcast feed (see podcasts.py)."""
+    __tablename__ = "podcast_feeds"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, unique=True, index=True) # folder name under 播客/
+    url = Column(String)
+    etag = Column(String, nullable=True)
+    last_modified = Column(String, nullable=True)
+    checked_at = Column(Float, nullable=True)
+
+class PodcastEpisode(Base):
+    """
+    One feed entry seen by the podcast downloader.
+    status: pending -> done | failed (retried next run); skipped (too old when first seen);
+    expired (file removed by the age limit).
+    """
+    __tablename__ = "podcast_episodes"
+    __table_args__ = (
+        Index("ix_podcast_episodes_feed_guid", "feed_id", "guid", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True)
+    feed_id = Column(Integer, ForeignKey("podcast_feeds.id"), nullable=False)
+    guid = Column(String, nullable=False)
+    url = Column(String)  # enclosure URL
+    title = Column(String)
+    published = Column(Float)
+    file_name = Column(String)  # inside the feed's folder
+    size = Column(Integer, nullable=True)
+    status = Column(String, index=True)
+    updated_at = Column(Float)  # download time once done
+    in_playlist = Column(Boolean, default=False)  # listed in the "latest podcasts" stored playlist
+
+class ScheduledJob(Base):
+    """
+    A named alarm run by the in-process scheduler (see scheduler.py).
+    days: cron-style weekdays "1,3,5" (0 = Sunday); empty means every day.
+    """
+    __tablename__ = "scheduled_jobs"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, unique=True, index=True)
+    hour = Column(Integer, nullable=False)
+    minute = Column(Integer, nullable=False)
+    days = Column(String, default="")
+    playlist = Column(String, nullable=False)  # MPD stored playlist loaded into the queue
+    volume = Column(Integer, nullable=True)  # target volume; None keeps the current one
+    fade_seconds = Column(Integer, default=0)  # fade-in from 0 to the target volume
+    enabled = Column(Boolean, default=True)
+
+class YouTubeStream(Base):
+    """Cached yt-dlp resolution of one video (see youtube.py); stream URLs expire."""
+    __tablename__ = "youtube_streams"
+
+    id = Column(Integer, primary_key=True)
+    video_id = Column(String, unique=True, index=True)
+    title = Column(String, nullable=True)
+    duration = Column(Float, nullable=True)
+    stream_url = Column(String, nullable=True)
+    expires_at = Column(Float, nullable=True)
+    resolved_at = Column(Float, nullable=True)
@@ -1,22 +1,53 @@
 # my_package/mpd_controller.py
 import os
+import re
 import sys
-from pathlib import Path # Added import
-from mpd import MPDClient
+import time
 from mpd import ConnectionError as MPDConnectionError
 from mpd import CommandError as MPDCommandError
+from .mpd_pool import MPDConnectionPool, PooledClient
+from .playlist_mirror import StoredPlaylistMirror
+
+# Commands sent per command_list_ok_begin ... command_list_end round trip
+BATCH_CHUNK_SIZE = 500
+# MPD reports the failing command's index inside a command list as "[error@index]"
+_ACK_INDEX = re.compile(r'\[\d+@(\d+)\]')
+# Largest page the windowed queue / playlist reads will return
+MAX_WINDOW = 1000
+# Seconds two MPD start times (now - uptime) may differ and still be the same MPD run
+MPD_START_TOLERANCE = 2
+# `listplaylistinfo NAME START:END` needs MPD 0.24
+_STORED_RANGE_VERSION = (0, 24)
+
+
+def _version_tuple(version):
+    try:
+        return tuple(int(part) for part in (version or '').split('.')[:2])
+    except ValueError:
+        return (0, 0)
+
+
+def _filter_quote(value):
+    """Quotes a value for an MPD filter expression such as (file == "...")."""
+    return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
 
 class MPDClientController:
     """
     A class to control the Music Player Daemon (MPD) using python-mpd2.
-    Includes auto-reconnection logic to prevent crashes after idle periods.
+    Commands run on a pool of MPD connections (see mpd_pool.py), so concurrent
+    callers never share a socket and a dropped connection is re-opened on demand.
     """
 
-    def __init__(self, host='localhost', port=6600, music_base_path='/home/ubuntu/Music/'):
+    def __init__(self, host='localhost', port=6600, music_base_path='/home/ubuntu/Music/',
+                 pool=None, pool_size=4, command_timeout=10):
         self.host = host
         self.port = port
         self.music_base_path = music_base_path
-        self.client = MPDClient(use_unicode=True)
+        self.pool = pool or MPDConnectionPool(host, port, size=pool_size, command_timeout=command_timeout)
+        # Behaves like a single MPDClient; every command borrows a pooled connection.
+        self.client = PooledClient(self.pool)
+        # Cached stored playlists; bind it to an MPDEventBroadcaster to skip re-validation
+        self.stored_playlists = StoredPlaylistMirror(self)
         # We track connection state, but we also verify it with ping()
         self.is_connected = False
 
@@ -32,39 +63,17 @@ class MPDClientController:
         Connects to the MPD server.
         Checks if the connection is actually alive using ping().
         """
-        # 1. If we think we are connected, verify it.
-        if self.is_connected:
-            try:
-                self.client.ping()
-                # If ping succeeds, we are good.
-                return
-            except (MPDConnectionError, OSError):
-                print("Connection flag was True, but ping failed. Reconnecting...")
-                self.is_connected = False
-                try:
-                    self.client.disconnect()
-                except:
-                    pass
-
-        # 2. Perform fresh connection
+        self.pool.reopen()
         print(f"Attempting to connect to MPD at {self.host}:{self.port}...")
-        try:
-            self.client.connect(self.host, self.port)
-            self.is_connected = True
+        self.is_connected = self.pool.ping()
+        if self.is_connected:
             print("Successfully connected to MPD.")
-        except MPDConnectionError as e:
-            print(f"Error: Could not connect to MPD. {e}")
-            self.is_connected = False
-            # We do not raise here to allow the app to start even if MPD is temporarily down
-        except Exception as e:
-            print(f"An unexpected error occurred during connection: {e}")
-            self.is_connected = False
+        # We do not raise here to allow the app to start even if MPD is temporarily down
 
     def disconnect(self):
         """Disconnects from the MPD server."""
         try:
-            self.client.close()
-            self.client.disconnect()
+            self.pool.close()
         except:
             pass
         finally:
@@ -74,22 +83,61 @@ class MPDClientController:
     def _execute_safe(self, func, *args, **kwargs):
         """
         Wraps MPD commands to handle disconnection/reconnection automatically.
+        The pool already retries a dropped socket once; this only keeps
+        is_connected in sync for callers that check it.
         """
         try:
             if not self.is_connected:
                 self.connect()
-            return func(*args, **kwargs)
-        except (MPDConnectionError, OSError, ConnectionRefusedError):
-            print("Connection lost during command. Attempting to reconnect...")
+            result = func(*args, **kwargs)
+            self.is_connected = True
+            return result
+        except (MPDConnectionError, OSError) as e:
+            print(f"Reconnection failed: {e}")
             self.is_connected = False
-            try:
-                self.connect()
-                return func(*args, **kwargs)
-            except Exception as e:
-                print(f"Reconnection failed: {e}")
-                # We return None or empty structures based on context usually, 
-                # but raising allows the API to send a 500 error if really needed.
-                raise e
+            # We return None or empty structures based on context usually,
+            # but raising allows the API to send a 500 error if really needed.
+            raise e
+
+    async def call(self, func, *args, **kwargs):
+        """
+        Awaitable wrapper for any blocking controller method, e.g.
+        `await mpd_player.call(mpd_player.get_status)`. Keeps MPD I/O off the event loop.
+        """
+        return await self.pool.run(func, *args, **kwargs)
+
+    def execute_batch(self, commands, chunk_size=BATCH_CHUNK_SIZE, progress=None):
+        """
+        Sends `commands` ([(name, args), ...]) as chunked command lists on one connection.
+        MPD aborts a list at its first failing command, so the rest of that chunk is
+        re-sent and the failure recorded instead of aborting the whole batch.
+        `progress(done, total)` is called after every round trip.
+        Returns {"done": <succeeded>, "failed": [{"command", "args", "error"}, ...]}.
+        """
+        total = len(commands)
+        done = 0
+        failed = []
+        pending = list(commands)
+        with self.pool.connection() as client:
+            while pending:
+                chunk, pending = pending[:chunk_size], pending[chunk_size:]
+                client.command_list_ok_begin()
+                for name, args in chunk:
+                    getattr(client, name)(*args)
+                try:
+                    client.command_list_end()
+                    done += len(chunk)
+                except MPDCommandError as e:
+                    match = _ACK_INDEX.search(str(e))
+                    index = int(match.group(1)) if match else 0
+                    name, args = chunk[index]
+                    failed.append({"command": name, "args": list(args), "error": str(e)})
+                    done += index
+                    pending = chunk[index + 1:] + pending
+                if progress:
+                    progress(done + len(failed), total)
+        self.is_connected = True
+        return {"done": done, "failed": failed}
 
     # --- Status & Playback ---
 
@@ -105,12 +153,38 @@ class MPDClientController:
             print(f"Command Error in get_status: {e}")
             return None
         
-    def update(self):
+    def update(self, path=None):
+        """
+        Rescans the MPD database, or only `path` (relative to the music folder).
+        Returns MPD's update job id, or None if the command failed.
+        """
         try:
-            self._execute_safe(self.client.update)
-            print("MPD database update command sent.")
+            if path:
+                job = self._execute_safe(self.client.update, path)
+            else:
+                job = self._execute_safe(self.client.update)
+            print(f"MPD database update command sent{f' for {path}' if path else ''}.")
+            return int(job) if job is not None else None
         except Exception as e:
             print(f"Error: {e}")
+            return None
+
+    def wait_for_update(self, job=None, timeout=120, interval=0.5):
+        """
+        Blocks until update job `job` (or every running update) has finished, by
+        polling `status`; returns False on timeout. For scripts without an idle
+        connection. The server uses MPDUpdateTracker (mpd_updates.py) instead.
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            status = self.get_status()
+            if status is not None:
+                running = int(status['updating_db']) if 'updating_db' in status else None
+                # MPD runs jobs in id order
+                if running is None or (job is not None and running > job):
+                    return True
+            time.sleep(interval)
+        return False
 
 
 
@@ -233,20 +307,41 @@ class MPDClientController:
             print(f"Error getting elapsed time: {e}")
             return None
 
+    def get_now_playing(self):
+        """
+        Returns {"status", "currentsong", "nextsong", "time"} using one connection:
+        status and currentsong go out as a single command list, and the next song
+        is looked up by id only when MPD reports one.
+        `time` is the server epoch at which `status.elapsed` was sampled.
+        """
+        try:
+            with self.pool.connection() as client:
+                client.command_list_ok_begin()
+                client.status()
+                client.currentsong()
+                status, current_song = client.command_list_end()
+                sampled_at = time.time()
+                next_song = {}
+                if 'nextsongid' in status:
+                    next_song = (client.playlistid(status['nextsongid']) or [{}])[0]
+            self.is_connected = True
+            return {"status": status, "currentsong": current_song, "nextsong": next_song, "time": sampled_at}
+        except Exception as e:
+            print(f"Error getting now playing snapshot: {e}")
+            return None
+
     # --- Playlist / Queue Operations ---
 
     def queue_load_radiostreams(self, streams_dict):
         try:
-            if not self.is_connected: self.connect()
-            self.client.clear()
-            for url in streams_dict.values():
-                self.client.add(url)
-            print(f"Loaded {len(streams_dict)} radio streams.")
+            commands = [("clear", ())] + [("add", (url,)) for url in streams_dict.values()]
+            result = self.execute_batch(commands)
+            print(f"Loaded {len(streams_dict) - len(result['failed'])} of {len(streams_dict)} radio streams.")
+            return result
         except (MPDConnectionError, OSError):
             self.is_connected = False
-            self.connect()
             # Retry logic could be added here if needed, but complex for multi-step ops
-            print("Reconnected, please try loading streams again.")
+            print("Connection lost, please try loading streams again.")
 
     def queue_add_song(self, path):
         try:
@@ -308,6 +403,61 @@ class MPDClientController:
             print(f"Error: {e}")
             return []
 
+    def queue_get_changes(self, since=None, started=None):
+        """
+        Returns the queue entries changed since playlist version `since` (MPD `plchanges`)
+        together with the current version and length; clients overwrite the returned
+        positions and truncate to `length`. `started` is the MPD start time from the
+        previous response: versions restart with MPD, so a `since` from another MPD run
+        (or no version at all) gets the whole queue from one `playlistinfo` instead.
+        """
+        try:
+            with self.pool.connection() as client:
+                client.command_list_ok_begin()
+                client.status()
+                client.stats()
+                status, stats = client.command_list_end()
+                version = int(status.get('playlist', 0))
+                mpd_started = int(time.time()) - int(stats.get('uptime', 0))
+                full = (since is None or since < 0 or since > version
+                        or started is None or abs(started - mpd_started) > MPD_START_TOLERANCE)
+                changes = client.playlistinfo() if full else client.plchanges(since)
+            return {
+                "version": version,
+                "started": mpd_started,
+                "length": int(status.get('playlistlength', 0)),
+                "full": full,
+                "changes": changes,
+            }
+        except Exception as e:
+            print(f"Error: {e}")
+            return None
+
+    def queue_get_window(self, offset=0, limit=100):
+        """
+        One page of the queue via `playlistinfo START:END` (entries include Id and Pos),
+        so the cost depends on `limit`, not on the queue length. Returns
+        {"total", "version", "offset", "songs"}; `version` lets clients drop stale pages.
+        """
+        offset = max(0, offset)
+        limit = max(0, min(limit, MAX_WINDOW))
+        try:
+            with self.pool.connection() as client:
+                status = client.status()
+                total = int(status.get('playlistlength', 0))
+                songs = []
+                if offset < total and limit:
+                    songs = client.playlistinfo(f"{offset}:{min(offset + limit, total)}")
+            return {
+                "total": total,
+                "version": int(status.get('playlist', 0)),
+                "offset": offset,
+                "songs": songs,
+            }
+        except Exception as e:
+            print(f"Error: {e}")
+            return None
+
     def queue_get_songsid(self):
         try:
             return self._execute_safe(self.client.playlistid)
@@ -327,13 +477,14 @@ class MPDClientController:
     def get_playlist_List(self):
         #list all stored playlists
         try:
-            return self._execute_safe(self.client.listplaylists)
+            return self.stored_playlists.listing()
         except Exception as e:
             print(f"Error: {e}")
             return []
     def playlist_renamepl(self, pi_plname, new_pi_plname):
         try:
             self._execute_safe(self.client.rename, pi_plname, new_pi_plname)
+            self.stored_playlists.note_changed(pi_plname)
         except Exception as e:
             print(f"Error: {e}")
             raise e
@@ -341,6 +492,7 @@ class MPDClientController:
     def playlist_rmpl(self, pi_plname):
         try:
             self._execute_safe(self.client.rm, pi_plname)
+            self.stored_playlists.note_changed(pi_plname)
         except Exception as e:
             print(f"Error: {e}")
             raise e
@@ -349,6 +501,7 @@ class MPDClientController:
     def queue_saveto_playlist(self, pi_plname):
         try:
             self._execute_safe(self.client.save, pi_plname)
+            self.stored_playlists.note_changed(pi_plname)
             print(f"Playlist saved as '{pi_plname}'")
         except Exception as e:
             print(f"Error: {e}")
@@ -362,10 +515,18 @@ class MPDClientController:
                    
     def playlist_songs(self, pi_plname):
         try:
-            return self._execute_safe(self.client.listplaylist, pi_plname)
+            return self.stored_playlists.songs(pi_plname)
         except Exception as e:
             print(f"Error: {e}")
             return []       
+    def playlists_containing(self, uri):
+        """Names of the stored playlists that contain `uri`."""
+        try:
+            return self.stored_playlists.playlists_containing(uri)
+        except Exception as e:
+            print(f"Error: {e}")
+            return []
+
     def playlist_songsinfo(self, pi_plname):
         try:
             return self._execute_safe(self.client.listplaylistinfo, pi_plname)
@@ -373,10 +534,50 @@ class MPDClientController:
             print(f"Error: {e}")
             return []
 
+    def playlist_songs_window(self, pi_plname, offset=0, limit=100):
+        """One page of a stored playlist's URIs, served from the in-process mirror."""
+        offset = max(0, offset)
+        limit = max(0, min(limit, MAX_WINDOW))
+        try:
+            total, songs = self.stored_playlists.window(pi_plname, offset, limit)
+            return {"total": total, "offset": offset, "songs": songs}
+        except Exception as e:
+            print(f"Error: {e}")
+            return None
+
+    def playlist_songsinfo_window(self, pi_plname, offset=0, limit=100):
+        """
+        One page of a stored playlist with song metadata. MPD 0.24+ answers
+        `listplaylistinfo NAME START:END` directly; older servers get the page's
+        URIs from the mirror and one `find (file == ...)` per URI in a single
+        command list. Either way the cost depends on `limit`, not on the playlist length.
+        Stream URLs, which are not in the database, come back as {"file": uri}.
+        """
+        offset = max(0, offset)
+        limit = max(0, min(limit, MAX_WINDOW))
+        try:
+            total, uris = self.stored_playlists.window(pi_plname, offset, limit)
+            if not uris:
+                return {"total": total, "offset": offset, "songs": []}
+            with self.pool.connection() as client:
+                if _version_tuple(client.mpd_version) >= _STORED_RANGE_VERSION:
+                    songs = client.listplaylistinfo(pi_plname, f"{offset}:{offset + len(uris)}")
+                else:
+                    client.command_list_ok_begin()
+                    for uri in uris:
+                        client.find(f"(file == {_filter_quote(uri)})")
+                    found = client.command_list_end()
+                    songs = [matches[0] if matches else {"file": uri} for uri, matches in zip(uris, found)]
+            return {"total": total, "offset": offset, "songs": songs}
+        except Exception as e:
+            print(f"Error: {e}")
+            return None
+
 
     def playlist_deletesong(self, pi_plname, songpos):
         try:
             self._execute_safe(self.client.playlistdelete, pi_plname, songpos)
+            self.stored_playlists.note_changed(pi_plname)
         except Exception as e:
             print(f"Error: {e}")
             raise e
@@ -385,6 +586,7 @@ class MPDClientController:
     def playlist_clearsongs(self, pi_plname):
         try:
             self._execute_safe(self.client.playlistclear, pi_plname)
+            self.stored_playlists.note_changed(pi_plname)
         except Exception as e:
             print(f"Error: {e}")
             raise e
@@ -392,49 +594,113 @@ class MPDClientController:
     def playlist_add_song(self, pi_plname, uri):
         try:
             # Check if the playlist exists
-            playlists = self._execute_safe(self.client.listplaylists)
-            playlist_exists = any(p['playlist'] == pi_plname for p in playlists)
-
-            if not playlist_exists:
+            if not self.stored_playlists.exists(pi_plname):
                 # If playlist doesn't exist, create it (playlistadd does this implicitly but good to be explicit)
                 # It's better to add a dummy song and then remove it to truly "create" an empty playlist,
                 # as playlistadd will just create it when the first song is added.
                 # However, for simply adding, playlistadd handles creation.
                 print(f"Playlist '{pi_plname}' does not exist. It will be created.")
 
-            # Get current songs in the playlist to check for duplicates
-            current_playlist_songs = self._execute_safe(self.client.listplaylist, pi_plname)
-            
-            # Check if the song URI is already in the playlist
-            if uri in current_playlist_songs:
+            # Check if the song URI is already in the playlist (set lookup on the mirror)
+            if self.stored_playlists.contains(pi_plname, uri):
                 print(f"Song '{uri}' is already in playlist '{pi_plname}'. Not adding duplicate.")
                 return {"message": f"Song '{uri}' is already in playlist '{pi_plname}'. Not adding duplicate."}
             
             # If not a duplicate, add the song
             self._execute_safe(self.client.playlistadd, pi_plname, uri)
+            self.stored_playlists.note_added(pi_plname, [uri])
             print(f"URI '{uri}' added to playlist '{pi_plname}'.")
             return {"message": f"URI '{uri}' added to playlist '{pi_plname}'."}
         except Exception as e:
             print(f"Error adding URI to playlist: {e}")
             raise e 
                
-    def playlist_add_folder(self, pi_plname, foldername):
-        try:
-            files = self._list_music_files_in_folder(foldername)
-            if not files:
-                message = f"No music files found in folder '{foldername}'."
-                print(message)
-                return {"message": message}
-            for file_path_mpd in files:
-                self._execute_safe(self.client.playlistadd, pi_plname, file_path_mpd)
-            message = f"Added all files from '{foldername}' to playlist '{pi_plname}'."
+    def playlist_update_entries(self, pi_plname, add=(), remove=()):
+        """
+        Edits a stored playlist in place: deletes every entry of `remove` and appends
+        `add`, in one batch of command lists. The rest of the playlist is untouched.
+        """
+        remove = set(remove)
+        positions = []
+        if remove and self.stored_playlists.exists(pi_plname):
+            positions = [i for i, uri in enumerate(self.stored_playlists.songs(pi_plname)) if uri in remove]
+        # Delete from the end so earlier positions stay valid
+        commands = [("playlistdelete", (pi_plname, pos)) for pos in reversed(positions)]
+        commands += [("playlistadd", (pi_plname, uri)) for uri in add]
+        if not commands:
+            return {"done": 0, "failed": []}
+        result = self.execute_batch(commands)
+        self.stored_playlists.note_changed(pi_plname)
+        print(f"Playlist '{pi_plname}': {len(positions)} removed, {len(add)} added.")
+        return result
+
+    def playlist_add_folder(self, pi_plname, foldername, progress=None):
+        """
+        Appends every song MPD has indexed under `foldername` ('' or '.' for the
+        whole library) to a stored playlist. A subfolder is added server-side with
+        one `searchaddpl NAME (base "folder")`; the library root (which `base`
+        cannot express) and servers without filter expressions fall back to
+        `listall` plus batched `playlistadd`.
+        """
+        try:
+            folder = self._mpd_folder(foldername)
+            added = None
+            if folder:
+                added = self._searchaddpl_base(pi_plname, folder)
+            if added is None:
+                files = self._list_music_files_in_folder(folder)
+                if not files:
+                    message = f"No music files found in folder '{foldername}'."
+                    print(message)
+                    return {"message": message}
+                result = self.execute_batch(
+                    [("playlistadd", (pi_plname, file_path_mpd)) for file_path_mpd in files],
+                    progress=progress
+                )
+                added, failed = result["done"], result["failed"]
+            else:
+                if not added:
+                    message = f"No music files found in folder '{foldername}'."
+                    print(message)
+                    return {"message": message}
+                failed = []
+                if progress:
+                    progress(added, added)
+            self.stored_playlists.note_changed(pi_plname)
+            message = f"Added {added} files from '{foldername}' to playlist '{pi_plname}'."
             print(message)
-            return {"message": message}
+            return {"message": message, "added": added, "failed": failed}
         except Exception as e:
             error_message = f"Error adding folder to playlist: {e}"
             print(error_message)
             return {"error": error_message}
 
+    @staticmethod
+    def _mpd_folder(foldername):
+        """'.', './x/', '/x' -> '' or 'x': MPD URIs are relative and have no dot segments."""
+        folder = (foldername or '').strip('/')
+        if folder.startswith('./'):
+            folder = folder[2:]
+        return '' if folder == '.' else folder
+
+    def _searchaddpl_base(self, pi_plname, folder):
+        """
+        Adds `folder` recursively in one server-side command; returns the number of
+        songs added, or None if this MPD cannot do it (then the caller lists files).
+        """
+        base = f"(base {_filter_quote(folder)})"
+        try:
+            with self.pool.connection() as client:
+                client.command_list_ok_begin()
+                client.count(base)
+                client.searchaddpl(pi_plname, base)
+                counted, _ = client.command_list_end()
+            return int(counted.get('songs', 0))
+        except MPDCommandError as e:
+            if 'No such directory' in str(e) or 'does not exist' in str(e):
+                return 0
+            print(f"searchaddpl not usable here ({e}); listing the folder instead.")
+            return None
     def browse_directory(self, path):
         """Browses a directory in the MPD music folder."""
         try:
@@ -452,24 +718,31 @@ class MPDClientController:
             print(f"Error browsing directory: {e}")
             return []
 
-    def pi_save_selection_to_playlist(self, playlist_name: str, songs: list):
+    def pi_save_selection_to_playlist(self, playlist_name: str, songs: list, progress=None):
         """
         Creates a new playlist from a list of selected songs.
         If the playlist already exists, it will be overwritten.
+        Songs are sent in batched command lists; songs MPD rejects are reported in "failed".
         """
         try:
             # Check if a playlist with the same name exists and remove it.
-            playlists = self._execute_safe(self.client.listplaylists)
-            if any(p['playlist'] == playlist_name for p in playlists):
+            if self.stored_playlists.exists(playlist_name):
                 self._execute_safe(self.client.rm, playlist_name)
                 print(f"Removed existing playlist '{playlist_name}'.")
 
-            # Add each song to the new playlist.
-            for song_uri in songs:
-                self._execute_safe(self.client.playlistadd, playlist_name, song_uri)
+            # Add the songs to the new playlist.
+            result = self.execute_batch(
+                [("playlistadd", (playlist_name, song_uri)) for song_uri in songs],
+                progress=progress
+            )
+            self.stored_playlists.note_changed(playlist_name)
             
-            print(f"Successfully created playlist '{playlist_name}' with {len(songs)} songs.")
-            return {"message": f"Playlist '{playlist_name}' created successfully."}
+            print(f"Created playlist '{playlist_name}' with {result['done']} of {len(songs)} songs.")
+            return {
+                "message": f"Playlist '{playlist_name}' created successfully.",
+                "added": result["done"],
+                "failed": result["failed"],
+            }
 
         except MPDCommandError as e:
             error_message = f"MPD command error while saving selection to playlist: {e}"
@@ -484,8 +757,7 @@ class MPDClientController:
         """
         Checks if a playlist exists. If not, creates it from a folder.
         """
-        playlists = self.get_playlist_List()
-        if any(p['playlist'] == playlist_name for p in playlists):
+        if self.stored_playlists.exists(playlist_name):
             print(f"Playlist '{playlist_name}' already exists.")
             return
 
@@ -495,22 +767,13 @@ class MPDClientController:
 
     def _list_music_files_in_folder(self, foldername):
         """
-        Scans a directory for music files and returns their paths relative to the MPD music root.
+        Song URIs under `foldername` from MPD's database (`listall`), so only files
+        MPD actually knows about are returned and the SD card is not walked.
         """
-        music_extensions = ['.mp3', '.flac', '.ogg', '.wav', '.aac']
-        
-        full_folder_path = os.path.join(self.music_base_path, foldername)
-
-        if not os.path.isdir(full_folder_path):
-            print(f"Error: Directory not found at '{full_folder_path}'")
+        try:
+            entries = self._execute_safe(self.client.listall, foldername) if foldername \
+                else self._execute_safe(self.client.listall)
+        except MPDCommandError as e:
+            print(f"Error: folder '{foldername}' not in the MPD database: {e}")
             return []
-
-        music_files = []
-        for root, _, files in os.walk(full_folder_path):
-            for file in files:
-                if any(file.lower().endswith(ext) for ext in music_extensions):
-                    full_file_path = os.path.join(root, file)
-                    relative_path = os.path.relpath(full_file_path, self.music_base_path)
-                    music_files.append(str(Path(relative_path)))
-
-        return music_files
\ No newline at end of file
+        return [entry['file'] for entry in entries if 'file' in entry]
@@ -0,0 +1,123 @@
+# my_package/mpd_events.py
+import asyncio
+import time
+
+from mpd.asyncio import MPDClient as AsyncMPDClient
+
+IDLE_SUBSYSTEMS = ("player", "mixer", "playlist", "stored_playlist", "options", "database", "update")
+# Subsystems whose changes are visible in `status` / `currentsong` ("update": `updating_db`)
+STATUS_SUBSYSTEMS = {"player", "mixer", "playlist", "options", "update"}
+
+
+class MPDEventBroadcaster:
+    """
+    Holds one MPD `idle` connection and fans change events out to any number
+    of subscribers (SSE clients) and in-process listeners (caches).
+
+    Every event is a dict:
+        {"subsystems": [...], "status": {...}, "currentsong": {...}, "time": <server epoch>}
+    `status`/`currentsong` are only refreshed when a subsystem that affects
+    them changed, so N subscribers cost one MPD round trip per change.
+    """
+
+    def __init__(self, host='localhost', port=6600, subsystems=IDLE_SUBSYSTEMS,
+                 reconnect_delay=3, queue_size=16):
+        self.host = host
+        self.port = port
+        self.subsystems = tuple(subsystems)
+        self.reconnect_delay = reconnect_delay
+        self.queue_size = queue_size
+        self.last_event = None
+        # True while the idle connection is up; caches only trust events while it is
+        self.connected = False
+        self._subscribers = set()
+        self._listeners = []
+        self._task = None
+
+    # --- Subscription ---
+
+    def subscribe(self):
+        """Returns a queue receiving every future event, primed with the latest state."""
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        if self.last_event is not None:
+            queue.put_nowait(self.last_event)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+
+    def add_listener(self, callback):
+        """Registers a plain callable invoked with the set of changed subsystems."""
+        self._listeners.append(callback)
+
+    def _publish(self, event):
+        self.last_event = event
+        for queue in list(self._subscribers):
+            if queue.full():
+                # A slow client only ever needs the newest state; drop its oldest event.
+                try:
+                    queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    pass
+            queue.put_nowait(event)
+
+    def _notify_listeners(self, changed):
+        for callback in self._listeners:
+            try:
+                callback(changed)
+            except Exception as e:
+                print(f"Error in MPD event listener {callback}: {e}")
+
+    # --- Lifecycle ---
+
+    async def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            client = AsyncMPDClient()
+            try:
+                await client.connect(self.host, self.port)
+                self.connected = True
+                print(f"MPD idle listener connected to {self.host}:{self.port}.")
+                # Anything may have changed while we were disconnected.
+                changed = set(self.subsystems)
+                self._notify_listeners(changed)
+                await self._emit(client, changed)
+                async for subsystems in client.idle(self.subsystems):
+                    changed = set(subsystems)
+                    self._notify_listeners(changed)
+                    await self._emit(client, changed)
+            except asyncio.CancelledError:
+                self.connected = False
+                client.disconnect()
+                raise
+            except Exception as e:
+                self.connected = False
+                print(f"MPD idle listener error: {e}. Reconnecting in {self.reconnect_delay}s...")
+                try:
+                    client.disconnect()
+                except Exception:
+                    pass
+                await asyncio.sleep(self.reconnect_delay)
+
+    async def _emit(self, client, changed):
+        event = {"subsystems": sorted(changed), "time": time.time()}
+        if changed & STATUS_SUBSYSTEMS or self.last_event is None:
+            event["status"] = await client.status()
+            event["currentsong"] = await client.currentsong()
+        else:
+            event["status"] = self.last_event.get("status", {})
+            event["currentsong"] = self.last_event.get("currentsong", {})
+        self._publish(event)
@@ -0,0 +1,223 @@
+# my_package/mpd_pool.py
+import asyncio
+import queue
+import select
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+
+from mpd import MPDClient
+from mpd import ConnectionError as MPDConnectionError
+
+# Commands that only read state: safe to send again after the connection drops
+# mid-command. Anything else may already have been applied by MPD.
+READ_ONLY_COMMANDS = frozenset({
+    "ping", "status", "stats", "currentsong", "outputs", "replay_gain_status",
+    "playlistinfo", "playlistid", "plchanges", "plchangesposid", "playlistfind", "playlistsearch",
+    "listplaylists", "listplaylist", "listplaylistinfo",
+    "lsinfo", "listall", "listallinfo", "listfiles", "find", "search", "list", "count",
+    "albumart", "readpicture", "tagtypes", "commands", "decoders", "urlhandlers",
+})
+
+
+class MPDPoolTimeout(MPDConnectionError):
+    """Raised when no pooled MPD connection becomes free in time."""
+
+
+class _StaleConnection(MPDConnectionError):
+    """A borrowed socket found closed before any command was sent on it."""
+
+
+class MPDConnectionPool:
+    """
+    A fixed-size pool of python-mpd2 connections.
+
+    Each MPDClient socket is used by exactly one caller at a time, so any
+    number of threads (and, through execute_async/run, any number of
+    coroutines) can talk to MPD concurrently without sharing a socket.
+    Broken connections are dropped and lazily re-opened on the next borrow.
+    """
+
+    def __init__(self, host='localhost', port=6600, size=4,
+                 command_timeout=10, acquire_timeout=15):
+        self.host = host
+        self.port = port
+        self.size = size
+        self.command_timeout = command_timeout
+        self.acquire_timeout = acquire_timeout
+        # LIFO so the most recently used (and most likely still alive) socket is reused first
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._closed = False
+        # Dedicated worker threads: MPD calls never compete with the default executor
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="mpd-pool")
+
+    # --- Connection lifecycle ---
+
+    def _open(self):
+        client = MPDClient(use_unicode=True)
+        client.timeout = self.command_timeout
+        client.connect(self.host, self.port)
+        return client
+
+    def _discard(self, client):
+        try:
+            client.disconnect()
+        except Exception:
+            pass
+        with self._lock:
+            self._created -= 1
+
+    def acquire(self, timeout=None):
+        """Borrows a connected MPDClient, opening a new one if the pool is not full."""
+        if self._closed:
+            raise MPDConnectionError("MPD connection pool is closed.")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_create = self._created < self.size
+            if can_create:
+                self._created += 1
+        if can_create:
+            try:
+                return self._open()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        wait = self.acquire_timeout if timeout is None else timeout
+        try:
+            return self._idle.get(timeout=wait)
+        except queue.Empty:
+            raise MPDPoolTimeout(f"No free MPD connection after {wait}s.")
+
+    def release(self, client, discard=False):
+        """Returns a borrowed client. Broken clients must be released with discard=True."""
+        if discard or self._closed:
+            self._discard(client)
+            return
+        client.timeout = self.command_timeout
+        self._idle.put(client)
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """
+        Borrows one connection for a multi-command sequence (e.g. a command list).
+        `timeout` is applied to every socket operation made while it is held.
+        """
+        client = self.acquire()
+        if timeout is not None:
+            client.timeout = timeout
+        broken = False
+        try:
+            yield client
+        except (MPDConnectionError, OSError):
+            broken = True
+            raise
+        finally:
+            self.release(client, discard=broken)
+
+    def close(self):
+        """Disconnects every idle connection. Borrowed ones are closed when released."""
+        self._closed = True
+        while True:
+            try:
+                client = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(client)
+        self._executor.shutdown(wait=False)
+
+    def reopen(self):
+        if self._closed:
+            self._closed = False
+            self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="mpd-pool")
+
+    # --- Command execution ---
+
+    def execute(self, command, *args, timeout=None):
+        """
+        Runs a single MPD command on a pooled connection.
+        Read-only commands are retried once on a freshly opened socket after a
+        connection failure. Other commands are not: MPD may have applied them
+        before the connection dropped, so instead the borrowed socket is checked
+        before anything is sent, and a dead one is replaced.
+        """
+        retry = command in READ_ONLY_COMMANDS
+        try:
+            with self.connection(timeout=timeout) as client:
+                if not retry and self._is_stale(client):
+                    # Nothing was sent yet: the socket died while idle (MPD restart)
+                    raise _StaleConnection()
+                return getattr(client, command)(*args)
+        except MPDPoolTimeout:
+            raise
+        except (MPDConnectionError, OSError) as e:
+            if not retry and not isinstance(e, _StaleConnection):
+                raise
+            print(f"MPD connection lost during '{command}'. Retrying on a new connection...")
+            # Idle sockets were most likely cut by the same MPD restart.
+            self._drain_idle()
+        with self.connection(timeout=timeout) as client:
+            return getattr(client, command)(*args)
+
+    @staticmethod
+    def _is_stale(client):
+        """True if MPD closed this idle socket (it is readable with nothing to read)."""
+        sock = getattr(client, "_sock", None)
+        if sock is None:
+            return True
+        try:
+            readable, _, _ = select.select([sock], [], [], 0)
+            # MPD never sends unprompted, so a readable socket means EOF or an error
+            return bool(readable)
+        except (OSError, ValueError):
+            return True
+
+    def _drain_idle(self):
+        while True:
+            try:
+                client = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(client)
+
+    def ping(self):
+        """Returns True if MPD answers on a pooled connection."""
+        try:
+            self.execute("ping")
+            return True
+        except Exception as e:
+            print(f"Error: Could not reach MPD at {self.host}:{self.port}. {e}")
+            return False
+
+    # --- asyncio facade ---
+
+    async def run(self, func, *args, **kwargs):
+        """Runs a blocking callable that talks to MPD on one of the pool's worker threads."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+
+    async def execute_async(self, command, *args, timeout=None):
+        return await self.run(self.execute, command, *args, timeout=timeout)
+
+
+class PooledClient:
+    """
+    Stand-in for a single MPDClient whose commands are dispatched to the pool,
+    so `controller.client.status()` keeps working for existing callers.
+    """
+
+    def __init__(self, pool):
+        self._pool = pool
+
+    def __getattr__(self, command):
+        if command.startswith('_'):
+            raise AttributeError(command)
+        return partial(self._pool.execute, command)
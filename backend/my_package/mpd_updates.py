@@ -0,0 +1,161 @@
+# my_package/mpd_updates.py
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from .library import normalize_subfolder
+
+# Idle subsystems that mean an update job started or finished
+UPDATE_SUBSYSTEMS = {"update", "database"}
+# Finished jobs kept for status lookups
+FINISHED_KEEP = 64
+
+
+class UpdateJob:
+    """One MPD `update` job. `future` resolves (to the job) when MPD has finished it."""
+
+    def __init__(self, job_id, path):
+        self.id = job_id
+        self.path = path
+        self.state = "queued"
+        self.requested_at = time.time()
+        self.finished_at = None
+        # Requests that were merged into this job
+        self.merged = 0
+        # A concurrent.futures Future, so threads can block on it and coroutines await it
+        self.future = Future()
+
+    def covers(self, path):
+        return not self.path or path == self.path or path.startswith(self.path + '/')
+
+    def to_dict(self):
+        return {
+            "job": self.id,
+            "path": self.path,
+            "state": self.state,
+            "merged": self.merged,
+            "requested_at": self.requested_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class MPDUpdateTracker:
+    """
+    Path-scoped MPD database updates that callers can wait for.
+
+    `submit(path)` sends `update <path>` and returns the job MPD assigned to it.
+    A request whose path is covered by a job that MPD has queued but not started
+    yet is merged into that job instead of queueing another scan.
+
+    Completion is driven by the idle listener: MPD emits `update` when a job
+    starts or ends (and `database` when it changed something), and `status`
+    then shows the running job in `updating_db`. MPD runs jobs in id order, so
+    every pending job below that id, or all of them when none is running, are
+    done. A slow status poll covers the time the idle connection is down.
+    """
+
+    def __init__(self, controller, poll_interval=2.0):
+        self.controller = controller
+        self.poll_interval = poll_interval
+        self.broadcaster = None
+        # id of the job MPD is running, from the last status we saw
+        self._running = None
+        self._pending = OrderedDict()
+        self._finished = OrderedDict()
+        self._lock = threading.Lock()
+
+    def bind(self, broadcaster):
+        broadcaster.add_listener(self._on_change)
+        self.broadcaster = broadcaster
+
+    def _on_change(self, changed):
+        # Called on the event loop by the idle listener
+        if changed & UPDATE_SUBSYSTEMS and self._pending:
+            asyncio.ensure_future(self.controller.call(self.check))
+
+    # --- Jobs ---
+
+    def submit(self, path=None):
+        """
+        Starts (or joins) an update of `path`, relative to the music folder; None or
+        '' updates everything. Blocking: run it via `controller.call`.
+        Returns (job, merged), or (None, False) if MPD refused the update.
+        """
+        path = normalize_subfolder(path or '')
+        with self._lock:
+            for job in self._pending.values():
+                if job.state == "queued" and job.covers(path) and (self._running is None or job.id > self._running):
+                    job.merged += 1
+                    return job, True
+        job_id = self.controller.update(path or None)
+        if job_id is None:
+            return None, False
+        with self._lock:
+            job = self._pending.get(job_id) or self._finished.get(job_id)
+            if job is None:
+                job = self._pending[job_id] = UpdateJob(job_id, path)
+        # A small job can finish before it was registered, and its idle event may
+        # already have been handled; read `updating_db` now so it is not left "running"
+        self.check()
+        return job, False
+
+    def get(self, job_id):
+        with self._lock:
+            return self._pending.get(job_id) or self._finished.get(job_id)
+
+    def check(self):
+        """Reads `updating_db` and resolves every job MPD has finished (blocking)."""
+        status = self.controller.get_status()
+        if status is None:
+            return
+        running = int(status['updating_db']) if 'updating_db' in status else None
+        done = []
+        with self._lock:
+            self._running = running
+            for job_id, job in list(self._pending.items()):
+                if running is None or job_id < running:
+                    job.state = "done"
+                    job.finished_at = time.time()
+                    done.append(self._pending.pop(job_id))
+                    self._finished[job_id] = job
+                elif job_id == running:
+                    job.state = "running"
+            while len(self._finished) > FINISHED_KEEP:
+                self._finished.popitem(last=False)
+        for job in done:
+            job.future.set_result(job)
+        if done:
+            print(f"MPD update finished: {', '.join(j.path or '(all)' for j in done)}.")
+
+    # --- Waiting ---
+
+    async def wait(self, job, timeout=None):
+        """Waits until `job` is done; returns False if `timeout` (seconds) passed first."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not job.future.done():
+            remaining = self.poll_interval if deadline is None else min(self.poll_interval, deadline - time.monotonic())
+            if remaining <= 0:
+                return False
+            try:
+                await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(job.future)), remaining)
+            except asyncio.TimeoutError:
+                # Events can be missed while the idle connection is down; ask MPD directly
+                await self.controller.call(self.check)
+        return True
+
+    async def events(self, job, timeout=None):
+        """Yields the job's state each time it changes, ending with "done" (or on timeout)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        last = None
+        while True:
+            if job.state != last:
+                last = job.state
+                yield job.to_dict()
+            if job.state == "done":
+                return
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return
+            await self.wait(job, min(self.poll_interval, remaining) if remaining is not None else self.poll_interval)
@@ -0,0 +1,68 @@
+# my_package/now_playing.py
+import asyncio
+import time
+
+# Subsystems that can change status / currentsong / next song
+SNAPSHOT_SUBSYSTEMS = {"player", "mixer", "playlist", "options"}
+
+
+class NowPlayingCache:
+    """
+    In-process cache of MPDClientController.get_now_playing().
+
+    The snapshot stays valid until an MPD idle event invalidates it (register
+    `invalidate` with MPDEventBroadcaster.add_listener). While that listener
+    (`events`) is not connected nothing invalidates the snapshot, so every
+    call reads MPD live. Concurrent callers that miss the cache share a single
+    in-flight MPD request.
+    """
+
+    def __init__(self, controller, events=None, max_age=30):
+        self.controller = controller
+        self.events = events
+        self.max_age = max_age
+        self._snapshot = None
+        self._generation = 0
+        self._inflight = None
+
+    def invalidate(self, changed=None):
+        if changed is None or set(changed) & SNAPSHOT_SUBSYSTEMS:
+            self._snapshot = None
+            self._generation += 1
+
+    async def get(self):
+        snapshot = self._snapshot
+        listening = self.events is None or self.events.connected
+        if listening and snapshot is not None and time.time() - snapshot["time"] < self.max_age:
+            return snapshot
+        if self._inflight is None:
+            self._inflight = asyncio.ensure_future(self._fetch())
+        inflight = self._inflight
+        try:
+            # shield: a cancelled client request must not cancel the shared fetch
+            return await asyncio.shield(inflight)
+        finally:
+            if self._inflight is inflight and inflight.done():
+                self._inflight = None
+
+    async def _fetch(self):
+        generation = self._generation
+        snapshot = await self.controller.call(self.controller.get_now_playing)
+        # Only cache if nothing changed while the request was on the wire
+        if snapshot is not None and generation == self._generation:
+            self._snapshot = snapshot
+        return snapshot
+
+
+def interpolated_status(snapshot):
+    """Copy of the snapshot's status with `elapsed` (and `time`, "elapsed:total") advanced to the current time."""
+    status = dict(snapshot["status"])
+    if status.get("state") == "play" and "elapsed" in status:
+        elapsed = float(status["elapsed"]) + (time.time() - snapshot["time"])
+        if "duration" in status:
+            elapsed = min(elapsed, float(status["duration"]))
+        status["elapsed"] = f"{elapsed:.3f}"
+        if "time" in status:
+            total = status["time"].partition(":")[2]
+            status["time"] = f"{int(elapsed)}:{total}"
+    return status
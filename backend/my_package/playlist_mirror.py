@@ -0,0 +1,157 @@
+# my_package/playlist_mirror.py
+import threading
+from collections import defaultdict
+
+from mpd import CommandError as MPDCommandError
+
+
+class StoredPlaylistMirror:
+    """
+    In-process mirror of MPD's stored playlists.
+
+    Keeps, per playlist, the ordered URIs and a set for O(1) membership checks,
+    plus a reverse index URI -> playlist names. Song lists are loaded lazily.
+
+    When bound to an MPDEventBroadcaster the mirror is trusted until a
+    `stored_playlist` idle event arrives; otherwise every read re-validates with
+    one `listplaylists`. Either way only playlists whose Last-Modified changed
+    are re-fetched, so an edit to one playlist does not re-list all the others.
+    """
+
+    def __init__(self, controller):
+        self.controller = controller
+        self.broadcaster = None
+        self._lock = threading.RLock()
+        self._stale = True
+        self._listing = []
+        self._modified = {}
+        self._songs = {}
+        self._members = {}
+        self._index = defaultdict(set)
+        # Playlists we edited ourselves; their next Last-Modified is adopted, not re-fetched
+        self._adopt = set()
+
+    def bind(self, broadcaster):
+        broadcaster.add_listener(self.invalidate)
+        self.broadcaster = broadcaster
+
+    def invalidate(self, changed=None):
+        if changed is None or "stored_playlist" in changed:
+            self._stale = True
+
+    # --- Loading ---
+
+    def _drop(self, name):
+        for uri in self._members.pop(name, ()):
+            names = self._index.get(uri)
+            if names is not None:
+                names.discard(name)
+                if not names:
+                    del self._index[uri]
+        self._songs.pop(name, None)
+
+    def _store(self, name, uris):
+        self._drop(name)
+        self._songs[name] = list(uris)
+        self._members[name] = set(uris)
+        for uri in uris:
+            self._index[uri].add(name)
+
+    def _refresh(self):
+        with self._lock:
+            if not self._stale and self.broadcaster is not None and self.broadcaster.connected:
+                return
+            listing = self.controller._execute_safe(self.controller.client.listplaylists)
+            modified = {p['playlist']: p.get('last-modified') for p in listing}
+            for name in list(self._songs):
+                if name not in modified:
+                    self._drop(name)
+                elif modified[name] != self._modified.get(name) and name not in self._adopt:
+                    self._drop(name)
+            self._adopt.clear()
+            self._listing = listing
+            self._modified = modified
+            self._stale = False
+
+    def _load_songs(self, names):
+        """Fetches the given playlists in one command list and stores them."""
+        names = [n for n in names if n not in self._songs and n in self._modified]
+        if not names:
+            return
+        try:
+            with self.controller.pool.connection() as client:
+                client.command_list_ok_begin()
+                for name in names:
+                    client.listplaylist(name)
+                results = client.command_list_end()
+        except MPDCommandError:
+            # A playlist vanished between listplaylists and now; go one by one.
+            results = []
+            for name in names:
+                try:
+                    results.append(self.controller.client.listplaylist(name))
+                except MPDCommandError:
+                    results.append([])
+        for name, uris in zip(names, results):
+            self._store(name, uris)
+
+    # --- Reads ---
+
+    def listing(self):
+        """Same shape as MPD `listplaylists`."""
+        with self._lock:
+            self._refresh()
+            return [dict(p) for p in self._listing]
+
+    def exists(self, name):
+        with self._lock:
+            self._refresh()
+            return name in self._modified
+
+    def songs(self, name):
+        with self._lock:
+            self._refresh()
+            self._load_songs([name])
+            return list(self._songs.get(name, []))
+
+    def window(self, name, offset, limit):
+        """Returns (total length, songs[offset:offset + limit]) without copying the whole list."""
+        with self._lock:
+            self._refresh()
+            self._load_songs([name])
+            songs = self._songs.get(name, [])
+            return len(songs), songs[offset:offset + limit]
+
+    def contains(self, name, uri):
+        with self._lock:
+            self._refresh()
+            self._load_songs([name])
+            return uri in self._members.get(name, ())
+
+    def playlists_containing(self, uri):
+        """Reverse lookup: names of every stored playlist that contains `uri`."""
+        with self._lock:
+            self._refresh()
+            self._load_songs(list(self._modified))
+            return sorted(self._index.get(uri, ()))
+
+    # --- Write-through ---
+
+    def note_added(self, name, uris):
+        """Records songs appended by this process so the next check needs no MPD call."""
+        with self._lock:
+            if name in self._songs:
+                self._songs[name].extend(uris)
+                self._members[name].update(uris)
+                for uri in uris:
+                    self._index[uri].add(name)
+                self._adopt.add(name)
+            else:
+                # New (or not yet loaded) playlist: let the next read pick it up
+                self._stale = True
+
+    def note_changed(self, name):
+        """Forgets one playlist after an edit whose result we do not mirror locally."""
+        with self._lock:
+            self._drop(name)
+            self._stale = True
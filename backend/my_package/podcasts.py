@@ -0,0 +1,374 @@
+# my_package/podcasts.py
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+
+import feedparser
+import requests
+
+from .models import PodcastEpisode, PodcastFeed
+
+AUDIO_TYPES = ('audio/mpeg', 'audio/mp4')
+CHUNK_SIZE = 256 * 1024
+# Downloads are written here and renamed into place once complete
+PART_SUFFIX = ".part"
+# Next to each .part file: its URL and the validator for If-Range
+META_SUFFIX = ".part.json"
+# Attempts per episode within one run; each one resumes where the last stopped
+MAX_ATTEMPTS = 3
+USER_AGENT = "Pi_Mpd_Server podcast downloader"
+# Podcast folder inside the music folder, as MPD sees it
+PODCAST_FOLDER = "播客"
+# Stored playlist of the episodes currently on disk, oldest first
+LATEST_PLAYLIST = "最新播客"
+
+
+class Episode:
+    def __init__(self, id, feed, title, url, dest):
+        self.id = id
+        self.feed = feed
+        self.title = title
+        self.url = url
+        self.dest = dest
+
+
+def episode_file_name(title, published):
+    sanitized_title = re.sub(r'[\\/:*?"<>|]', '', title)
+    return f"{published.strftime('%Y-%m-%d')} - {sanitized_title}.mp3"
+
+
+def _content_range(value):
+    """'bytes 100-199/1000' -> (100, 1000); '*' or missing parts -> None."""
+    match = re.match(r'bytes\s+(?:(\d+)-\d+|\*)/(\d+|\*)', value or '')
+    if not match:
+        return None, None
+    start, total = match.groups()
+    return (int(start) if start else None), (int(total) if total != '*' else None)
+
+
+def _read_meta(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_meta(path, meta):
+    with open(path, 'w') as f:
+        json.dump(meta, f)
+
+
+def _discard(*paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class PodcastDownloader:
+    """
+    Fetches podcast feeds and downloads new episodes concurrently.
+
+    Feeds are fetched conditionally (ETag / Last-Modified, kept in the
+    `podcast_feeds` table), so an unchanged feed costs one 304. Every entry is
+    recorded once in `podcast_episodes`, so a run only looks at new entries and
+    at episodes still pending or failed. Episodes are downloaded to
+    `<name>.part` and renamed into place when complete; an interrupted download
+    is resumed with a Range request on the next attempt or the next run, so a
+    half-written file is never mistaken for an episode.
+
+    HTTP runs in worker threads (requests); asyncio only schedules them. At most
+    `per_host` requests run against one host and `max_downloads` overall.
+    """
+
+    def __init__(self, base_dir, session_factory, per_host=2, max_downloads=4,
+                 max_age_days=7, timeout=30):
+        self.base_dir = base_dir
+        self.session_factory = session_factory
+        self.per_host = per_host
+        self.max_age = timedelta(days=max_age_days)
+        self.timeout = timeout
+        self._downloads = asyncio.Semaphore(max_downloads)
+        self._hosts = {}
+        self._local = threading.local()
+
+    # --- HTTP ---
+
+    def _http(self):
+        # One requests.Session per worker thread keeps connections alive without sharing one
+        http = getattr(self._local, "http", None)
+        if http is None:
+            http = self._local.http = requests.Session()
+            http.headers["User-Agent"] = USER_AGENT
+        return http
+
+    def _host_limit(self, url):
+        host = urlsplit(url).netloc
+        if host not in self._hosts:
+            self._hosts[host] = asyncio.Semaphore(self.per_host)
+        return self._hosts[host]
+
+    # --- Feed state ---
+
+    def has_state(self, name):
+        with self.session_factory() as db:
+            return db.query(PodcastFeed.id).filter(PodcastFeed.name == name).first() is not None
+
+    def _feed_validators(self, name, url):
+        with self.session_factory() as db:
+            feed = db.query(PodcastFeed).filter(PodcastFeed.name == name).first()
+            if feed is None or feed.url != url:
+                return {}
+            return {"etag": feed.etag, "last_modified": feed.last_modified}
+
+    def _fetch_feed(self, name, url):
+        """Returns (parsed feed, ETag, Last-Modified), or None if it has not changed since the last run."""
+        validators = self._feed_validators(name, url)
+        headers = {}
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+        response = self._http().get(url, headers=headers, timeout=self.timeout)
+        if response.status_code == 304:
+            return None
+        response.raise_for_status()
+        return feedparser.parse(response.content), response.headers.get("ETag"), response.headers.get("Last-Modified")
+
+    def _record_feed(self, name, url, parsed, etag, last_modified, now=None):
+        """
+        Stores entries not seen before, with the feed's new validators, in one
+        transaction. Entries already in the table are not looked at again.
+        Returns the number of new entries.
+        """
+        now = now or datetime.now()
+        cutoff = now - self.max_age
+        folder = os.path.join(self.base_dir, name)
+        with self.session_factory() as db:
+            feed = db.query(PodcastFeed).filter(PodcastFeed.name == name).first()
+            if feed is None:
+                feed = PodcastFeed(name=name)
+                db.add(feed)
+                db.flush()
+            known = {guid for (guid,) in db.query(PodcastEpisode.guid).filter(PodcastEpisode.feed_id == feed.id)}
+            new = 0
+            for entry in parsed.entries:
+                audio_link = next((e.get('href') for e in getattr(entry, 'enclosures', [])
+                                   if e.get('type') in AUDIO_TYPES and e.get('href')), None)
+                title = getattr(entry, 'title', '') or 'Untitled'
+                if not audio_link:
+                    print(f"⚠️ No audio link found for '{title}'")
+                    continue
+                guid = getattr(entry, 'id', None) or audio_link
+                if guid in known:
+                    continue
+                known.add(guid)
+                published = now
+                if getattr(entry, 'published_parsed', None):
+                    published = datetime.fromtimestamp(time.mktime(entry.published_parsed))
+                file_name = episode_file_name(title, published)
+                episode = PodcastEpisode(feed_id=feed.id, guid=guid, url=audio_link, title=title,
+                                         published=published.timestamp(), file_name=file_name,
+                                         status="pending", updated_at=time.time())
+                dest = os.path.join(folder, file_name)
+                if published < cutoff:
+                    episode.status = "skipped"
+                elif os.path.exists(dest):
+                    # Downloaded before episodes were tracked
+                    episode.status, episode.size = "done", os.path.getsize(dest)
+                    episode.updated_at = os.path.getmtime(dest)
+                db.add(episode)
+                new += 1
+            feed.url, feed.etag, feed.last_modified = url, etag, last_modified
+            feed.checked_at = time.time()
+            db.commit()
+        return new
+
+    def _pending(self, name):
+        """Episodes still to download for a feed: new ones and earlier failures."""
+        with self.session_factory() as db:
+            rows = (db.query(PodcastEpisode).join(PodcastFeed, PodcastEpisode.feed_id == PodcastFeed.id)
+                    .filter(PodcastFeed.name == name, PodcastEpisode.status.in_(("pending", "failed")))
+                    .order_by(PodcastEpisode.published).all())
+            folder = os.path.join(self.base_dir, name)
+            return [Episode(r.id, name, r.title, r.url, os.path.join(folder, r.file_name)) for r in rows]
+
+    def _set_status(self, episode_id, status, size=None):
+        with self.session_factory() as db:
+            values = {PodcastEpisode.status: status, PodcastEpisode.updated_at: time.time()}
+            if size is not None:
+                values[PodcastEpisode.size] = size
+            db.query(PodcastEpisode).filter(PodcastEpisode.id == episode_id).update(values)
+            db.commit()
+
+    def expire(self, days, now=None):
+        """
+        Deletes downloaded episodes older than `days` (by download time) and gives up
+        on unfinished ones older than the age limit. Uses the table, not a folder scan.
+        Returns {feed name: [removed file paths]}.
+        """
+        now = now or time.time()
+        removed = {}
+        with self.session_factory() as db:
+            rows = (db.query(PodcastEpisode, PodcastFeed.name)
+                    .join(PodcastFeed, PodcastEpisode.feed_id == PodcastFeed.id)
+                    .filter(((PodcastEpisode.status == "done") & (PodcastEpisode.updated_at < now - days * 86400))
+                            | (PodcastEpisode.status.in_(("pending", "failed"))
+                               & (PodcastEpisode.published < now - self.max_age.total_seconds())))
+                    .all())
+            for episode, name in rows:
+                dest = os.path.join(self.base_dir, name, episode.file_name)
+                if episode.status == "done":
+                    _discard(dest)
+                    removed.setdefault(name, []).append(dest)
+                    print(f"🧹 Removed old file: '{episode.file_name}'")
+                _discard(dest + PART_SUFFIX, dest + META_SUFFIX)
+                episode.status = "expired"
+                episode.updated_at = now
+            db.commit()
+        return removed
+
+    def playlist_changes(self):
+        """
+        Episodes the "latest podcasts" playlist is behind on, as (id, feed name, path):
+        downloaded but not listed yet, and listed but expired since.
+        """
+        with self.session_factory() as db:
+            rows = (db.query(PodcastEpisode.id, PodcastFeed.name, PodcastEpisode.file_name, PodcastEpisode.status)
+                    .join(PodcastFeed, PodcastEpisode.feed_id == PodcastFeed.id)
+                    .filter(((PodcastEpisode.status == "done") & ~PodcastEpisode.in_playlist.is_(True))
+                            | ((PodcastEpisode.status == "expired") & PodcastEpisode.in_playlist.is_(True)))
+                    .order_by(PodcastEpisode.published).all())
+        add = [(i, name, os.path.join(self.base_dir, name, f)) for i, name, f, status in rows if status == "done"]
+        remove = [(i, name, os.path.join(self.base_dir, name, f)) for i, name, f, status in rows if status == "expired"]
+        return add, remove
+
+    def mark_listed(self, episode_ids, listed):
+        if not episode_ids:
+            return
+        with self.session_factory() as db:
+            (db.query(PodcastEpisode).filter(PodcastEpisode.id.in_(list(episode_ids)))
+             .update({PodcastEpisode.in_playlist: listed}, synchronize_session=False))
+            db.commit()
+
+    # --- Downloads ---
+
+    def _download_file(self, url, dest):
+        """
+        Downloads `url` to `dest` via `dest.part`, resuming a previous partial file
+        when the server honours the Range request. Returns the bytes transferred.
+        """
+        part, meta_path = dest + PART_SUFFIX, dest + META_SUFFIX
+        offset = os.path.getsize(part) if os.path.exists(part) else 0
+        meta = _read_meta(meta_path)
+        headers = {}
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+            if meta.get("validator"):
+                # Only resume if the file on the server is still the one we started
+                headers["If-Range"] = meta["validator"]
+        with self._http().get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+            if response.status_code == 416:
+                _, total = _content_range(response.headers.get("Content-Range"))
+                if total == offset:
+                    os.replace(part, dest)
+                    _discard(meta_path)
+                    return 0
+                _discard(part, meta_path)
+                raise IOError("server rejected the resume range; restarting")
+            response.raise_for_status()
+            start, total = _content_range(response.headers.get("Content-Range"))
+            if response.status_code == 206 and start == offset:
+                mode = 'ab'
+            else:
+                mode, offset, total = 'wb', 0, None
+                if response.headers.get("Content-Length") and not response.headers.get("Content-Encoding"):
+                    total = int(response.headers["Content-Length"])
+            etag = response.headers.get("ETag")
+            validator = etag if etag and not etag.startswith("W/") else response.headers.get("Last-Modified")
+            _write_meta(meta_path, {"url": url, "validator": validator})
+            written = 0
+            with open(part, mode) as f:
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    f.write(chunk)
+                    written += len(chunk)
+        size = offset + written
+        if total is not None and size != total:
+            raise IOError(f"incomplete download ({size} of {total} bytes)")
+        os.replace(part, dest)
+        _discard(meta_path)
+        return written
+
+    async def download(self, episode):
+        """Downloads one episode, resuming after dropped connections. Returns True on success."""
+        os.makedirs(os.path.dirname(episode.dest), exist_ok=True)
+        async with self._downloads, self._host_limit(episode.url):
+            for attempt in range(1, MAX_ATTEMPTS + 1):
+                try:
+                    started = time.perf_counter()
+                    written = await asyncio.to_thread(self._download_file, episode.url, episode.dest)
+                    print(f"✅ Downloaded '{episode.title}' ({written // 1024} KB in "
+                          f"{time.perf_counter() - started:.1f}s)")
+                    await asyncio.to_thread(self._set_status, episode.id, "done", os.path.getsize(episode.dest))
+                    return True
+                except (requests.RequestException, IOError) as e:
+                    print(f"❌ Attempt {attempt} for '{episode.title}' failed: {e}")
+        # The .part file stays; the next run resumes it
+        await asyncio.to_thread(self._set_status, episode.id, "failed")
+        return False
+
+    # --- Runs ---
+
+    async def process_feed(self, name, url):
+        """Returns the destinations of the episodes downloaded for one feed."""
+        try:
+            async with self._host_limit(url):
+                fetched = await asyncio.to_thread(self._fetch_feed, name, url)
+            if fetched is None:
+                print(f"--- {name}: feed unchanged ---")
+            else:
+                new = await asyncio.to_thread(self._record_feed, name, url, *fetched)
+                print(f"--- {name}: {new} new entries ---")
+        except Exception as e:
+            print(f"Error fetching feed {name}: {e}")
+        episodes = await asyncio.to_thread(self._pending, name)
+        results = await asyncio.gather(*(self.download(episode) for episode in episodes))
+        return [episode.dest for episode, ok in zip(episodes, results) if ok]
+
+    async def run(self, feeds):
+        """Processes every feed concurrently; returns {feed name: [downloaded files]}."""
+        results = await asyncio.gather(*(self.process_feed(name, url) for name, url in feeds.items()))
+        return dict(zip(feeds, results))
+
+
+def refresh_mpd(controller, downloader, playlist=LATEST_PLAYLIST):
+    """
+    Brings MPD up to date with the podcast folders: rescans only the feed folders
+    with changes, then edits the "latest podcasts" stored playlist in place
+    (expired episodes out, new ones appended) instead of rebuilding it.
+    What still needs doing is read from the episode table, so a run where MPD
+    was unreachable is caught up on the next one.
+    """
+    add, remove = downloader.playlist_changes()
+    touched = sorted({name for _, name, _ in add + remove})
+    if not touched:
+        print("No podcast changes for MPD.")
+        return
+    jobs = [controller.update(f"{PODCAST_FOLDER}/{name}") for name in touched]
+    # New files are only playlist-addable once MPD has indexed them
+    if not controller.wait_for_update(max((j for j in jobs if j is not None), default=None)):
+        print("Timed out waiting for the MPD update; the playlist is refreshed next run.")
+        return
+    to_uri = lambda path: os.path.relpath(path, controller.music_base_path).replace(os.sep, '/')
+    result = controller.playlist_update_entries(playlist, add=[to_uri(p) for _, _, p in add],
+                                                remove=[to_uri(p) for _, _, p in remove])
+    rejected = {f["args"][1] for f in result["failed"] if f["command"] == "playlistadd"}
+    downloader.mark_listed([i for i, _, p in add if to_uri(p) not in rejected], True)
+    downloader.mark_listed([i for i, _, _ in remove], False)
@@ -0,0 +1,299 @@
+# my_package/radio.py
+import asyncio
+import json
+import re
+import ssl
+import time
+from urllib.parse import urljoin, urlsplit
+
+# Stations probed at the same time
+PROBE_CONCURRENCY = 8
+# Seconds to open the connection, then to receive the response headers
+CONNECT_TIMEOUT = 3
+FIRST_BYTE_TIMEOUT = 5
+# Seconds to read a playlist body or one ICY metadata block
+READ_TIMEOUT = 5
+# Seconds between background rounds
+PROBE_INTERVAL = 600
+# Stations slower than this to answer are demoted behind the fast ones
+SLOW_FIRST_BYTE_MS = 1500
+# Redirects and .pls/.m3u indirections followed per station
+MAX_HOPS = 5
+# Largest playlist file read
+MAX_PLAYLIST_BYTES = 64 * 1024
+# ICY metadata blocks are at most 255 * 16 bytes; skip streams that place them further apart
+MAX_METAINT = 64 * 1024
+
+_STREAM_TITLE = re.compile(rb"StreamTitle='(.*?)';", re.S)
+_PLS_FILE = re.compile(r'^File\d+\s*=\s*(\S+)', re.I | re.M)
+
+
+class ProbeError(Exception):
+    """A station that could not be reached, or that answered with something unplayable."""
+
+
+def load_stations(path):
+    """[{"name", "url", "image"}] from the stations file (a JSON list)."""
+    with open(path, encoding='utf-8') as f:
+        return [station for station in json.load(f) if station.get("name") and station.get("url")]
+
+
+def parse_playlist(body, base_url):
+    """
+    First stream URL of a .pls or plain .m3u file, or "hls" for an HLS playlist
+    (which MPD plays itself). Raises ProbeError if the file lists nothing.
+    """
+    text = body.decode('utf-8', errors='replace')
+    if '#EXT-X-' in text:
+        return "hls"
+    match = _PLS_FILE.search(text)
+    if match:
+        return urljoin(base_url, match.group(1))
+    for line in text.splitlines():
+        line = line.strip()
+        if line and not line.startswith('#') and not line.startswith('['):
+            return urljoin(base_url, line)
+    raise ProbeError("empty playlist")
+
+
+def _is_playlist(url, content_type):
+    path = urlsplit(url).path.lower()
+    return (path.endswith(('.pls', '.m3u', '.m3u8'))
+            or any(kind in content_type for kind in ('scpls', 'mpegurl', 'x-mpegurl')))
+
+
+async def _request(url):
+    """
+    Sends a GET asking for ICY metadata and reads the response head.
+    Returns (reader, writer, status, headers, connect_ms, first_byte_ms).
+    Plain asyncio streams rather than an HTTP client: SHOUTcast answers
+    "ICY 200 OK", which HTTP libraries reject.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https'):
+        raise ProbeError(f"unsupported scheme '{parts.scheme}'")
+    port = parts.port or (443 if parts.scheme == 'https' else 80)
+    start = time.perf_counter()
+    try:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(parts.hostname, port,
+                                    ssl=ssl.create_default_context() if parts.scheme == 'https' else None),
+            CONNECT_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise ProbeError("connect timeout")
+    except OSError as e:
+        raise ProbeError(f"connect failed: {e}")
+    connected = time.perf_counter()
+    path = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+    host = parts.hostname if parts.port is None else f"{parts.hostname}:{parts.port}"
+    # HTTP/1.0: no chunked bodies, and the server closes when done
+    writer.write(f"GET {path} HTTP/1.0\r\nHost: {host}\r\nUser-Agent: MusicPlayerDaemon\r\n"
+                 f"Icy-MetaData: 1\r\nAccept: */*\r\n\r\n".encode())
+    try:
+        await writer.drain()
+        status_line = await asyncio.wait_for(reader.readline(), FIRST_BYTE_TIMEOUT)
+        first_byte = time.perf_counter()
+        head = await asyncio.wait_for(_read_head(reader), READ_TIMEOUT) if status_line.strip() else []
+    except asyncio.TimeoutError:
+        writer.close()
+        raise ProbeError("no response")
+    except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError) as e:
+        writer.close()
+        raise ProbeError(f"bad response: {e}")
+    fields = status_line.decode('latin-1').split(None, 2)
+    if len(fields) < 2 or not fields[1].isdigit():
+        writer.close()
+        raise ProbeError(f"bad status line {status_line[:40]!r}")
+    headers = {}
+    for line in head:
+        key, sep, value = line.decode('latin-1').partition(':')
+        if sep:
+            headers[key.strip().lower()] = value.strip()
+    return (reader, writer, int(fields[1]), headers,
+            (connected - start) * 1000, (first_byte - connected) * 1000)
+
+
+async def _read_head(reader):
+    """Header lines up to the blank line (servers differ on CRLF vs LF)."""
+    lines = []
+    while (line := await reader.readline()).strip():
+        lines.append(line)
+    return lines
+
+
+async def _read_body(reader, limit):
+    """Up to `limit` bytes, until the server closes the connection."""
+    body = b''
+    while len(body) < limit and (chunk := await reader.read(limit - len(body))):
+        body += chunk
+    return body
+
+
+async def _read_icy_title(reader, metaint):
+    """Skips `metaint` audio bytes and decodes the StreamTitle of the metadata block that follows."""
+    await asyncio.wait_for(reader.readexactly(metaint), READ_TIMEOUT)
+    length = (await asyncio.wait_for(reader.readexactly(1), READ_TIMEOUT))[0] * 16
+    if not length:
+        return None
+    block = await asyncio.wait_for(reader.readexactly(length), READ_TIMEOUT)
+    match = _STREAM_TITLE.search(block)
+    if not match:
+        return None
+    raw = match.group(1)
+    try:
+        return raw.decode('utf-8')
+    except UnicodeDecodeError:
+        return raw.decode('latin-1')
+
+
+async def probe(url):
+    """
+    Checks one station URL: follows redirects and .pls/.m3u indirections, then
+    reads the first audio bytes (and the ICY StreamTitle, if the server sends
+    metadata). Returns a result dict; failures are reported in it, not raised.
+    """
+    result = {"url": url, "stream_url": url, "via_playlist": False, "alive": False, "kind": None, "status": None,
+              "connect_ms": None, "first_byte_ms": None, "title": None, "bitrate": None,
+              "error": None, "checked_at": time.time()}
+    try:
+        for _ in range(MAX_HOPS):
+            reader, writer, status, headers, connect_ms, first_byte_ms = await _request(result["stream_url"])
+            try:
+                if result["connect_ms"] is None:
+                    # Latency of the station's own URL (the first hop)
+                    result["connect_ms"] = round(connect_ms, 1)
+                    result["first_byte_ms"] = round(first_byte_ms, 1)
+                result["status"] = status
+                if status in (301, 302, 303, 307, 308) and headers.get("location"):
+                    result["stream_url"] = urljoin(result["stream_url"], headers["location"])
+                    continue
+                if status != 200:
+                    raise ProbeError(f"HTTP {status}")
+                content_type = headers.get("content-type", '').lower()
+                if _is_playlist(result["stream_url"], content_type):
+                    body = await asyncio.wait_for(_read_body(reader, MAX_PLAYLIST_BYTES), READ_TIMEOUT)
+                    target = parse_playlist(body, result["stream_url"])
+                    if target == "hls":
+                        result.update(kind="hls", alive=True)
+                        return result
+                    result["stream_url"] = target
+                    result["via_playlist"] = True
+                    continue
+                result["kind"] = "icy" if any(key.startswith("icy-") for key in headers) else "http"
+                result["bitrate"] = headers.get("icy-br")
+                metaint = int(headers.get("icy-metaint") or 0)
+                if 0 < metaint <= MAX_METAINT:
+                    result["title"] = await _read_icy_title(reader, metaint)
+                elif not await asyncio.wait_for(reader.read(1), READ_TIMEOUT):
+                    raise ProbeError("no audio data")
+                result["alive"] = True
+                return result
+            finally:
+                writer.close()
+        raise ProbeError("too many redirects")
+    except ProbeError as e:
+        result["error"] = str(e)
+    except (asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+        result["error"] = "stream stalled" if isinstance(e, asyncio.TimeoutError) else "stream ended"
+    except (OSError, ValueError) as e:
+        result["error"] = str(e)
+    return result
+
+
+class RadioProber:
+    """
+    Keeps the health of the configured radio stations.
+
+    Every PROBE_INTERVAL seconds all stations are probed concurrently (at most
+    PROBE_CONCURRENCY at a time): connect and first-byte latency, the stream
+    URL behind redirects and .pls/.m3u files, and the current ICY StreamTitle.
+    `ranked` orders stations healthy-first so dead ones never lead the queue,
+    and `check` re-probes a single station on demand before it is played.
+    """
+
+    def __init__(self, stations_path, interval=PROBE_INTERVAL, concurrency=PROBE_CONCURRENCY):
+        self.stations_path = stations_path
+        self.interval = interval
+        self._limit = asyncio.Semaphore(concurrency)
+        self.stations = []
+        # station url -> last probe result, plus "failures" in a row
+        self.health = {}
+        self._task = None
+
+    def reload(self):
+        try:
+            self.stations = load_stations(self.stations_path)
+        except (OSError, ValueError) as e:
+            print(f"Error loading radio stations from {self.stations_path}: {e}")
+            self.stations = []
+
+    async def start(self):
+        self.reload()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.probe_all()
+            except Exception as e:
+                print(f"Error probing radio stations: {e}")
+            await asyncio.sleep(self.interval)
+
+    # --- Probing ---
+
+    async def check(self, url):
+        """Probes one URL now and records the result."""
+        async with self._limit:
+            result = await probe(url)
+        previous = self.health.get(url)
+        result["failures"] = 0 if result["alive"] else (previous["failures"] + 1 if previous else 1)
+        self.health[url] = result
+        return result
+
+    async def probe_all(self):
+        start = time.perf_counter()
+        results = await asyncio.gather(*(self.check(station["url"]) for station in self.stations))
+        dead = [station["name"] for station, result in zip(self.stations, results) if not result["alive"]]
+        print(f"Probed {len(results)} radio stations in {time.perf_counter() - start:.1f}s; "
+              f"{len(dead)} not responding{': ' + ', '.join(dead) if dead else ''}.")
+        return results
+
+    # --- Views ---
+
+    def station_for(self, url):
+        return next((station for station in self.stations if station["url"] == url), None)
+
+    def state(self, station):
+        """The station with its last probe result; "health" is ok / slow / dead / unknown."""
+        result = self.health.get(station["url"])
+        if result is None:
+            health = "unknown"
+        elif not result["alive"]:
+            health = "dead"
+        elif (result["first_byte_ms"] or 0) > SLOW_FIRST_BYTE_MS:
+            health = "slow"
+        else:
+            health = "ok"
+        return {**station, "health": health, "probe": result}
+
+    def ranked(self):
+        """Stations in their configured order within ok, unknown, slow, dead."""
+        order = {"ok": 0, "unknown": 1, "slow": 2, "dead": 3}
+        states = [self.state(station) for station in self.stations]
+        return sorted(states, key=lambda state: order[state["health"]])
+
+    def playable_url(self, url):
+        """
+        The URL to hand to MPD: the stream behind a .pls/.m3u indirection when the
+        last probe found one, else `url` itself. Plain redirects are left to MPD,
+        as their targets often carry short-lived tokens.
+        """
+        result = self.health.get(url)
+        if result and result["alive"] and result["via_playlist"] and result["kind"] != "hls":
+            return result["stream_url"]
+        return url
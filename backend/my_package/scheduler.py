@@ -0,0 +1,281 @@
+# my_package/scheduler.py
+import asyncio
+import time
+from collections import deque
+from datetime import datetime, time as dtime, timedelta
+
+from .database import run_db
+from .models import ScheduledJob
+
+# Seconds before an alarm that the MPD connection is checked (and re-opened if MPD dropped it)
+PREWARM_SECONDS = 5
+# Long waits are re-checked at least this often, so wall-clock jumps (NTP, suspend) are noticed
+MAX_SLEEP = 60
+# Seconds between volume steps of a fade
+FADE_STEP = 0.5
+# Fade-in target when the job has no volume and MPD reports none
+DEFAULT_VOLUME = 50
+# Fade-out at the end of the sleep timer
+SLEEP_FADE_SECONDS = 30
+# Recent alarm firings kept for /api/cron/history
+HISTORY_KEEP = 20
+
+
+def parse_days(days):
+    """Cron-style weekdays (0 = Sunday) from "1,3,5"; an empty set means every day."""
+    return {int(day) % 7 for day in (days or '').split(',') if day.strip()}
+
+
+def format_days(days):
+    days = sorted({int(day) % 7 for day in days or ()})
+    return '' if len(days) in (0, 7) else ','.join(map(str, days))
+
+
+def next_run(job, now):
+    """Timestamp of the job's next local-time occurrence strictly after `now`."""
+    days = parse_days(job["days"])
+    today = datetime.fromtimestamp(now).date()
+    for offset in range(8):
+        day = today + timedelta(days=offset)
+        if days and (day.weekday() + 1) % 7 not in days:
+            continue
+        when = datetime.combine(day, dtime(job["hour"], job["minute"])).timestamp()
+        if when > now:
+            return when
+    return None
+
+
+def _job_dict(row):
+    return {
+        "name": row.name, "hour": row.hour, "minute": row.minute, "days": row.days or '',
+        "playlist": row.playlist, "volume": row.volume, "fade_seconds": row.fade_seconds or 0,
+        "enabled": bool(row.enabled),
+    }
+
+
+class AlarmScheduler:
+    """
+    Runs the alarms in the server process instead of crontab.
+
+    Each enabled job is an asyncio task that sleeps until the next occurrence.
+    PREWARM_SECONDS before it, a `status` on the MPD pool makes sure a pooled
+    connection (and a worker thread) is ready, so at the target time the whole
+    clear / load / setvol / play sequence goes out as one command list.
+    A fade-in ramps the volume afterwards. The sleep timer uses the same
+    machinery: fade out, pause, then restore the volume for the next play.
+
+    Jobs live in the scheduled_jobs table; `clock` is injectable for benchmarks.
+    """
+
+    def __init__(self, controller, session_factory, clock=time.time):
+        self.controller = controller
+        self.session_factory = session_factory
+        self.clock = clock
+        self.jobs = {}
+        self._tasks = {}
+        self._fade = None
+        self._sleep = None
+        self.history = deque(maxlen=HISTORY_KEEP)
+
+    # --- Job storage ---
+
+    def _load(self):
+        with self.session_factory() as db:
+            return [_job_dict(row) for row in db.query(ScheduledJob).all()]
+
+    def _store(self, job):
+        with self.session_factory() as db:
+            row = db.query(ScheduledJob).filter(ScheduledJob.name == job["name"]).first()
+            if row is None:
+                row = ScheduledJob(name=job["name"])
+                db.add(row)
+            for key, value in job.items():
+                setattr(row, key, value)
+            db.commit()
+
+    def _delete(self, names):
+        with self.session_factory() as db:
+            db.query(ScheduledJob).filter(ScheduledJob.name.in_(names)).delete(synchronize_session=False)
+            db.commit()
+
+    async def start(self):
+        for job in await run_db(self._load):
+            self.jobs[job["name"]] = job
+            self._arm(job["name"])
+        print(f"Scheduler started with {len(self.jobs)} job(s).")
+
+    async def stop(self):
+        for task in list(self._tasks.values()) + [self._fade, self._sleep and self._sleep["task"]]:
+            if task is not None:
+                task.cancel()
+        self._tasks.clear()
+
+    async def save(self, name, hour, minute, days=None, playlist=None, volume=None, fade_seconds=0, enabled=True):
+        """Creates or replaces the job `name` and re-arms it. Raises ValueError on bad input."""
+        if not name or not 0 <= hour <= 23 or not 0 <= minute <= 59:
+            raise ValueError("A job needs a name, an hour (0-23) and a minute (0-59).")
+        if volume is not None and not 0 <= volume <= 100:
+            raise ValueError("Volume must be between 0 and 100.")
+        job = {
+            "name": name, "hour": hour, "minute": minute, "days": format_days(days),
+            "playlist": playlist or name, "volume": volume, "fade_seconds": max(0, int(fade_seconds or 0)),
+            "enabled": enabled,
+        }
+        await run_db(self._store, job)
+        self.jobs[name] = job
+        self._arm(name)
+        return self.describe(job)
+
+    async def remove(self, names=None):
+        """Removes the named jobs (all of them if `names` is None); returns how many existed."""
+        names = [name for name in (self.jobs if names is None else names) if name in self.jobs]
+        if names:
+            await run_db(self._delete, names)
+        for name in names:
+            del self.jobs[name]
+            self._arm(name)
+        return len(names)
+
+    def describe(self, job):
+        when = next_run(job, self.clock()) if job["enabled"] else None
+        return {
+            **job,
+            # crontab-style "minute hour dom month dow", as the old API returned
+            "schedule": f"{job['minute']} {job['hour']} * * {job['days'] or '*'}",
+            "next_run": when,
+        }
+
+    def list(self):
+        return sorted((self.describe(job) for job in self.jobs.values()),
+                      key=lambda job: (job["next_run"] is None, job["next_run"] or 0))
+
+    # --- Timing ---
+
+    def _arm(self, name):
+        task = self._tasks.pop(name, None)
+        if task is not None:
+            task.cancel()
+        job = self.jobs.get(name)
+        if job is not None and job["enabled"]:
+            self._tasks[name] = asyncio.get_running_loop().create_task(self._run_job(name))
+
+    async def _sleep_until(self, when):
+        # asyncio timers are accurate to about a millisecond; the loop only
+        # guards against the wall clock moving while we sleep
+        while (delay := when - self.clock()) > 0:
+            await asyncio.sleep(min(delay, MAX_SLEEP))
+
+    async def _run_job(self, name):
+        while True:
+            job = self.jobs[name]
+            target = next_run(job, self.clock())
+            if target is None:
+                return
+            await self._sleep_until(target - PREWARM_SECONDS)
+            volume = await self._prewarm(job)
+            await self._sleep_until(target)
+            try:
+                await self._fire(job, target, volume)
+            except Exception as e:
+                print(f"Alarm '{name}' failed: {e}")
+
+    async def _prewarm(self, job):
+        """Borrows a pooled connection ahead of time; returns the volume to play at."""
+        try:
+            status = await self.controller.call(self.controller.get_status)
+        except Exception as e:
+            print(f"Alarm '{job['name']}': MPD not reachable before the alarm: {e}")
+            return job["volume"]
+        if job["volume"] is not None:
+            return job["volume"]
+        volume = int((status or {}).get("volume", -1))
+        return volume if volume > 0 else DEFAULT_VOLUME
+
+    async def _fire(self, job, target, volume):
+        sent = self.clock()
+        commands = [("clear", ()), ("load", (job["playlist"],))]
+        if job["fade_seconds"]:
+            commands.append(("setvol", (0,)))
+        elif job["volume"] is not None:
+            commands.append(("setvol", (volume,)))
+        commands.append(("play", ()))
+        self._cancel_fade()
+        result = await self.controller.call(self.controller.execute_batch, commands)
+        done = self.clock()
+        entry = {
+            "name": job["name"], "target": target,
+            "late_ms": round((sent - target) * 1000, 3), "acked_ms": round((done - target) * 1000, 3),
+            "failed": result["failed"],
+        }
+        self.history.append(entry)
+        print(f"Alarm '{job['name']}' fired {entry['late_ms']} ms after its time"
+              + (f"; failed: {result['failed']}" if result["failed"] else "."))
+        if job["fade_seconds"] and not result["failed"]:
+            self._fade = asyncio.ensure_future(self._ramp(0, volume, job["fade_seconds"]))
+        return entry
+
+    # --- Volume ---
+
+    def _cancel_fade(self):
+        if self._fade is not None:
+            self._fade.cancel()
+            self._fade = None
+
+    async def _ramp(self, start, end, seconds):
+        """Moves the volume from `start` to `end` in FADE_STEP steps over `seconds`."""
+        steps = max(1, int(seconds / FADE_STEP))
+        for step in range(1, steps + 1):
+            await asyncio.sleep(seconds / steps)
+            await self.controller.call(self.controller.client.setvol, round(start + (end - start) * step / steps))
+
+    # --- Sleep timer ---
+
+    def start_sleep(self, minutes, fade_seconds=SLEEP_FADE_SECONDS):
+        """(Re)starts the sleep timer: after `minutes`, fade out and pause playback."""
+        self.cancel_sleep()
+        ends_at = self.clock() + minutes * 60
+        fade_seconds = max(0, min(fade_seconds, minutes * 60))
+        task = asyncio.get_running_loop().create_task(self._sleep_run(ends_at, fade_seconds))
+        self._sleep = {"ends_at": ends_at, "fade_seconds": fade_seconds, "task": task}
+        return self.sleep_state()
+
+    def cancel_sleep(self):
+        if self._sleep is None:
+            return False
+        self._sleep["task"].cancel()
+        self._sleep = None
+        return True
+
+    def sleep_state(self):
+        if self._sleep is None:
+            return None
+        return {
+            "ends_at": self._sleep["ends_at"],
+            "remaining": max(0.0, self._sleep["ends_at"] - self.clock()),
+            "fade_seconds": self._sleep["fade_seconds"],
+        }
+
+    async def _sleep_run(self, ends_at, fade_seconds):
+        volume = -1
+        try:
+            await self._sleep_until(ends_at - fade_seconds)
+            status = await self.controller.call(self.controller.get_status) or {}
+            volume = int(status.get("volume", -1))
+            if fade_seconds and volume > 0 and status.get("state") == "play":
+                self._cancel_fade()
+                await self._ramp(volume, 0, fade_seconds)
+            commands = [("pause", (1,))]
+            if volume > 0:
+                # Paused at volume 0, resumed at the listener's volume
+                commands.append(("setvol", (volume,)))
+            await self.controller.call(self.controller.execute_batch, commands)
+            volume = -1
+            print("Sleep timer: playback paused.")
+        except asyncio.CancelledError:
+            if volume > 0:
+                # Cancelled halfway through the fade-out
+                await self.controller.call(self.controller.client.setvol, volume)
+            raise
+        finally:
+            if self._sleep is not None and self._sleep["ends_at"] == ends_at:
+                self._sleep = None
@@ -42,6 +42,24 @@ class PlaylistPayload(BaseModel):
     """
     songs: List[str]
 
+class PlaylistItemsPayload(BaseModel):
+    """
+    Songs to insert into a PC playlist, at `position` (0-based) or appended when omitted.
+    e.g., {"songs": ["path/to/song1.mp3"], "position": 3}
+    """
+    songs: List[str]
+    position: Optional[int] = None
+
+class PlaylistMovePayload(BaseModel):
+    from_pos: int
+    to_pos: int
+
+class PlaylistItemsPage(BaseModel):
+    """One page of a PC playlist; `songs` starts at position `offset`."""
+    total: int
+    offset: int
+    songs: List[str]
+
 # New Schema for returning a list of playlist names
 class PlaylistsListResponse(BaseModel):
     """
@@ -66,3 +84,24 @@ class UserPlaylistResponse(UserPlaylistBase):
 
 class SongRequest(BaseModel):
     path: str
+
+class TrackResponse(BaseModel):
+    path: str
+    title: Optional[str] = None
+    artist: Optional[str] = None
+    album: Optional[str] = None
+    duration: Optional[float] = None
+
+    class Config:
+        from_attributes = True
+
+class SearchResponse(BaseModel):
+    """
+    One page of catalog search results.
+    Pass `next_cursor` back as `cursor` to get the next page; it is null on the last page.
+    """
+    results: List[TrackResponse]
+    next_cursor: Optional[str] = None
+
+class SuggestResponse(BaseModel):
+    suggestions: List[str]
@@ -0,0 +1,225 @@
+# my_package/user_playlists.py
+import json
+
+from sqlalchemy import func, insert, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .models import PlaylistItem, UserPlaylist
+
+# Largest page a paginated read returns
+MAX_PAGE = 1000
+
+
+def migrate_playlist_blobs(engine):
+    """
+    One-time upgrade of the PC playlist storage (call after Base.metadata.create_all):
+    moves every JSON `playlist_data` blob into `playlist_items`, merges duplicate
+    (user, name) rows into the oldest one (their entries are appended to it, in row
+    order), then adds the unique indexes that create_all does not add to an existing
+    table, renumbering positions first if concurrent appends ever duplicated one.
+    Safe to run on every start.
+    """
+    with engine.begin() as conn:
+        blobs = conn.execute(text(
+            "SELECT id, playlist_data FROM user_playlists WHERE playlist_data IS NOT NULL"
+        )).all()
+        moved = 0
+        for playlist_id, data in blobs:
+            try:
+                paths = [p for p in json.loads(data) if isinstance(p, str)]
+            except ValueError:
+                print(f"Warning: playlist {playlist_id} has unreadable data; starting it empty.")
+                paths = []
+            has_items = conn.execute(text("SELECT 1 FROM playlist_items WHERE playlist_id = :id LIMIT 1"),
+                                     {"id": playlist_id}).first()
+            if paths and not has_items:
+                conn.execute(insert(PlaylistItem), [
+                    {"playlist_id": playlist_id, "position": i, "path": p} for i, p in enumerate(paths)
+                ])
+                moved += len(paths)
+            conn.execute(text("UPDATE user_playlists SET playlist_data = NULL WHERE id = :id"), {"id": playlist_id})
+
+        duplicates = conn.execute(text(
+            "SELECT p.id, keep.id, p.playlist_name FROM user_playlists p"
+            " JOIN (SELECT MIN(id) AS id, user_id, playlist_name FROM user_playlists"
+            "       GROUP BY user_id, playlist_name) keep"
+            " ON keep.user_id IS p.user_id AND keep.playlist_name IS p.playlist_name"
+            " WHERE p.id <> keep.id ORDER BY p.id"
+        )).all()
+        merged = 0
+        for playlist_id, keep_id, name in duplicates:
+            end = conn.execute(text("SELECT COUNT(*) FROM playlist_items WHERE playlist_id = :id"),
+                               {"id": keep_id}).scalar()
+            appended = conn.execute(text(
+                "UPDATE playlist_items SET playlist_id = :keep, position = position + :end WHERE playlist_id = :id"
+            ), {"keep": keep_id, "end": end, "id": playlist_id}).rowcount
+            conn.execute(text("DELETE FROM user_playlists WHERE id = :id"), {"id": playlist_id})
+            print(f"PC playlist '{name}': duplicate row {playlist_id} merged into {keep_id} "
+                  f"({appended} entries appended).")
+            merged += appended
+        conn.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS ix_user_playlists_user_name"
+            " ON user_playlists (user_id, playlist_name)"
+        ))
+        has_unique_positions = conn.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'ux_playlist_items_playlist_position'"
+        )).first()
+        if not has_unique_positions:
+            # Earlier versions could hand out one position twice under concurrent appends;
+            # make every playlist contiguous again (ties keep insertion order) before
+            # replacing the plain index with the unique one
+            _renumber(conn, "1 = 1", {})
+            conn.execute(text("DROP INDEX IF EXISTS ix_playlist_items_playlist_position"))
+            conn.execute(text(
+                "CREATE UNIQUE INDEX ux_playlist_items_playlist_position ON playlist_items (playlist_id, position)"
+            ))
+    if duplicates or blobs:
+        print(f"PC playlists migrated: {len(blobs)} playlists, {moved} items; "
+              f"{len(duplicates)} duplicate playlists merged ({merged} entries kept).")
+
+
+def find_playlist(db: Session, user_id, name):
+    return db.query(UserPlaylist).filter(UserPlaylist.user_id == user_id, UserPlaylist.playlist_name == name).first()
+
+
+def begin_write(db: Session):
+    """
+    Takes SQLite's write lock now (BEGIN IMMEDIATE) instead of at the first INSERT or
+    UPDATE, so the counts and positions an edit reads cannot change before it writes.
+    Call before the first read of an edit; a no-op if the transaction already writes.
+    """
+    connection = db.connection()
+    if not connection.connection.dbapi_connection.in_transaction:
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+def get_or_create_playlist(db: Session, user_id, name):
+    begin_write(db)
+    playlist = find_playlist(db, user_id, name)
+    if playlist is None:
+        try:
+            with db.begin_nested():
+                playlist = UserPlaylist(user_id=user_id, playlist_name=name)
+                db.add(playlist)
+        except IntegrityError:
+            # Created by another request after all (ix_user_playlists_user_name)
+            playlist = find_playlist(db, user_id, name)
+    return playlist
+
+
+def count_items(db: Session, playlist_id):
+    return db.query(func.count(PlaylistItem.id)).filter(PlaylistItem.playlist_id == playlist_id).scalar()
+
+
+def read_items(db: Session, playlist_id, offset=0, limit=None):
+    """Paths in playlist order; with `limit`, one page read by a range on the position index."""
+    query = db.query(PlaylistItem.path).filter(PlaylistItem.playlist_id == playlist_id)
+    if offset:
+        query = query.filter(PlaylistItem.position >= offset)
+    if limit is not None:
+        query = query.filter(PlaylistItem.position < offset + limit)
+    return [path for (path,) in query.order_by(PlaylistItem.position)]
+
+
+def _shift(db: Session, playlist_id, start, end, delta):
+    """
+    Adds `delta` to every position in [start, end). The range is parked on negative
+    positions first: SQLite checks the unique position index row by row, so moving
+    it in place would collide with its own neighbours.
+    """
+    bounds = "playlist_id = :id AND position >= :start" + (" AND position < :end" if end is not None else "")
+    params = {"id": playlist_id, "start": start, "end": end, "delta": delta}
+    db.execute(text(f"UPDATE playlist_items SET position = -(position + :delta) - 1 WHERE {bounds}"), params)
+    db.execute(text("UPDATE playlist_items SET position = -position - 1 WHERE playlist_id = :id AND position < 0"),
+               params)
+
+
+def _renumber(conn, where, params, start=0):
+    """
+    Numbers the matching rows contiguously from `start` per playlist, in their
+    current order (through negative positions, like _shift).
+    """
+    conn.execute(text(
+        "UPDATE playlist_items SET position = -(:start + ranked.rank - 1) - 1 FROM ("
+        " SELECT id, ROW_NUMBER() OVER (PARTITION BY playlist_id ORDER BY position, id) AS rank"
+        f" FROM playlist_items WHERE {where}) ranked"
+        " WHERE playlist_items.id = ranked.id"
+    ), {**params, "start": start})
+    conn.execute(text("UPDATE playlist_items SET position = -position - 1 WHERE position < 0"))
+
+
+def insert_items(db: Session, playlist_id, paths, position=None):
+    """Inserts `paths` at `position` (appends when None or past the end); returns that position."""
+    begin_write(db)
+    total = count_items(db, playlist_id)
+    if position is None or position > total:
+        position = total
+    position = max(0, position)
+    if not paths:
+        return position
+    if position < total:
+        _shift(db, playlist_id, position, None, len(paths))
+    db.execute(insert(PlaylistItem), [
+        {"playlist_id": playlist_id, "position": position + i, "path": p} for i, p in enumerate(paths)
+    ])
+    return position
+
+
+def delete_at(db: Session, playlist_id, position):
+    """Deletes one entry and closes the gap; returns False if there is none at `position`."""
+    begin_write(db)
+    deleted = (db.query(PlaylistItem)
+               .filter(PlaylistItem.playlist_id == playlist_id, PlaylistItem.position == position)
+               .delete(synchronize_session=False))
+    if deleted:
+        _shift(db, playlist_id, position + 1, None, -1)
+    return bool(deleted)
+
+
+def remove_paths(db: Session, playlist_id, paths):
+    """
+    Deletes every entry for the given paths with one DELETE, then renumbers the
+    rows after the first removed one in one pass. Returns how many were removed.
+    """
+    begin_write(db)
+    matched = (db.query(PlaylistItem)
+               .filter(PlaylistItem.playlist_id == playlist_id, PlaylistItem.path.in_(list(paths))))
+    first = matched.with_entities(func.min(PlaylistItem.position)).scalar()
+    if first is None:
+        return 0
+    removed = matched.delete(synchronize_session=False)
+    _renumber(db, "playlist_id = :id AND position > :first", {"id": playlist_id, "first": first}, start=first)
+    return removed
+
+
+def move_item(db: Session, playlist_id, from_pos, to_pos):
+    """Moves one entry; only the rows between the two positions are renumbered."""
+    begin_write(db)
+    item = (db.query(PlaylistItem)
+            .filter(PlaylistItem.playlist_id == playlist_id, PlaylistItem.position == from_pos).first())
+    if item is None:
+        return False
+    to_pos = max(0, min(to_pos, count_items(db, playlist_id) - 1))
+    if to_pos == from_pos:
+        return True
+    path = item.path
+    # Taken out while the others shift, so its old position is free for them
+    db.query(PlaylistItem).filter(PlaylistItem.id == item.id).delete(synchronize_session=False)
+    if to_pos > from_pos:
+        _shift(db, playlist_id, from_pos + 1, to_pos + 1, -1)
+    else:
+        _shift(db, playlist_id, to_pos, from_pos, 1)
+    db.execute(insert(PlaylistItem), [{"playlist_id": playlist_id, "position": to_pos, "path": path}])
+    return True
+
+
+def replace_items(db: Session, playlist_id, paths):
+    begin_write(db)
+    db.query(PlaylistItem).filter(PlaylistItem.playlist_id == playlist_id).delete(synchronize_session=False)
+    insert_items(db, playlist_id, paths, 0)
+
+
+def delete_playlist(db: Session, playlist):
+    db.query(PlaylistItem).filter(PlaylistItem.playlist_id == playlist.id).delete(synchronize_session=False)
+    db.delete(playlist)
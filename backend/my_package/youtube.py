@@ -0,0 +1,213 @@
+# my_package/youtube.py
+import asyncio
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlparse
+
+from .database import run_db
+from .models import YouTubeStream
+
+# Concurrent yt-dlp extractions; each one is mostly waiting on YouTube
+YT_WORKERS = 3
+# Assumed lifetime of a stream URL without an `expire` parameter
+DEFAULT_TTL = 5 * 3600
+# Entries closer than this to expiry are resolved again before use
+REFRESH_MARGIN = 30 * 60
+# Path under which the server hands out stable stream references
+STREAM_PREFIX = "/yt/"
+# Largest playlist expanded in one request
+MAX_PLAYLIST = 500
+
+_VIDEO_ID = re.compile(r'^[A-Za-z0-9_-]{11}$')
+
+
+class YouTubeError(Exception):
+    """Raised for anything the YouTube endpoints should report as an HTTP error."""
+
+    def __init__(self, status_code, detail):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def video_id(url):
+    """The 11-character video id of a watch / youtu.be / shorts / music URL, or None."""
+    if _VIDEO_ID.match(url or ''):
+        return url
+    parsed = urlparse(url)
+    host = (parsed.hostname or '').lower()
+    if host == 'youtu.be':
+        candidate = parsed.path.strip('/').split('/')[0]
+    elif host.endswith('youtube.com'):
+        candidate = parse_qs(parsed.query).get('v', [''])[0]
+        parts = parsed.path.strip('/').split('/')
+        if not candidate and len(parts) == 2 and parts[0] in ('shorts', 'embed', 'live', 'v'):
+            candidate = parts[1]
+    else:
+        return None
+    return candidate if _VIDEO_ID.match(candidate) else None
+
+
+def stream_expiry(stream_url, now):
+    """googlevideo URLs carry their expiry as `expire=<epoch>`."""
+    try:
+        return float(parse_qs(urlparse(stream_url).query)['expire'][0])
+    except (KeyError, ValueError, IndexError):
+        return now + DEFAULT_TTL
+
+
+def _ytdlp_extract(url, flat=False):
+    """Runs yt-dlp in-process (no interpreter start per video). Blocking."""
+    # Imported on first use: it is large and only needed for YouTube entries
+    import yt_dlp
+    options = {"format": "bestaudio/best", "quiet": True, "no_warnings": True, "noplaylist": not flat}
+    if flat:
+        # Playlist entries only (id, title); each video is resolved separately
+        options["extract_flat"] = "in_playlist"
+    with yt_dlp.YoutubeDL(options) as ydl:
+        return ydl.extract_info(url, download=False)
+
+
+class YouTubeResolver:
+    """
+    Resolves YouTube videos to direct audio stream URLs with yt-dlp.
+
+    Resolutions run on a small thread pool and are cached per video id in the
+    youtube_streams table until shortly before the stream URL expires. Stored
+    playlists get a stable reference (`<base_url>/yt/<id>`) instead of the
+    stream URL; the server redirects it to a fresh stream URL when MPD opens
+    it, and `prefetch` re-resolves the next queue entry ahead of time.
+    Concurrent requests for the same video share one extraction.
+    """
+
+    def __init__(self, session_factory, base_url, workers=YT_WORKERS, extract=_ytdlp_extract, clock=time.time):
+        self.session_factory = session_factory
+        self.base_url = base_url.rstrip('/')
+        self.extract = extract
+        self.clock = clock
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="yt-dlp")
+        # video id -> cache entry dict; backed by the table
+        self._cache = {}
+        self._inflight = {}
+        self._prefetching = {}
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    # --- References ---
+
+    def stable_url(self, vid):
+        return f"{self.base_url}{STREAM_PREFIX}{vid}"
+
+    def id_from_reference(self, uri):
+        """The video id of a stable reference, or None for any other URI."""
+        prefix = self.base_url + STREAM_PREFIX
+        if uri and uri.startswith(prefix):
+            vid = uri[len(prefix):].split('?')[0]
+            return vid if _VIDEO_ID.match(vid) else None
+        return None
+
+    # --- Cache ---
+
+    def _fresh(self, entry):
+        return entry is not None and entry["stream_url"] and entry["expires_at"] - self.clock() > REFRESH_MARGIN
+
+    def _load(self, vid):
+        with self.session_factory() as db:
+            row = db.query(YouTubeStream).filter(YouTubeStream.video_id == vid).first()
+            if row is None:
+                return None
+            return {"id": vid, "title": row.title, "duration": row.duration,
+                    "stream_url": row.stream_url, "expires_at": row.expires_at or 0}
+
+    def _store(self, entry):
+        with self.session_factory() as db:
+            row = db.query(YouTubeStream).filter(YouTubeStream.video_id == entry["id"]).first()
+            if row is None:
+                row = YouTubeStream(video_id=entry["id"])
+                db.add(row)
+            row.title = entry["title"]
+            row.duration = entry["duration"]
+            row.stream_url = entry["stream_url"]
+            row.expires_at = entry["expires_at"]
+            row.resolved_at = self.clock()
+            db.commit()
+
+    # --- Resolution ---
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def _extract_video(self, vid):
+        try:
+            info = await self._run(self.extract, f"https://www.youtube.com/watch?v={vid}")
+        except Exception as e:
+            raise YouTubeError(502, f"yt-dlp could not resolve {vid}: {e}")
+        stream_url = info.get("url") if info else None
+        if not stream_url:
+            raise YouTubeError(502, f"yt-dlp returned no stream for {vid}")
+        entry = {"id": vid, "title": info.get("title"), "duration": info.get("duration"),
+                 "stream_url": stream_url, "expires_at": stream_expiry(stream_url, self.clock())}
+        await run_db(self._store, entry)
+        return entry
+
+    async def resolve(self, vid, force=False):
+        """Cache entry {"id", "title", "duration", "stream_url", "expires_at"} with a usable stream URL."""
+        if not _VIDEO_ID.match(vid or ''):
+            raise YouTubeError(400, f"Not a YouTube video id: {vid}")
+        entry = self._cache.get(vid)
+        if not force and self._fresh(entry):
+            return entry
+        if not force and entry is None:
+            entry = await run_db(self._load, vid)
+            if self._fresh(entry):
+                self._cache[vid] = entry
+                return entry
+        task = self._inflight.get(vid)
+        if task is None:
+            task = self._inflight[vid] = asyncio.ensure_future(self._extract_video(vid))
+            task.add_done_callback(lambda _: self._inflight.pop(vid, None))
+        # shield: a client hanging up must not cancel an extraction others wait for
+        entry = await asyncio.shield(task)
+        self._cache[vid] = entry
+        return entry
+
+    async def resolve_many(self, ids):
+        """Resolves every id (at most `workers` extractions at a time); returns (entries, failed)."""
+        results = await asyncio.gather(*(self.resolve(vid) for vid in ids), return_exceptions=True)
+        entries, failed = [], []
+        for vid, result in zip(ids, results):
+            if isinstance(result, Exception):
+                failed.append({"id": vid, "error": getattr(result, "detail", str(result))})
+            else:
+                entries.append(result)
+        return entries, failed
+
+    async def expand(self, url):
+        """Video ids of a video or playlist URL; a watch URL inside a playlist means just that video."""
+        vid = video_id(url)
+        if vid is not None:
+            return [vid]
+        try:
+            info = await self._run(self.extract, url, True)
+        except Exception as e:
+            raise YouTubeError(400, f"Not a YouTube video or playlist: {e}")
+        entries = (info or {}).get("entries")
+        if entries is None:
+            return [info["id"]] if info and info.get("id") else []
+        return [entry["id"] for entry in entries if entry and entry.get("id")][:MAX_PLAYLIST]
+
+    def prefetch(self, uri):
+        """Re-resolves a stable reference in the background if its stream URL is (nearly) stale."""
+        vid = self.id_from_reference(uri)
+        if vid is None or self._fresh(self._cache.get(vid)) or vid in self._inflight or vid in self._prefetching:
+            return None
+        task = self._prefetching[vid] = asyncio.ensure_future(self.resolve(vid))
+
+        def done(t):
+            self._prefetching.pop(vid, None)
+            # Failures surface again when MPD requests the reference
+            t.cancelled() or t.exception()
+        task.add_done_callback(done)
+        return task